@@ -0,0 +1,90 @@
+"""
+Load benchmark for /ask with a fake model.
+
+Fires N concurrent /ask requests at the in-process app and reports p50/p99
+latency, plus the latency of the health check measured while the model
+calls are in flight (it should stay near zero if the event loop is free).
+
+Requires httpx. Usage (from backend/):
+    python -m benchmarks.bench_ask --requests 50 --latency 0.5
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from services.llm import configure_client
+from benchmarks.fakes import FakeModel
+from main import app
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def timed_post(client: httpx.AsyncClient, url: str, payload: dict) -> float:
+    start = time.perf_counter()
+    response = await client.post(url, json=payload)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def timed_get(client: httpx.AsyncClient, url: str) -> float:
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(requests: int, latency: float, concurrency: int) -> dict:
+    configure_client(FakeModel(latency=latency), max_concurrency=concurrency)
+    payload = {
+        "document_id": "bench.pdf",
+        "question": "What is the main idea?",
+        "document_text": "--- Page 1 ---\nBenchmark document text.\n" * 200,
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        asks = [asyncio.create_task(timed_post(client, "/ask", payload)) for _ in range(requests)]
+        await asyncio.sleep(latency / 4)
+        health = await timed_get(client, "/")
+        ask_latencies = await asyncio.gather(*asks)
+        wall = time.perf_counter() - started
+
+    return {
+        "benchmark": "ask",
+        "requests": requests,
+        "model_latency_s": latency,
+        "max_concurrency": concurrency,
+        "wall_s": round(wall, 4),
+        "p50_s": round(percentile(ask_latencies, 50), 4),
+        "p99_s": round(percentile(ask_latencies, 99), 4),
+        "mean_s": round(statistics.mean(ask_latencies), 4),
+        "health_check_during_load_s": round(health, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM client concurrency limit")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.latency, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Q&A session on one document with and without a cached document context.
+
+Asks a series of questions about a document that fits in one prompt,
+once sending the whole prompt every time and once with the document
+held in a (fake) provider-side cached context, against a fake model
+whose latency grows with the characters it is sent.
+
+Usage (from backend/):
+    python -m benchmarks.bench_context_cache --questions 30 --pages 12
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import time
+
+from services.llm import configure_client
+from services.document import extract_document
+from services.gemini import ask_question, context_cache
+from benchmarks.fakes import FakeContextBackend, FakeModel
+from benchmarks.corpus import make_pdf
+
+
+async def session(text: str, questions: int, cached: bool) -> dict:
+    model = FakeModel(latency=0.05, seconds_per_1k_chars=0.002)
+    configure_client(model)
+    backend = FakeContextBackend(model) if cached else None
+    context_cache.configure(backend)
+
+    start = time.perf_counter()
+    for i in range(questions):
+        await ask_question(f"What does page {i + 1} say?", text, "bench.pdf", session_id="bench")
+    stats = context_cache.stats()
+    return {
+        "wall_s": round(time.perf_counter() - start, 3),
+        "model_calls": model.calls,
+        "prompt_chars_sent": sum(model.prompt_chars),
+        "contexts_created": backend.created if backend else 0,
+        "tokens_saved": stats["tokens_saved"],
+    }
+
+
+async def run(questions: int, pages: int) -> dict:
+    text = extract_document(make_pdf(pages), "bench.pdf").text
+    return {
+        "benchmark": "context_cache",
+        "questions": questions,
+        "document_chars": len(text),
+        "inline": await session(text, questions, cached=False),
+        "context_cache": await session(text, questions, cached=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=12)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.questions, args.pages)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare per-request cost of image documents: legacy base64 marker vs raw bytes.
+
+The legacy path stored images as an ``[IMAGE_DATA:mime:base64]`` string
+and re-parsed and decoded it on every request; the current path keeps
+the (downscaled) bytes from upload and hands them to the model as-is.
+Both are driven through a fake model so only local CPU and memory are
+measured.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image --requests 50 --size 4000
+"""
+import argparse
+import base64
+import io
+import json
+import re
+import time
+import tracemalloc
+
+from PIL import Image
+
+from services.document import extract_image
+from services.prompts import image_part
+
+
+def make_image(size: int) -> bytes:
+    """A noisy RGB photo-like PNG, so compression cannot cheat."""
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def legacy_marker(file_bytes: bytes) -> str:
+    # Reference copy of the old extract_text_from_image()
+    return f"[IMAGE_DATA:image/png:{base64.b64encode(file_bytes).decode('utf-8')}]"
+
+
+def legacy_part(document_text: str) -> dict:
+    # Reference copy of the old parse_image_data()
+    match = re.match(r'\[IMAGE_DATA:([^:]+):(.+)\]', document_text, re.DOTALL)
+    mime_type, data = match.group(1), match.group(2)
+    return {"mime_type": mime_type, "data": base64.b64decode(data)}
+
+
+def measure(build_part, document, requests: int) -> dict:
+    tracemalloc.start()
+    start = time.process_time()
+    sent = 0
+    for _ in range(requests):
+        sent += len(build_part(document)["data"])
+    cpu_s = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cpu_ms_per_request": round(cpu_s / requests * 1000, 3),
+        "peak_alloc_bytes": peak,
+        "bytes_sent_per_request": sent // requests,
+    }
+
+
+def run(requests: int, size: int) -> dict:
+    file_bytes = make_image(size)
+
+    start = time.process_time()
+    image = extract_image(file_bytes, "bench.png")
+    upload_cpu_s = time.process_time() - start
+
+    return {
+        "benchmark": "image",
+        "requests": requests,
+        "image_px": size,
+        "upload_bytes": len(file_bytes),
+        "stored_bytes": len(image.data),
+        "upload_prepare_cpu_s": round(upload_cpu_s, 4),
+        "legacy_base64": measure(legacy_part, legacy_marker(file_bytes), requests),
+        "raw_bytes": measure(image_part, image, requests),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--size", type=int, default=4000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests, args.size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare flashcard generation for large counts: one prompt vs map-reduce.
+
+Builds a synthetic multi-page PDF with a distinct topic on every page and
+asks ``generate_flashcards`` for increasing counts, once with section
+fan-out disabled and once enabled, against a fake model whose latency
+grows with the number of items it writes and which repeats itself when
+asked for many items on few topics.
+
+Usage (from backend/):
+    python -m benchmarks.bench_map_reduce --pages 60 --counts 10 50 100
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import time
+
+from services import gemini
+from services.llm import configure_client
+from services.document import extract_document
+from services.structured import MAP_REDUCE_CONCURRENCY
+from services.prompts import MAX_CONTEXT_CHARS
+from benchmarks.fakes import FakeItemModel
+from benchmarks.corpus import DISTINCT_TOPICS, make_pdf
+
+
+async def measure(text: str, count: int, fan_out: bool) -> dict:
+    model = FakeItemModel(DISTINCT_TOPICS, latency=0.2, seconds_per_item=0.05)
+    configure_client(model)
+    # Long documents fan out whatever the count unless the context limit is lifted too
+    gemini.MAP_REDUCE_MIN_COUNT = 1 if fan_out else 10 ** 9
+    gemini.MAX_CONTEXT_CHARS = MAX_CONTEXT_CHARS if fan_out else 10 ** 9
+    start = time.perf_counter()
+    cards = await gemini.generate_flashcards(text, "bench.pdf", count)
+    return {
+        "wall_s": round(time.perf_counter() - start, 3),
+        "items": len(cards),
+        "unique_questions": len({card["question"] for card in cards}),
+        "topics_covered": len({t for t in DISTINCT_TOPICS for card in cards if t in card["question"]}),
+        "model_calls": model.calls,
+    }
+
+
+async def run(pages: int, counts: list) -> dict:
+    text = extract_document(make_pdf(pages, topics=DISTINCT_TOPICS), "bench.pdf").text
+    results = []
+    for count in counts:
+        results.append({
+            "count": count,
+            "single_prompt": await measure(text, count, fan_out=False),
+            "map_reduce": await measure(text, count, fan_out=True),
+        })
+    return {
+        "benchmark": "map_reduce",
+        "pages": pages,
+        "document_chars": len(text),
+        "concurrency": MAP_REDUCE_CONCURRENCY,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 50, 100])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.pages, args.counts)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
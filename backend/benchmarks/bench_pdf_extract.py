@@ -0,0 +1,47 @@
+"""
+PDF extraction throughput (pages/second) against the number of worker processes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_extract --pages 300 --workers 1 2 4 8
+"""
+import argparse
+import json
+import time
+
+from services.document import extract_pdf_pages_parallel, get_pdf_pool
+from benchmarks.corpus import make_pdf
+
+
+def run(pages: int, worker_counts: list, repeats: int) -> dict:
+    pdf_bytes = make_pdf(pages)
+    results = []
+    for workers in worker_counts:
+        if workers > 1:
+            # Start the pool outside the timed region
+            list(get_pdf_pool(workers).map(abs, range(workers)))
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            extracted = extract_pdf_pages_parallel(pdf_bytes, workers)
+            elapsed = time.perf_counter() - start
+            assert [p.number for p in extracted] == list(range(1, pages + 1))
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({
+            "workers": workers,
+            "seconds": round(best, 4),
+            "pages_per_second": round(pages / best, 1),
+        })
+    return {"benchmark": "pdf_extract", "pages": pages, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages, args.workers, args.repeats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
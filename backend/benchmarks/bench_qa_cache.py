@@ -0,0 +1,75 @@
+"""
+Answer cache hit rate and lookup cost for repeated student questions.
+
+Fills the cache for one document with questions built from templates
+and topics, then looks up rephrasings of them (which should hit), and
+questions about other topics or chapters, or the same question with a
+different question word (which must miss).
+
+Usage (from backend/):
+    python -m benchmarks.bench_qa_cache --questions 128
+"""
+import argparse
+import json
+import time
+
+from services.qa_cache import QuestionAnswerCache
+from benchmarks.corpus import DISTINCT_TOPICS
+
+ASKED = [
+    "What is {t}?",
+    "Explain how {t} works",
+    "Why is {t} important in chapter {n}?",
+]
+REPHRASED = [
+    "what's {t}",
+    "Can you explain how {t} works?",
+    "Why is {t} important for chapter {n}",
+]
+# The same words asking something else: different answers
+WH_SWAPPED = [
+    "Why is {t}?",
+    "Explain why {t} works",
+    "How is {t} important in chapter {n}?",
+]
+
+
+def run(questions: int) -> dict:
+    cache = QuestionAnswerCache(max_questions=questions)
+    asked = [
+        (template, topic, n)
+        for n, topic in enumerate(DISTINCT_TOPICS)
+        for template in range(len(ASKED))
+    ][:questions]
+    for template, topic, n in asked:
+        cache.store("doc", ASKED[template].format(t=topic, n=n), "answer", "bench", "model", "1")
+
+    def lookups(texts: list) -> tuple:
+        start = time.perf_counter()
+        hits = sum(1 for text in texts if cache.lookup("doc", text) is not None)
+        return hits, (time.perf_counter() - start) / len(texts)
+
+    rephrased_hits, rephrased_s = lookups([REPHRASED[t].format(t=topic, n=n) for t, topic, n in asked])
+    other_hits, other_s = lookups([ASKED[t].format(t=topic, n=n + 1) if t == 2 else ASKED[t].format(t=topic + "x", n=n)
+                                   for t, topic, n in asked])
+    swapped_hits, swapped_s = lookups([WH_SWAPPED[t].format(t=topic, n=n) for t, topic, n in asked])
+    return {
+        "benchmark": "qa_cache",
+        "cached_questions": len(asked),
+        "rephrased_hit_rate": round(rephrased_hits / len(asked), 3),
+        "unrelated_false_hit_rate": round(other_hits / len(asked), 3),
+        "question_word_false_hit_rate": round(swapped_hits / len(asked), 3),
+        "lookup_ms": round(max(rephrased_s, other_s, swapped_s) * 1000, 3),
+        "stats": cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=128)
+    args = parser.parse_args()
+    print(json.dumps(run(args.questions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
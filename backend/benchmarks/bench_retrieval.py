@@ -0,0 +1,76 @@
+"""
+Compare /ask prompt size and latency: full document text vs BM25 retrieval.
+
+Builds a synthetic multi-page PDF, extracts it, then asks the same
+questions through ``ask_question`` with and without a retrieval index
+against a fake model whose latency grows with prompt size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_retrieval --pages 300
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from services.llm import configure_client
+from services.document import extract_document
+from services.retrieval import build_index
+from services.gemini import ask_question
+from benchmarks.fakes import FakeModel
+from benchmarks.corpus import TOPICS, make_pdf
+
+async def measure(text: str, index, questions: list) -> dict:
+    model = FakeModel(latency=0.05, seconds_per_1k_chars=0.002)
+    configure_client(model)
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        await ask_question(question, text, "bench.pdf", index)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "mean_prompt_chars": round(statistics.mean(model.prompt_chars)),
+        "mean_latency_s": round(statistics.mean(latencies), 4),
+    }
+
+
+async def run(pages: int) -> dict:
+    extracted = extract_document(make_pdf(pages), "bench.pdf")
+    text = extracted.text
+    start = time.perf_counter()
+    index = build_index(text, extracted.chunks)
+    index_build_s = time.perf_counter() - start
+
+    questions = [f"Explain the role of {topic} in this document." for topic in TOPICS]
+    start = time.perf_counter()
+    for question in questions:
+        index.search(question)
+    search_s = (time.perf_counter() - start) / len(questions)
+
+    return {
+        "benchmark": "retrieval",
+        "pages": pages,
+        "document_chars": len(text),
+        "chunks": len(index.chunks),
+        "index_build_s": round(index_build_s, 4),
+        "search_s": round(search_s, 6),
+        "full_text": await measure(text, None, questions),
+        "retrieval": await measure(text, index, questions),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=300)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.pages)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Re-uploading a document with small edits: full vs incremental processing.
+
+Builds a synthetic multi-page PDF, processes it once, then edits a few
+pages and processes the new version twice: from scratch, and with the
+first version's pages and index to reuse. Also asks for flashcards on
+both versions, so sections unchanged by the edit come from the cache.
+Runs against a fake model.
+
+Usage (from backend/):
+    python -m benchmarks.bench_reupload --pages 200 --edits 1
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import time
+
+import fitz
+
+from services import gemini
+from services.llm import configure_client
+from services.document import extract_document
+from services.retrieval import build_index
+from benchmarks.fakes import FakeItemModel
+from benchmarks.corpus import DISTINCT_TOPICS, make_pdf
+
+
+def edit_pdf(pdf_bytes: bytes, page_numbers: list) -> bytes:
+    """Append a sentence to each of ``page_numbers``."""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    for number in page_numbers:
+        doc[number].insert_text((36, 820), "Edited: a corrected note for this page.", fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def process(pdf_bytes: bytes, previous=None) -> tuple:
+    """Extract and index a version. ``previous`` is an earlier (extracted, index) pair."""
+    start = time.perf_counter()
+    extracted = extract_document(pdf_bytes, "bench.pdf", previous[0].chunks if previous else None)
+    extract_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index = build_index(extracted.text, extracted.chunks, previous[1] if previous else None)
+    index_s = time.perf_counter() - start
+    return (extracted, index), {
+        "extract_s": round(extract_s, 3),
+        "index_s": round(index_s, 3),
+        "pages_reused": extracted.pages_reused,
+    }
+
+
+async def flashcard_calls(text: str, count: int) -> int:
+    model = FakeItemModel(DISTINCT_TOPICS, latency=0.0, seconds_per_item=0.0)
+    configure_client(model)
+    await gemini.generate_flashcards(text, "bench.pdf", count)
+    return model.calls
+
+
+async def run(pages: int, edits: int, count: int) -> dict:
+    original = make_pdf(pages, topics=DISTINCT_TOPICS)
+    edited = edit_pdf(original, [i * pages // edits for i in range(edits)])
+
+    first, first_stats = process(original)
+    _, full_stats = process(edited)
+    second, incremental_stats = process(edited, first)
+
+    return {
+        "benchmark": "reupload",
+        "pages": pages,
+        "pages_edited": edits,
+        "first_upload": first_stats,
+        "reupload_full": full_stats,
+        "reupload_incremental": incremental_stats,
+        "flashcards": {
+            "count": count,
+            "first_upload_model_calls": await flashcard_calls(first[0].text, count),
+            "reupload_model_calls": await flashcard_calls(second[0].text, count),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=1)
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.pages, args.edits, args.count)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Cold start of the API process, with an import-time breakdown.
+
+Starts fresh interpreters that import main and serve one request to
+``/`` in-process, and reports the median import and first-response
+times. One run with ``python -X importtime`` breaks the import down by
+what main imports directly (cumulative) and by top-level package (self
+time, wherever it was imported from), and lists which of the heavy
+optional dependencies were loaded at startup. Each of those is also
+timed on its own: the cost the first request that needs it pays.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Loaded on first use by the request that needs it, not at startup
+HEAVY_MODULES = ("fitz", "docx", "pptx", "PIL", "google.generativeai", "podcastfy")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+STARTUP_SCRIPT = f"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+import httpx
+async def first_request():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return (await client.get("/")).status_code
+status = asyncio.run(first_request())
+print(json.dumps({{
+    "import_s": imported - start,
+    "first_response_s": time.perf_counter() - start,
+    "status": status,
+    "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+
+def parse_importtime(stderr: str) -> list:
+    """(self µs, cumulative µs, depth, module) for every line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return rows
+
+
+def breakdown(rows: list, top: int) -> dict:
+    # main is the outermost import; what it imports directly is one level in
+    main_depth = min(depth for _, _, depth, name in rows if name == "main")
+    direct = {name: cumulative for _, cumulative, depth, name in rows if depth == main_depth + 1}
+    packages = {}
+    for self_us, _, _, name in rows:
+        package = name if name.startswith("services.") else name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    def largest(times: dict) -> dict:
+        ordered = sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {name: round(us / 1000, 1) for name, us in ordered}
+
+    return {
+        "total_ms": round(sum(self_us for self_us, _, _, _ in rows) / 1000, 1),
+        "modules": len(rows),
+        "by_direct_import_ms": largest(direct),
+        "by_package_self_ms": largest(packages),
+    }
+
+
+def deferred_import_ms(name: str):
+    """Import time of one heavy dependency in a fresh interpreter, or None if it is not installed."""
+    try:
+        stderr = python("-X", "importtime", "-c", f"import {name}").stderr
+    except subprocess.CalledProcessError:
+        return None
+    rows = parse_importtime(stderr)
+    return round(sum(self_us for self_us, _, _, _ in rows) / 1000, 1)
+
+
+def run(runs: int, top: int) -> dict:
+    starts = [json.loads(python("-c", STARTUP_SCRIPT).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    profile = parse_importtime(python("-X", "importtime", "-c", "import main").stderr)
+    return {
+        "benchmark": "startup",
+        "runs": runs,
+        "import_main_s": round(statistics.median(s["import_s"] for s in starts), 3),
+        "first_response_s": round(statistics.median(s["first_response_s"] for s in starts), 3),
+        "loaded_at_startup": starts[-1]["loaded"],
+        "import_breakdown": breakdown(profile, top),
+        "deferred_import_ms": {name: deferred_import_ms(name) for name in HEAVY_MODULES},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="entries per breakdown")
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
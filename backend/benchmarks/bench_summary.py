@@ -0,0 +1,64 @@
+"""
+Hierarchical summaries of long documents.
+
+Builds a synthetic book-length PDF, summarizes it once, then asks for the
+other summary types. The first request pays for every section summary;
+later ones reuse the cached section summaries and only make the final
+call. Runs against a fake model whose latency grows with prompt size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_summary --pages 400
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import time
+
+from services.llm import configure_client
+from services.document import extract_document
+from services.gemini import generate_summary, MAX_CONTEXT_CHARS, SUMMARY_SECTION_CHARS
+from benchmarks.fakes import FakeModel
+from benchmarks.corpus import make_pdf
+
+
+async def run(pages: int) -> dict:
+    text = extract_document(make_pdf(pages), "bench.pdf").text
+    model = FakeModel(latency=0.1, seconds_per_1k_chars=0.005, reply="A short section summary. " * 20)
+    configure_client(model)
+
+    requests = []
+    for summary_type in ("short", "detailed", "bullet", "short"):
+        calls_before = model.calls
+        start = time.perf_counter()
+        await generate_summary(text, "bench.pdf", summary_type)
+        requests.append({
+            "summary_type": summary_type,
+            "wall_s": round(time.perf_counter() - start, 3),
+            "model_calls": model.calls - calls_before,
+            "final_prompt_chars": model.prompt_chars[-1],
+        })
+
+    return {
+        "benchmark": "summary",
+        "pages": pages,
+        "document_chars": len(text),
+        "max_context_chars": MAX_CONTEXT_CHARS,
+        "section_chars": SUMMARY_SECTION_CHARS,
+        "requests": requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=400)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.pages)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
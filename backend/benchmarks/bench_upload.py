@@ -0,0 +1,79 @@
+"""
+Peak memory of receiving an upload: base64 JSON vs streamed raw body.
+
+Feeds the same file to the server side of both upload paths as a
+request body arriving in chunks: the JSON body of /extract-base64 is
+collected, parsed and decoded, while /upload/raw spools the chunks to a
+temporary file and hashes them. Peak Python allocations are measured
+with tracemalloc; extraction afterwards is the same for both.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload --megabytes 20
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+import tracemalloc
+
+from services.document import decode_base64_file
+from services.uploads import spool_stream
+
+RECEIVE_CHUNK_BYTES = 64 * 1024
+
+
+async def body_chunks(body: bytes):
+    for start in range(0, len(body), RECEIVE_CHUNK_BYTES):
+        yield body[start:start + RECEIVE_CHUNK_BYTES]
+
+
+async def receive_base64(body: bytes) -> int:
+    received = b"".join([chunk async for chunk in body_chunks(body)])
+    request = json.loads(received)
+    return len(decode_base64_file(request["base64_data"]))
+
+
+async def receive_raw(body: bytes) -> int:
+    with await spool_stream(body_chunks(body), max_bytes=len(body)) as upload:
+        return upload.size
+
+
+def measure(receive, body: bytes) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = asyncio.run(receive(body))
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"file_bytes": size, "wall_s": round(wall, 3), "peak_mb": round(peak / 1e6, 2)}
+
+
+def run(megabytes: int) -> dict:
+    data = os.urandom(megabytes * 1024 * 1024)
+    encoded = "data:application/pdf;base64," + base64.b64encode(data).decode()
+    json_body = json.dumps({"document_id": "bench", "filename": "bench.pdf", "base64_data": encoded}).encode()
+    del encoded
+    return {
+        "benchmark": "upload",
+        "file_mb": megabytes,
+        "base64_json": measure(receive_base64, json_body),
+        "raw_stream": measure(receive_raw, data),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megabytes", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.megabytes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+A class uploading the same syllabus at once: with and without deduplication.
+
+Ingests the same PDF for many students concurrently, as /upload/raw
+does (with an empty memory-only store), and reports how many
+extractions ran, the wall time, and the documents and bytes held
+afterwards. The baseline extracts and stores every upload separately,
+as before deduplication.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload_dedup --students 200 --pages 40
+"""
+from benchmarks.environment import isolate_app_data
+
+# Before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import time
+
+from services import store
+from services.document import extract_document
+from services.uploads import UploadDeduplicator
+from benchmarks.corpus import make_pdf
+
+
+async def baseline(pdf: bytes, students: int) -> dict:
+    documents = store.DocumentStore()
+    start = time.perf_counter()
+    extracted = await asyncio.gather(*[asyncio.to_thread(extract_document, pdf, "syllabus.pdf") for _ in range(students)])
+    for i, document in enumerate(extracted):
+        documents.put(store.StoredDocument(f"student{i}", "syllabus.pdf", document.text, document.pages, document.chunks))
+    stats = documents.stats()
+    return {
+        "wall_s": round(time.perf_counter() - start, 3),
+        "extractions": students,
+        "documents": stats["resident_documents"],
+        "resident_bytes": stats["resident_bytes"],
+    }
+
+
+async def deduplicated(pdf: bytes, students: int) -> dict:
+    documents = store.DocumentStore()
+    deduplicator = UploadDeduplicator(documents)
+    document_id = store.make_document_id(pdf)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        deduplicator.ingest(pdf, "syllabus.pdf", len(pdf), document_id, lambda: None, holder=f"student{i}")
+        for i in range(students)
+    ])
+    stats = documents.stats()
+    return {
+        "wall_s": round(time.perf_counter() - start, 3),
+        "extractions": deduplicator.extractions,
+        "deduplicated_uploads": sum(1 for _, _, deduplicated in results if deduplicated),
+        "documents": stats["resident_documents"],
+        "resident_bytes": stats["resident_bytes"],
+        "references": stats["references"],
+    }
+
+
+async def run(students: int, pages: int) -> dict:
+    pdf = make_pdf(pages)
+    return {
+        "benchmark": "upload_dedup",
+        "students": students,
+        "pages": pages,
+        "baseline": await baseline(pdf, students),
+        "deduplicated": await deduplicated(pdf, students),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.students, args.pages)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare two benchmark suite reports and flag regressions.
+
+Latencies, times and memory should not grow; throughputs should not
+drop. Changes beyond ``--threshold`` (relative) are listed, and the
+exit status is 1 if any of them is a regression.
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# Measurements are told apart by their last key: throughputs by name, the rest by unit suffix
+HIGHER_IS_BETTER = {"mb_per_s", "pages_per_s", "requests_per_s"}
+LOWER_IS_BETTER = ("_ms", "_s", "_mb")
+# Inputs and metadata that share those suffixes
+NOT_MEASURED = ("config.", "started_at", "duration_s", "cpus")
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    """Numeric leaves of a report, keyed by their dotted path."""
+    values = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def direction(path: str):
+    """True if higher is better, False if lower is better, None if the value is not a measurement."""
+    name = path.rsplit(".", 1)[-1]
+    if name in HIGHER_IS_BETTER:
+        return True
+    if path.startswith(NOT_MEASURED) or name == "file_mb":
+        return None
+    if name.endswith(LOWER_IS_BETTER):
+        return False
+    return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """(path, baseline, current, relative change, is regression) for every change beyond ``threshold``."""
+    old, new = flatten(baseline), flatten(current)
+    changes = []
+    for path in sorted(old.keys() & new.keys()):
+        better_higher = direction(path)
+        if better_higher is None or not old[path]:
+            continue
+        change = (new[path] - old[path]) / abs(old[path])
+        if abs(change) < threshold:
+            continue
+        regression = change < 0 if better_higher else change > 0
+        changes.append((path, old[path], new[path], change, regression))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    changes = compare(baseline, current, args.threshold)
+    print(json.dumps({
+        "baseline": baseline.get("commit"),
+        "current": current.get("commit"),
+        "threshold": args.threshold,
+        "regressions": [
+            {"metric": p, "baseline": o, "current": n, "change": round(c, 3)} for p, o, n, c, r in changes if r
+        ],
+        "improvements": [
+            {"metric": p, "baseline": o, "current": n, "change": round(c, 3)} for p, o, n, c, r in changes if not r
+        ],
+    }, indent=2))
+    sys.exit(1 if any(regression for *_, regression in changes) else 0)
+
+
+if __name__ == "__main__":
+    main()
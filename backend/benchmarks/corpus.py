@@ -0,0 +1,109 @@
+import io
+import random
+
+import fitz
+from docx import Document as DocxDocument
+from pptx import Presentation
+from pptx.util import Inches
+from PIL import Image, ImageDraw
+
+TOPICS = [
+    "photosynthesis", "mitochondria", "enzymes", "osmosis", "genetics",
+    "ecosystems", "neurons", "hormones", "immunity", "evolution",
+]
+# Distinct per-page topics, for benchmarks where pages must not repeat each other
+DISTINCT_TOPICS = [f"{topic}{i}" for i in range(6) for topic in TOPICS]
+FILLER = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+
+def make_lines(topic: str, count: int, rng: random.Random) -> list:
+    """Generate filler lines that each mention ``topic`` once."""
+    lines = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=10)
+        words[rng.randrange(10)] = topic
+        lines.append(" ".join(words))
+    return lines
+
+
+def make_pdf(pages: int, seed: int = 0, topics: list = TOPICS) -> bytes:
+    """Create a PDF where each page discusses one topic among filler text."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(pages):
+        topic = topics[page_num % len(topics)]
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(make_lines(topic, 40, rng)), fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_docx(paragraphs: int, seed: int = 0, topics: list = TOPICS) -> bytes:
+    """Create a DOCX of ``paragraphs`` paragraphs, each about one topic."""
+    rng = random.Random(seed)
+    doc = DocxDocument()
+    for i in range(paragraphs):
+        doc.add_paragraph(" ".join(make_lines(topics[i % len(topics)], 4, rng)))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(slides: int, seed: int = 0, topics: list = TOPICS) -> bytes:
+    """Create a PPTX where each slide has a title and a text box about one topic."""
+    rng = random.Random(seed)
+    prs = Presentation()
+    for i in range(slides):
+        topic = topics[i % len(topics)]
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"Slide {i + 1}: {topic}"
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(5))
+        box.text_frame.text = "\n".join(make_lines(topic, 6, rng))
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def make_image(width: int, height: int, seed: int = 0, image_format: str = "PNG") -> bytes:
+    """Create a photo-like image (noise under drawn shapes and text), which compresses like real scans."""
+    rng = random.Random(seed)
+    img = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(20):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle([x, y, x + width // 8, y + height // 8], outline=(rng.randrange(256), 0, 0), width=3)
+    for row in range(0, height, max(height // 20, 12)):
+        draw.text((10, row), " ".join(rng.choices(FILLER, k=8)), fill=(0, 0, 0))
+    buffer = io.BytesIO()
+    img.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+# Fixture sizes: (pages, docx paragraphs, slides, image width x height)
+CORPUS_SIZES = {
+    "small": (5, 20, 5, (640, 480)),
+    "medium": (40, 200, 30, (1920, 1080)),
+    "large": (200, 1000, 120, (4000, 3000)),
+}
+
+
+def fixture_corpus(sizes: tuple = ("small", "medium", "large")) -> list:
+    """
+    (name, filename, bytes) for a PDF, DOCX, PPTX and image of each size.
+    Generated deterministically, so every run measures the same files.
+    """
+    corpus = []
+    for size in sizes:
+        pages, paragraphs, slides, (width, height) = CORPUS_SIZES[size]
+        corpus += [
+            (f"pdf_{size}", f"{size}.pdf", make_pdf(pages)),
+            (f"docx_{size}", f"{size}.docx", make_docx(paragraphs)),
+            (f"pptx_{size}", f"{size}.pptx", make_pptx(slides)),
+            (f"png_{size}", f"{size}.png", make_image(width, height)),
+            (f"jpg_{size}", f"{size}.jpg", make_image(width, height, image_format="JPEG")),
+        ]
+    return corpus
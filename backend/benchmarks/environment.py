@@ -0,0 +1,21 @@
+"""Settings that keep benchmark runs away from the app's own data."""
+import os
+import tempfile
+
+
+def isolate_app_data():
+    """
+    Keep response caches and stored documents in memory and podcasts in a
+    temporary directory, so runs neither read results cached by earlier
+    runs nor write into ``data/`` and ``podcasts/``.
+
+    Call before importing ``main`` or the services, which read these
+    settings when they are imported; subprocesses started afterwards
+    inherit them. Settings already in the environment are kept.
+    """
+    os.environ.setdefault("RESPONSE_CACHE_DB", "")
+    os.environ.setdefault("DOCUMENT_STORE_DB", "")
+    if "PODCAST_OUTPUT_DIR" not in os.environ or "PODCAST_MANIFEST_PATH" not in os.environ:
+        podcast_dir = tempfile.mkdtemp(prefix="bench-podcasts-")
+        os.environ.setdefault("PODCAST_OUTPUT_DIR", os.path.join(podcast_dir, "audio"))
+        os.environ.setdefault("PODCAST_MANIFEST_PATH", os.path.join(podcast_dir, "manifest.json"))
@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import time
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Optional
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini ``GenerateContentResponse``."""
+
+    def __init__(self, text: str, prompt_chars: int = 0):
+        self.text = text
+        # Roughly four characters per token, like the real tokenizer on English text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_chars // 4,
+            candidates_token_count=len(text) // 4,
+            cached_content_token_count=0
+        )
+
+
+class FakeModel:
+    """
+    Deterministic local replacement for ``genai.GenerativeModel``.
+
+    Sleeps for ``latency`` seconds per call plus ``seconds_per_1k_chars``
+    for every thousand prompt characters and, if ``output_tokens_per_second``
+    is set, for generating the reply at that rate (blocking, like the real
+    SDK). Returns a fixed reply, so benchmarks run without API keys.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        reply: str = "This is a fake answer.",
+        seconds_per_1k_chars: float = 0.0,
+        output_tokens_per_second: Optional[float] = None
+    ):
+        self.latency = latency
+        self.reply = reply
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+        self.output_tokens_per_second = output_tokens_per_second
+        self.calls = 0
+        self.prompt_chars = []
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs):
+        self.calls += 1
+        parts = contents if isinstance(contents, list) else [contents]
+        chars = sum(len(part) for part in parts if isinstance(part, str))
+        self.prompt_chars.append(chars)
+        reply = self.reply_to("".join(part for part in parts if isinstance(part, str)))
+        delay = self.latency + self.seconds_per_1k_chars * chars / 1000
+        if self.output_tokens_per_second:
+            delay += len(reply) / 4 / self.output_tokens_per_second
+        if stream:
+            return self._stream(reply, delay, chars)
+        time.sleep(delay)
+        return FakeResponse(reply, chars)
+
+    def reply_to(self, prompt: str) -> str:
+        return self.reply
+
+    def _stream(self, reply: str, delay: float, prompt_chars: int):
+        """Spread the delay over one chunk per word of the reply."""
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(delay / len(words))
+            # Like the real SDK, the last chunk reports usage for the whole response
+            yield FakeResponse(word if i == len(words) - 1 else word + " ", prompt_chars if i == len(words) - 1 else 0)
+
+
+class FakeItemModel(FakeModel):
+    """
+    Fake model for flashcard/MCQ prompts.
+
+    Replies with as many items as the prompt asks for, drawn from a pool
+    of question templates for each topic found in the prompt. Questions
+    the prompt says not to repeat are skipped; once the pool runs out the
+    model repeats itself, like a real model asked for too much. Sleeps
+    ``latency`` plus ``seconds_per_item`` for every item generated.
+    """
+
+    TEMPLATES = [
+        ("What is {t}?", "{t} defined."),
+        ("Why is {t} important?", "{t} matters."),
+        ("How does {t} work?", "{t} mechanism."),
+        ("Give an example of {t}.", "{t} example."),
+        ("What are the parts of {t}?", "{t} components."),
+        ("What happens without {t}?", "{t} deficiency."),
+        ("How is {t} measured?", "{t} assays."),
+        ("Who first described {t}?", "{t} pioneers."),
+        ("Where does {t} occur?", "{t} location."),
+        ("When was {t} discovered?", "{t} history."),
+        ("What controls {t}?", "{t} regulation."),
+        ("How is {t} studied?", "{t} methods."),
+    ]
+    REQUEST = re.compile(r'create (\d+) (flashcards|multiple choice)', re.IGNORECASE)
+    AVOID_MARKER = "Do not repeat any of these existing questions:"
+
+    def __init__(self, topics: list, latency: float = 0.2, seconds_per_item: float = 0.05):
+        super().__init__(latency=latency)
+        self.topics = topics
+        self.seconds_per_item = seconds_per_item
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs):
+        self.calls += 1
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = "".join(part for part in parts if isinstance(part, str))
+        self.prompt_chars.append(len(prompt))
+        match = self.REQUEST.search(prompt)
+        count, kind = (int(match.group(1)), match.group(2).lower()) if match else (0, "flashcards")
+        items = self.make_items(prompt, count, kind)
+        time.sleep(self.latency + self.seconds_per_item * count)
+        return FakeResponse(json.dumps(items), len(prompt))
+
+    def make_items(self, prompt: str, count: int, kind: str) -> list:
+        """``count`` flashcards or MCQs about the topics in ``prompt``."""
+        body, _, avoid_block = prompt.partition(self.AVOID_MARKER)
+        avoid = {line[2:] for line in avoid_block.splitlines() if line.startswith("- ")}
+        present = [t for t in self.topics if t in body] or ["this document"]
+        pool = [
+            (question.format(t=topic), answer.format(t=topic))
+            for question, answer in self.TEMPLATES
+            for topic in present
+        ]
+        fresh = [pair for pair in pool if pair[0] not in avoid] or pool
+
+        items = []
+        for i in range(count):
+            question, answer = fresh[i % len(fresh)]
+            if kind == "flashcards":
+                items.append({"question": question, "answer": answer})
+            else:
+                items.append({
+                    "question": question,
+                    "options": [answer] + [f"Distractor {letter}" for letter in "BCD"],
+                    "correctIndex": 0,
+                })
+        return items
+
+
+class FakeStudyModel(FakeItemModel):
+    """
+    Fake model for every endpoint: flashcard and MCQ prompts get items
+    (as :class:`FakeItemModel`), study pack prompts a JSON object with the
+    requested parts, and anything else (questions, summaries) ``reply``.
+    Streams like :class:`FakeModel`.
+    """
+
+    STUDY_PACK = re.compile(r'"(summary|flashcards|mcqs)":(?: (\d+))?')
+    STUDY_PACK_MARKER = "Study material JSON:"
+
+    def __init__(
+        self,
+        topics: list,
+        latency: float = 0.2,
+        seconds_per_item: float = 0.05,
+        reply: str = "This is a fake answer that covers the question in a couple of sentences.",
+        output_tokens_per_second: Optional[float] = None
+    ):
+        super().__init__(topics, latency, seconds_per_item)
+        self.reply = reply
+        self.output_tokens_per_second = output_tokens_per_second
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs):
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = "".join(part for part in parts if isinstance(part, str))
+        if self.REQUEST.search(prompt):
+            return super().generate_content(contents, stream, **kwargs)
+        return FakeModel.generate_content(self, contents, stream, **kwargs)
+
+    def reply_to(self, prompt: str) -> str:
+        if self.STUDY_PACK_MARKER not in prompt:
+            return self.reply
+        pack = {}
+        for part, count in self.STUDY_PACK.findall(prompt.partition("with these keys:")[2]):
+            if part == "summary":
+                pack["summary"] = self.reply
+            else:
+                pack[part] = self.make_items(prompt, int(count or 0), "flashcards" if part == "flashcards" else "mcq")
+        return json.dumps(pack)
+
+
+class FakePodcastGenerator:
+    """
+    Stand-in for podcastfy's ``generate_podcast`` with a fake LLM and TTS.
+
+    Sleeps ``script_latency`` for writing the script plus
+    ``seconds_per_1k_chars`` per thousand source characters for speech
+    synthesis, then writes ``audio_bytes`` of fake audio to a temporary
+    file and returns its path, like podcastfy does.
+    """
+
+    def __init__(self, script_latency: float = 0.5, seconds_per_1k_chars: float = 0.05, audio_bytes: int = 64 * 1024):
+        self.script_latency = script_latency
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+        self.audio_bytes = audio_bytes
+        self.calls = 0
+
+    def __call__(self, text: str = "", **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.script_latency + self.seconds_per_1k_chars * len(text) / 1000)
+        fd, path = tempfile.mkstemp(suffix=".mp3", prefix="fake-podcast-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"ID3" + os.urandom(self.audio_bytes))
+        return path
+
+
+class FakeContextBackend:
+    """
+    Local stand-in for provider-side context caching around a fake model.
+
+    Cached prefixes are kept in memory; the model bound to one only sees
+    (and is timed on) the parts sent with each call, like a model reading
+    the prefix from the provider's cache.
+    """
+
+    def __init__(self, model: FakeModel):
+        self.model = model
+        self.created = 0
+        self.deleted = 0
+
+    def supports(self, model: Any) -> bool:
+        return model is self.model
+
+    def create(self, parts: list, ttl: int, display_name: str) -> dict:
+        self.created += 1
+        return {"name": f"cachedContents/{self.created}", "parts": parts}
+
+    def model_for(self, handle: dict) -> FakeModel:
+        return self.model
+
+    def token_count(self, handle: dict):
+        return sum(len(part) for part in handle["parts"] if isinstance(part, str)) // 4
+
+    def refresh(self, handle: dict, ttl: int):
+        pass
+
+    def delete(self, handle: dict):
+        self.deleted += 1
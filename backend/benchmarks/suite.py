@@ -0,0 +1,263 @@
+"""
+Offline benchmark suite: extraction, endpoints, concurrency and memory.
+
+Runs entirely in-process against a deterministic fake Gemini model and a
+fake podcastfy/TTS, so no API keys or network are needed:
+
+- extraction throughput for generated PDF, DOCX, PPTX and image fixtures
+  of several sizes, with each file's Python memory high-water mark
+- per-endpoint latency distributions, uploading a fresh document for
+  every iteration so caches do not hide the model path
+- /ask throughput and latency at increasing concurrency
+- the process's peak RSS after each phase
+
+Prints (or writes) JSON; compare two runs with benchmarks.compare.
+
+Usage (from backend/):
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --quick --latency 0.01
+"""
+from benchmarks.environment import isolate_app_data
+
+# Keep caches and stored documents in memory and podcasts out of the repo,
+# before main and the services read their settings
+isolate_app_data()
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+from services.llm import configure_client
+from services.podcast import configure_podcast_generator
+from services.document import extract_document
+from benchmarks.fakes import FakePodcastGenerator, FakeStudyModel
+from benchmarks.corpus import TOPICS, fixture_corpus, make_pdf
+from main import app
+
+POLL_SECONDS = 0.02
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def distribution(seconds: list) -> dict:
+    """Latency summary in milliseconds."""
+    ms = [s * 1000 for s in seconds]
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.mean(ms), 2),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p90_ms": round(percentile(ms, 90), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def extraction(corpus: list, repeats: int) -> dict:
+    """Time and memory to extract each fixture file."""
+    results = {}
+    for name, filename, data in corpus:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            extracted = extract_document(data, filename)
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        extract_document(data, filename)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        seconds = statistics.median(times)
+        results[name] = {
+            "file_mb": round(len(data) / 1e6, 3),
+            "pages": extracted.pages,
+            "median_s": round(seconds, 4),
+            "mb_per_s": round(len(data) / 1e6 / seconds, 2),
+            "pages_per_s": round(extracted.pages / seconds, 1),
+            "python_peak_mb": round(peak / 1e6, 2),
+        }
+    return results
+
+
+async def timed(timings: dict, endpoint: str, request) -> httpx.Response:
+    start = time.perf_counter()
+    response = await request
+    timings.setdefault(endpoint, []).append(time.perf_counter() - start)
+    body = response.json() if response.headers.get("content-type", "").startswith("application/json") else None
+    if response.status_code != 200 or (body is not None and body.get("success") is False):
+        timings.setdefault("errors", []).append(f"{endpoint}: {response.status_code} {body}")
+    return response
+
+
+async def podcast_round_trip(client: httpx.AsyncClient, document_id: str) -> None:
+    """Start a podcast job and poll it until it finishes."""
+    job = (await client.post("/podcast", json={"document_id": document_id, "language": "English"})).json()
+    while job.get("status") in ("queued", "running"):
+        await asyncio.sleep(POLL_SECONDS)
+        job = (await client.get(f"/podcast/jobs/{job['job_id']}")).json()
+    if job.get("status") != "completed":
+        raise Exception(f"Podcast job failed: {job.get('error')}")
+
+
+async def endpoints(client: httpx.AsyncClient, iterations: int, pages: int) -> dict:
+    """Latency of every endpoint, on a new document each iteration."""
+    timings = {}
+    for i in range(iterations):
+        pdf = make_pdf(pages, seed=1000 + i)
+        upload = await timed(timings, "/upload/raw", client.post(
+            f"/upload/raw?filename=bench{i}.pdf&document_id=bench{i}", content=pdf
+        ))
+        document_id = upload.json()["document_id"]
+        topic = TOPICS[i % len(TOPICS)]
+        await timed(timings, "/ask", client.post(
+            "/ask", json={"document_id": document_id, "question": f"What is {topic}?"}
+        ))
+        await timed(timings, "/ask/stream", client.post(
+            "/ask/stream", json={"document_id": document_id, "question": f"How does {topic} work?"}
+        ))
+        await timed(timings, "/summary", client.post(
+            "/summary", json={"document_id": document_id, "summary_type": "short"}
+        ))
+        await timed(timings, "/summary/stream", client.post(
+            "/summary/stream", json={"document_id": document_id, "summary_type": "bullet"}
+        ))
+        await timed(timings, "/flashcards", client.post("/flashcards", json={"document_id": document_id, "count": 8}))
+        await timed(timings, "/mcqs", client.post("/mcqs", json={"document_id": document_id, "count": 5}))
+        await timed(timings, "/study-pack", client.post(
+            "/study-pack", json={"document_id": document_id, "summary_type": "detailed"}
+        ))
+        start = time.perf_counter()
+        await podcast_round_trip(client, document_id)
+        timings.setdefault("/podcast (job)", []).append(time.perf_counter() - start)
+
+    errors = timings.pop("errors", [])
+    report = {endpoint: distribution(seconds) for endpoint, seconds in timings.items()}
+    if errors:
+        report["errors"] = errors[:10]
+    return report
+
+
+async def concurrency(client: httpx.AsyncClient, levels: list, requests_per_level: int) -> dict:
+    """/ask throughput and latency with ``level`` requests in flight at a time."""
+    pdf = make_pdf(20, seed=999)
+    document_id = (await client.post("/upload/raw?filename=scaling.pdf", content=pdf)).json()["document_id"]
+    report = {}
+    for level in levels:
+        questions = iter(range(requests_per_level))
+        latencies = []
+
+        async def worker():
+            # Distinct questions, so the answer cache never serves them
+            for n in questions:
+                start = time.perf_counter()
+                await client.post("/ask", json={
+                    "document_id": document_id, "question": f"Question {level}-{n} about {TOPICS[n % len(TOPICS)]}{n}?"
+                })
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(level)])
+        wall = time.perf_counter() - start
+        report[str(level)] = {
+            "requests_per_s": round(len(latencies) / wall, 2),
+            **distribution(latencies),
+        }
+    return report
+
+
+async def run(args) -> dict:
+    model = FakeStudyModel(
+        TOPICS, latency=args.latency, seconds_per_item=args.latency / 10,
+        output_tokens_per_second=args.tokens_per_second
+    )
+    configure_client(model)
+    podcasts = FakePodcastGenerator(script_latency=args.latency * 5)
+    configure_podcast_generator(podcasts)
+
+    sizes = ("small",) if args.quick else ("small", "medium", "large")
+    results = {"extraction": extraction(fixture_corpus(sizes), args.repeats)}
+    results["rss_after_extraction_mb"] = peak_rss_mb()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        results["endpoints"] = await endpoints(client, args.iterations, args.pages)
+        results["rss_after_endpoints_mb"] = peak_rss_mb()
+        results["concurrency"] = await concurrency(client, args.levels, args.requests_per_level)
+        results["rss_after_concurrency_mb"] = peak_rss_mb()
+        metrics_text = (await client.get("/metrics")).text
+
+    results["model_calls"] = model.calls
+    results["podcast_generations"] = podcasts.calls
+    results["llm_tokens"] = {
+        line.split("direction=\"")[1].split("\"")[0]: float(line.rsplit(" ", 1)[1])
+        for line in metrics_text.splitlines() if line.startswith("study_llm_tokens_total") and "endpoint=\"/ask\"" in line
+    }
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="small fixtures and few iterations")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model seconds per call")
+    parser.add_argument("--tokens-per-second", type=float, default=2000, help="fake model output rate")
+    parser.add_argument("--repeats", type=int, default=3, help="extractions per fixture")
+    parser.add_argument("--iterations", type=int, default=10, help="documents sent through every endpoint")
+    parser.add_argument("--pages", type=int, default=20, help="pages per endpoint document")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64], help="concurrency levels")
+    parser.add_argument("--requests-per-level", type=int, default=64)
+    args = parser.parse_args()
+    if args.quick:
+        args.repeats, args.iterations, args.requests_per_level = 1, 3, 16
+
+    started = time.time()
+    results = asyncio.run(run(args))
+    report = {
+        "suite": "offline",
+        "commit": git_commit(),
+        "started_at": started,
+        "duration_s": round(time.time() - started, 1),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
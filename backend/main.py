@@ -11,22 +11,50 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+# Load services/.env before any service module reads its settings at import time
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'services', '.env'))
+
+import asyncio
+import json
+import time
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from typing import AsyncIterator, Callable, Optional
 from pathlib import Path
 import uvicorn
 
 from models.schemas import (
-    QuestionRequest, SummaryRequest, FlashcardRequest, MCQRequest,
-    AIResponse, FlashcardsResponse, MCQsResponse, ExtractedText,
+    QuestionRequest, SummaryRequest, FlashcardRequest, MCQRequest, StudyPackRequest,
+    AIResponse, FlashcardsResponse, MCQsResponse, StudyPackResponse, ExtractedText,
     ExtractBase64Request, PodcastRequest, PodcastResponse
 )
-from services.document import extract_text_from_file, decode_base64_file
-from services.gemini import ask_question, generate_summary, generate_flashcards, generate_mcqs
-from services.podcast import generate_podcast_from_text, get_podcast_path, PODCAST_OUTPUT_DIR
+from services.document import decode_base64_file, DocumentContent, FileSource, ImageData
+from services.gemini import (
+    ask_question, generate_summary, generate_flashcards, generate_mcqs,
+    ask_question_stream, generate_summary_stream, generate_study_pack,
+    estimate_document_tokens, context_cache, STUDY_PACK_PARTS, MODEL_NAME, PROMPT_VERSIONS
+)
+from services.cache import response_cache, make_cache_key
+from services.qa_cache import qa_cache
+from services.structured import structured_metrics
+from services.retrieval import build_index
+from services.store import document_store, StoredDocument, make_document_id, document_id_from_sha256
+from services.uploads import (
+    UploadSizeLimitMiddleware, UploadTooLargeError, spool_file, spool_stream, too_large_message,
+    upload_deduplicator, UPLOAD_MAX_BYTES
+)
+from services.podcast import (
+    submit_podcast_job, find_cached_podcast, podcast_jobs, podcast_cache,
+    get_podcast_path, PODCAST_OUTPUT_DIR
+)
+from services.jobs import COMPLETED, FAILED
+from services import metrics
+from services.media import media_response
 
 # Create FastAPI app
 app = FastAPI(
@@ -35,6 +63,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Endpoints whose request body is an uploaded file
+UPLOAD_PATHS = {"/upload", "/upload/raw", "/extract-base64"}
+
+# Added before CORS so that CORS wraps it and its 413 reaches the browser
+app.add_middleware(UploadSizeLimitMiddleware, paths=UPLOAD_PATHS)
+
 # Configure CORS for frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -44,8 +78,126 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for extracted document text
-document_cache = {}
+
+def route_template(scope: dict) -> str:
+    """The path of the route handling a request (e.g. ``/podcast/jobs/{job_id}``), for metric labels."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+app.add_middleware(metrics.RequestMetricsMiddleware, endpoint_of=route_template)
+
+
+# How often to check whether the client is still waiting for an AI response
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """Raised when the HTTP client goes away before the response is ready."""
+
+
+async def run_until_disconnect(http_request: Request, coro):
+    """Await an AI call, cancelling it if the HTTP client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                raise ClientDisconnected("Client disconnected before the response was ready")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class UnknownDocumentError(Exception):
+    """Raised when a request references a document the server does not hold."""
+
+
+async def resolve_document(document_id: str, document_text: Optional[str] = None) -> DocumentContent:
+    """
+    Return what the AI services should receive for a request: the stored
+    image for image documents, otherwise the text sent with the request or
+    the stored text for ``document_id``.
+    """
+    document = await document_store.lookup(document_id)
+    if document is not None and document.image is not None:
+        return document.image
+    if document_text:
+        return document_text
+    if document is None:
+        raise UnknownDocumentError(
+            f"Unknown document_id '{document_id}'. Please upload the document first."
+        )
+    return document.text
+
+
+async def get_question_index(document_id: str, document: DocumentContent):
+    """Reuse the retrieval index built at upload time if the text is unchanged."""
+    if isinstance(document, ImageData):
+        return None
+    stored = await document_store.lookup(document_id)
+    if stored and stored.text == document:
+        return stored.index
+    return build_index(document)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_events(
+    chunks: AsyncIterator[str],
+    on_complete: Optional[Callable[[str], None]] = None,
+    cached: bool = False
+) -> AsyncIterator[str]:
+    """
+    Relay model output as SSE ``token`` events, then a ``done`` event with
+    metadata (including whether the text came from a cache), or an
+    ``error`` event if generation fails.
+
+    Starlette cancels this generator when the client disconnects, which in
+    turn stops the model stream.
+    """
+    start = time.perf_counter()
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+    except Exception as e:
+        yield sse_event("error", {"success": False, "error": str(e)})
+        return
+    
+    text = "".join(parts)
+    if on_complete is not None:
+        on_complete(text)
+    yield sse_event("done", {
+        "success": True,
+        "cached": cached,
+        "chunks": len(parts),
+        "chars": len(text),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000)
+    })
+
+
+async def single_event_stream(event: str, data: dict) -> AsyncIterator[str]:
+    """An SSE stream consisting of one event."""
+    yield sse_event(event, data)
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE event stream, disabling proxy buffering."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/")
@@ -54,32 +206,83 @@ async def root():
     return {"status": "ok", "message": "Study Companion API is running"}
 
 
+async def store_upload(
+    source: FileSource,
+    filename: str,
+    size_bytes: int,
+    document_id: str,
+    find_previous: Callable[[], Optional[StoredDocument]],
+    holder: Optional[str] = None
+) -> ExtractedText:
+    """Store an upload (extracting it unless an identical file is stored or in progress)."""
+    document, pages_reused, deduplicated = await upload_deduplicator.ingest(
+        source, filename, size_bytes, document_id, find_previous, holder
+    )
+    return ExtractedText(
+        success=True,
+        text=document.text,
+        pages=document.pages,
+        document_id=document.document_id,
+        pages_reused=pages_reused,
+        deduplicated=deduplicated
+    )
+
+
 @app.post("/upload", response_model=ExtractedText)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    previous_document_id: Optional[str] = Form(None)
+):
     """
     Upload a document and extract its text content.
     Supports PDF, DOCX, and PPTX files.
+
+    Identical files are extracted once and shared (``deduplicated`` is
+    set). Pages unchanged since the previous version
+    (``previous_document_id``) are reused.
     """
     try:
-        # Read file bytes
-        file_bytes = await file.read()
-        
-        # Extract text based on file type
-        text, pages = extract_text_from_file(file_bytes, file.filename)
-        
-        # Store in cache with filename as key
-        document_id = file.filename
-        document_cache[document_id] = {
-            "text": text,
-            "pages": pages,
-            "filename": file.filename
-        }
-        
+        # Copy the file to disk in chunks instead of reading it into memory
+        with await run_in_threadpool(spool_file, file.file) as upload:
+            # Store under a content-hash ID so identical names never collide
+            return await store_upload(
+                upload.path, file.filename, upload.size, document_id_from_sha256(upload.sha256),
+                lambda: document_store.get(previous_document_id) if previous_document_id else None
+            )
+    except Exception as e:
         return ExtractedText(
-            success=True,
-            text=text,
-            pages=pages
+            success=False,
+            error=str(e)
         )
+
+
+@app.post("/upload/raw", response_model=ExtractedText)
+async def upload_raw(
+    request: Request,
+    filename: str,
+    document_id: Optional[str] = None,
+    previous_document_id: Optional[str] = None
+):
+    """
+    Upload a document as the raw request body (any content type).
+
+    The body is streamed to disk, so memory use does not grow with the
+    file. ``document_id`` is the client's own ID for the document, which
+    will resolve to the stored one; pages unchanged since
+    ``previous_document_id`` (or else that ID's earlier upload) are
+    reused. Only the uploader's own documents are looked at, never
+    another upload that happens to have the same filename.
+    """
+    try:
+        earlier_id = previous_document_id or document_id
+        with await spool_stream(request.stream()) as upload:
+            return await store_upload(
+                upload.path, filename, upload.size, document_id_from_sha256(upload.sha256),
+                lambda: document_store.get(earlier_id) if earlier_id else None,
+                holder=document_id
+            )
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"success": False, "error": str(e)})
     except Exception as e:
         return ExtractedText(
             success=False,
@@ -87,30 +290,25 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
-@app.post("/extract-base64", response_model=ExtractedText)
+@app.post("/extract-base64", response_model=ExtractedText, deprecated=True)
 async def extract_from_base64(request: ExtractBase64Request):
     """
     Extract text from a base64-encoded document.
-    Used when files are uploaded via the frontend.
+    Deprecated: the whole file is held in memory several times over;
+    upload to /upload/raw instead.
     """
     try:
         # Decode base64 to bytes
         file_bytes = decode_base64_file(request.base64_data)
+        if len(file_bytes) > UPLOAD_MAX_BYTES:
+            raise UploadTooLargeError(too_large_message(UPLOAD_MAX_BYTES))
         
-        # Extract text
-        text, pages = extract_text_from_file(file_bytes, request.filename)
-        
-        # Store in cache
-        document_cache[request.document_id] = {
-            "text": text,
-            "pages": pages,
-            "filename": request.filename
-        }
-        
-        return ExtractedText(
-            success=True,
-            text=text,
-            pages=pages
+        # Extract text, reusing pages unchanged since the client's previous upload, and
+        # store under a content-hash ID that the client's ID resolves to
+        return await store_upload(
+            file_bytes, request.filename, len(file_bytes), make_document_id(file_bytes),
+            lambda: document_store.get(request.document_id),
+            holder=request.document_id
         )
     except Exception as e:
         return ExtractedText(
@@ -119,56 +317,154 @@ async def extract_from_base64(request: ExtractBase64Request):
         )
 
 
+@app.delete("/documents/{document_id}")
+async def release_document(document_id: str):
+    """
+    Release the reference a client's upload holds on a shared document,
+    given the client's own ID for it (content-hash IDs are not accepted).
+    The document is deleted when no uploads refer to it.
+    """
+    references = await run_in_threadpool(document_store.release, document_id)
+    if references is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"success": True, "references": references}
+
+
+def question_cache_key(document: DocumentContent) -> str:
+    """Answer-cache namespace for a document: its content, the model and the question prompts."""
+    return make_cache_key("ask", document, MODEL_NAME, PROMPT_VERSIONS["question"])
+
+
+def cache_answer(cache_key: str, request: QuestionRequest, answer: str):
+    """Remember an answer along with the document ID, model and prompt version that produced it."""
+    qa_cache.store(
+        cache_key, request.question, answer, request.document_id, MODEL_NAME, PROMPT_VERSIONS["question"]
+    )
+
+
 @app.post("/ask", response_model=AIResponse)
-async def ask(request: QuestionRequest):
-    """Ask a question about the document."""
+async def ask(request: QuestionRequest, http_request: Request):
+    """Ask a question about the document, reusing answers to the same or near-identical questions."""
     try:
-        # Get document text from cache or request
-        document_text = request.document_text
-        if not document_text and request.document_id in document_cache:
-            document_text = document_cache[request.document_id]["text"]
+        # Get document text from the store or request
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = question_cache_key(document)
+        hit = qa_cache.lookup(cache_key, request.question)
+        if hit is not None:
+            return AIResponse(success=True, data=hit[0].answer, cached=True)
         
-        if not document_text:
-            return AIResponse(
-                success=False,
-                error="No document text available. Please upload a document first."
-            )
-        
-        response = await ask_question(
+        response = await run_until_disconnect(http_request, ask_question(
             request.question,
-            document_text,
-            request.document_id
-        )
+            document,
+            request.document_id,
+            await get_question_index(request.document_id, document),
+            # Keyed by content: the client's ID may be shared by unrelated documents
+            session_id=cache_key
+        ))
+        cache_answer(cache_key, request, response)
         
-        return AIResponse(success=True, data=response)
+        return AIResponse(success=True, data=response, cached=False)
     except Exception as e:
         return AIResponse(success=False, error=str(e))
 
 
+@app.post("/ask/stream")
+async def ask_stream(request: QuestionRequest):
+    """Ask a question about the document, streaming the answer as Server-Sent Events."""
+    try:
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = question_cache_key(document)
+        hit = qa_cache.lookup(cache_key, request.question)
+        index = None if hit else await get_question_index(request.document_id, document)
+    except Exception as e:
+        return sse_response(single_event_stream("error", {"success": False, "error": str(e)}))
+    
+    if hit is not None:
+        async def replay() -> AsyncIterator[str]:
+            yield hit[0].answer
+        return sse_response(stream_events(replay(), cached=True))
+    
+    return sse_response(stream_events(
+        ask_question_stream(
+            request.question,
+            document,
+            request.document_id,
+            index,
+            session_id=cache_key
+        ),
+        on_complete=lambda text: cache_answer(cache_key, request, text)
+    ))
+
+
 @app.post("/summary", response_model=AIResponse)
-async def summarize(request: SummaryRequest):
+async def summarize(request: SummaryRequest, http_request: Request):
     """Generate a summary of the document."""
     try:
-        response = await generate_summary(
-            request.document_text,
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = make_cache_key(
+            "summary", document, MODEL_NAME, PROMPT_VERSIONS["summary"],
+            summary_type=request.summary_type
+        )
+        cached = await response_cache.lookup(cache_key)
+        if cached is not None:
+            return AIResponse(success=True, data=cached, cached=True)
+
+        response = await run_until_disconnect(http_request, generate_summary(
+            document,
             request.document_id,
             request.summary_type
-        )
+        ))
+        response_cache.set(cache_key, response)
         
-        return AIResponse(success=True, data=response)
+        return AIResponse(success=True, data=response, cached=False)
     except Exception as e:
         return AIResponse(success=False, error=str(e))
 
 
+@app.post("/summary/stream")
+async def summarize_stream(request: SummaryRequest):
+    """Generate a summary of the document, streaming it as Server-Sent Events."""
+    try:
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = make_cache_key(
+            "summary", document, MODEL_NAME, PROMPT_VERSIONS["summary"],
+            summary_type=request.summary_type
+        )
+        cached = await response_cache.lookup(cache_key)
+    except Exception as e:
+        return sse_response(single_event_stream("error", {"success": False, "error": str(e)}))
+    
+    if cached is not None:
+        async def replay() -> AsyncIterator[str]:
+            yield cached
+        return sse_response(stream_events(replay(), cached=True))
+    
+    return sse_response(stream_events(
+        generate_summary_stream(document, request.document_id, request.summary_type),
+        on_complete=lambda text: response_cache.set(cache_key, text)
+    ))
+
+
 @app.post("/flashcards", response_model=FlashcardsResponse)
-async def create_flashcards(request: FlashcardRequest):
+async def create_flashcards(request: FlashcardRequest, http_request: Request):
     """Generate flashcards from the document."""
     try:
-        flashcards = await generate_flashcards(
-            request.document_text,
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = make_cache_key(
+            "flashcards", document, MODEL_NAME, PROMPT_VERSIONS["flashcards"],
+            count=request.count
+        )
+        cached = await response_cache.lookup(cache_key)
+        if cached is not None:
+            return FlashcardsResponse(success=True, flashcards=cached)
+
+        flashcards = await run_until_disconnect(http_request, generate_flashcards(
+            document,
             request.document_id,
             request.count
-        )
+        ))
+        if flashcards:
+            response_cache.set(cache_key, flashcards)
         
         return FlashcardsResponse(success=True, flashcards=flashcards)
     except Exception as e:
@@ -176,50 +472,269 @@ async def create_flashcards(request: FlashcardRequest):
 
 
 @app.post("/mcqs", response_model=MCQsResponse)
-async def create_mcqs(request: MCQRequest):
+async def create_mcqs(request: MCQRequest, http_request: Request):
     """Generate MCQ questions from the document."""
     try:
-        mcqs = await generate_mcqs(
-            request.document_text,
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_key = make_cache_key(
+            "mcqs", document, MODEL_NAME, PROMPT_VERSIONS["mcqs"],
+            count=request.count
+        )
+        cached = await response_cache.lookup(cache_key)
+        if cached is not None:
+            return MCQsResponse(success=True, mcqs=cached)
+
+        mcqs = await run_until_disconnect(http_request, generate_mcqs(
+            document,
             request.document_id,
             request.count
-        )
+        ))
+        if mcqs:
+            response_cache.set(cache_key, mcqs)
         
         return MCQsResponse(success=True, mcqs=mcqs)
     except Exception as e:
         return MCQsResponse(success=False, error=str(e))
 
 
+@app.post("/study-pack", response_model=StudyPackResponse)
+async def create_study_pack(request: StudyPackRequest, http_request: Request):
+    """
+    Generate a summary, flashcards and MCQs in one model pass.
+
+    Parts already in the response cache are reused; the rest are produced
+    together and cached under the same keys as /summary, /flashcards and
+    /mcqs, so those endpoints hit the cache afterwards.
+    """
+    try:
+        document = await resolve_document(request.document_id, request.document_text)
+        cache_keys = {
+            "summary": make_cache_key(
+                "summary", document, MODEL_NAME, PROMPT_VERSIONS["summary"],
+                summary_type=request.summary_type
+            ),
+            "flashcards": make_cache_key(
+                "flashcards", document, MODEL_NAME, PROMPT_VERSIONS["flashcards"],
+                count=request.flashcard_count
+            ),
+            "mcqs": make_cache_key(
+                "mcqs", document, MODEL_NAME, PROMPT_VERSIONS["mcqs"],
+                count=request.mcq_count
+            ),
+        }
+        pack = {part: await response_cache.lookup(cache_keys[part]) for part in STUDY_PACK_PARTS}
+        cached = [part for part in STUDY_PACK_PARTS if pack[part] is not None]
+        missing = [part for part in STUDY_PACK_PARTS if pack[part] is None]
+        
+        model_calls = 0
+        if missing:
+            generated = await run_until_disconnect(http_request, generate_study_pack(
+                document,
+                request.document_id,
+                missing,
+                request.summary_type,
+                request.flashcard_count,
+                request.mcq_count
+            ))
+            model_calls = generated["model_calls"]
+            for part in missing:
+                pack[part] = generated.get(part)
+                if pack[part]:
+                    response_cache.set(cache_keys[part], pack[part])
+        
+        # Separate requests would each have sent the document once for every part
+        # generated now; parts served from the cache cost nothing either way
+        tokens_saved = estimate_document_tokens(document) * max(0, len(missing) - model_calls)
+        
+        return StudyPackResponse(
+            success=True,
+            summary=pack["summary"],
+            flashcards=pack["flashcards"],
+            mcqs=pack["mcqs"],
+            cached=cached,
+            llm_calls=model_calls,
+            tokens_saved=tokens_saved
+        )
+    except Exception as e:
+        return StudyPackResponse(success=False, error=str(e))
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Report response cache hit/miss counters."""
+    return response_cache.stats()
+
+
+@app.get("/qa-cache/stats")
+async def qa_cache_stats():
+    """Report exact and semantic answer-cache hits for /ask."""
+    return qa_cache.stats()
+
+
+@app.get("/context-cache/stats")
+async def context_cache_stats():
+    """Report cached document contexts and input tokens saved per question session."""
+    return context_cache.stats()
+
+
+@app.get("/generation/stats")
+async def generation_stats():
+    """Report structured-output parse failures, rejected items and retry rates."""
+    return structured_metrics.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latencies, token counts, cache hits and parse failures in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def cache_events():
+    """(cache, result) counts from every cache's stats, for /metrics."""
+    response = response_cache.stats()
+    qa = qa_cache.stats()
+    podcast = podcast_cache.stats()
+    uploads = upload_deduplicator.stats()
+    context = context_cache.stats()
+    return [
+        (("response", "hit"), response["hits"]),
+        (("response", "miss"), response["misses"]),
+        (("qa", "hit"), qa["exact_hits"]),
+        (("qa", "semantic_hit"), qa["semantic_hits"]),
+        (("qa", "miss"), qa["misses"]),
+        (("podcast", "hit"), podcast["hits"]),
+        (("podcast", "miss"), podcast["misses"]),
+        (("upload", "hit"), uploads["stored_hits"]),
+        (("upload", "shared_extraction"), uploads["shared_hits"]),
+        (("upload", "miss"), uploads["extractions"]),
+        (("context", "hit"), context["cached_questions"]),
+        (("context", "created"), context["created"]),
+    ]
+
+
+def structured_events():
+    """(kind, event) counters of structured generation, for /metrics."""
+    return [
+        ((kind, event), counters[event])
+        for kind, counters in structured_metrics.stats().items()
+        for event in ("responses", "parse_failures", "partial_parses", "rejected_items", "retries")
+    ]
+
+
+metrics.collector(
+    "study_cache_events_total", "Cache lookups by cache and result.", "counter",
+    ("cache", "result"), cache_events
+)
+metrics.collector(
+    "study_structured_output_total", "Structured generation responses, parse failures and retries.", "counter",
+    ("kind", "event"), structured_events
+)
+metrics.collector(
+    "study_context_cache_tokens_saved_total", "Input tokens not resent thanks to cached contexts.", "counter",
+    (), lambda: [((), context_cache.stats()["tokens_saved"])]
+)
+metrics.collector(
+    "study_podcast_jobs", "Podcast jobs held by the job manager, by status.", "gauge",
+    ("status",), lambda: [((status,), count) for status, count in podcast_jobs.stats().items()]
+)
+metrics.collector(
+    "study_documents_resident_bytes", "Memory held by stored documents.", "gauge",
+    (), lambda: [((), document_store.resident_bytes)]
+)
+
+
+@app.get("/documents/stats")
+async def document_stats():
+    """Report document store memory use, eviction and upload deduplication counters."""
+    return {**document_store.stats(), "uploads": upload_deduplicator.stats()}
+
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    """Report a stored document's filename, page count, size and upload time (pass its ID or the client's own)."""
+    document = await document_store.lookup(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document.metadata()
+
+
+def podcast_job_response(job, deduplicated: Optional[bool] = None) -> PodcastResponse:
+    """Describe a podcast job, including the audio URL once it has finished."""
+    response = PodcastResponse(
+        success=job.status != FAILED,
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        deduplicated=deduplicated,
+        error=job.error
+    )
+    if job.status == COMPLETED:
+        response.audio_url = f"/podcasts/{job.result['audio_file']}"
+        response.filename = job.result["audio_file"]
+        response.message = job.result["message"]
+    return response
+
+
 @app.post("/podcast", response_model=PodcastResponse)
 async def create_podcast(request: PodcastRequest):
-    """Generate a podcast from document content using podcastfy with ElevenLabs TTS."""
+    """
+    Start generating a podcast from document content using podcastfy with
+    ElevenLabs TTS. Returns a job ID to poll at /podcast/jobs/{job_id}.
+    """
     try:
-        result = await generate_podcast_from_text(
-            request.document_text,
-            request.document_id,
-            request.language
-        )
+        document = await resolve_document(request.document_id, request.document_text)
+        if isinstance(document, ImageData):
+            return PodcastResponse(
+                success=False,
+                error="Podcasts can only be generated from text documents, not images."
+            )
+        
+        # Name the document by its stored filename rather than the client's own ID,
+        # so everyone uploading the same file shares one podcast
+        stored = await document_store.lookup(request.document_id)
+        document_name = stored.filename if stored is not None else request.document_id
         
-        if result["success"]:
+        # Previously generated audio is returned without starting a job
+        cached = await run_in_threadpool(
+            find_cached_podcast, document, document_name, request.language
+        )
+        if cached is not None:
             return PodcastResponse(
                 success=True,
-                audio_url=f"/podcasts/{result['audio_file']}",
-                filename=result["audio_file"],
-                message=result["message"]
+                status=COMPLETED,
+                audio_url=f"/podcasts/{cached['audio_file']}",
+                filename=cached["audio_file"],
+                message=cached["message"]
             )
-        else:
-            return PodcastResponse(success=False, error=result["error"])
+        
+        job, deduplicated = submit_podcast_job(document, document_name, request.language)
+        return podcast_job_response(job, deduplicated)
     except Exception as e:
         return PodcastResponse(success=False, error=str(e))
 
 
-@app.get("/podcasts/{filename}")
-async def get_podcast(filename: str):
-    """Serve a generated podcast audio file."""
+@app.get("/podcast/jobs/{job_id}", response_model=PodcastResponse)
+async def get_podcast_job(job_id: str):
+    """Report the status of a podcast job."""
+    job = podcast_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Podcast job not found")
+    return podcast_job_response(job)
+
+
+@app.get("/podcast/cache/stats")
+async def podcast_cache_stats():
+    """Report podcast cache hits, misses and disk usage, and podcast jobs by status."""
+    return {**podcast_cache.stats(), "jobs": podcast_jobs.stats()}
+
+
+@app.api_route("/podcasts/{filename}", methods=["GET", "HEAD"])
+async def get_podcast(filename: str, request: Request):
+    """Serve a generated podcast audio file with range and conditional request support."""
     file_path = get_podcast_path(filename)
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(status_code=404, detail="Podcast not found")
-    return FileResponse(file_path, media_type="audio/mpeg", filename=filename)
+    return await media_response(file_path, request, "audio/mpeg", filename)
 
 
 # Mount podcasts directory for static file serving
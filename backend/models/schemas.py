@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class DocumentRequest(BaseModel):
@@ -14,30 +14,38 @@ class QuestionRequest(BaseModel):
 class SummaryRequest(BaseModel):
     document_id: str
     summary_type: str  # 'short', 'detailed', 'bullet'
-    document_text: str
+    document_text: Optional[str] = None
 
 class FlashcardRequest(BaseModel):
     document_id: str
     count: int = 8
-    document_text: str
+    document_text: Optional[str] = None
 
 class MCQRequest(BaseModel):
     document_id: str
     count: int = 5
-    document_text: str
+    document_text: Optional[str] = None
+
+class StudyPackRequest(BaseModel):
+    document_id: str
+    summary_type: str = 'short'  # 'short', 'detailed', 'bullet'
+    flashcard_count: int = 8
+    mcq_count: int = 5
+    document_text: Optional[str] = None
 
 class Flashcard(BaseModel):
-    question: str
-    answer: str
+    question: str = Field(min_length=1)
+    answer: str = Field(min_length=1)
 
 class MCQ(BaseModel):
-    question: str
-    options: List[str]
-    correctIndex: int
+    question: str = Field(min_length=1)
+    options: List[str] = Field(min_length=4, max_length=4)
+    correctIndex: int = Field(ge=0, le=3)  # 0-based index into options
 
 class AIResponse(BaseModel):
     success: bool
     data: Optional[str] = None
+    cached: Optional[bool] = None
     error: Optional[str] = None
 
 class FlashcardsResponse(BaseModel):
@@ -50,10 +58,23 @@ class MCQsResponse(BaseModel):
     mcqs: Optional[List[MCQ]] = None
     error: Optional[str] = None
 
+class StudyPackResponse(BaseModel):
+    success: bool
+    summary: Optional[str] = None
+    flashcards: Optional[List[Flashcard]] = None
+    mcqs: Optional[List[MCQ]] = None
+    cached: Optional[List[str]] = None  # parts served from the response cache
+    llm_calls: Optional[int] = None
+    tokens_saved: Optional[int] = None  # estimated input tokens saved vs. separate requests
+    error: Optional[str] = None
+
 class ExtractedText(BaseModel):
     success: bool
     text: Optional[str] = None
     pages: Optional[int] = None
+    document_id: Optional[str] = None
+    pages_reused: Optional[int] = None
+    deduplicated: Optional[bool] = None
     error: Optional[str] = None
 
 class ExtractBase64Request(BaseModel):
@@ -63,11 +84,15 @@ class ExtractBase64Request(BaseModel):
 
 class PodcastRequest(BaseModel):
     document_id: str
-    document_text: str
+    document_text: Optional[str] = None
     language: str = "Tamil"
 
 class PodcastResponse(BaseModel):
     success: bool
+    job_id: Optional[str] = None
+    status: Optional[str] = None  # 'queued', 'running', 'completed', 'failed'
+    progress: Optional[str] = None
+    deduplicated: Optional[bool] = None
     audio_url: Optional[str] = None
     filename: Optional[str] = None
     message: Optional[str] = None
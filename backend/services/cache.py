@@ -0,0 +1,241 @@
+import os
+import json
+import atexit
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services.document import DocumentContent, ImageData
+
+# On-disk tier location; set RESPONSE_CACHE_DB to an empty string to keep the cache in memory only
+RESPONSE_CACHE_DB = os.getenv(
+    "RESPONSE_CACHE_DB",
+    str(Path(__file__).parent.parent / "data" / "response_cache.db")
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_DISK_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "20000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def make_cache_key(
+    operation: str,
+    document: DocumentContent,
+    model_name: str,
+    prompt_version: str,
+    **params
+) -> str:
+    """Build a content-addressed cache key for a model operation on a text or image document."""
+    digest = hashlib.sha256()
+    header = json.dumps(
+        {"op": operation, "model": model_name, "prompt": prompt_version, "params": params},
+        sort_keys=True
+    )
+    digest.update(header.encode("utf-8"))
+    digest.update(b"\0")
+    if isinstance(document, ImageData):
+        digest.update(document.mime_type.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(document.data)
+    else:
+        digest.update(document.encode("utf-8", errors="surrogatepass"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for model responses.
+
+    Entries live in an in-memory LRU and, when ``db_path`` is set, in a
+    SQLite file that survives restarts. Values must be JSON-serialisable.
+    Both tiers expire entries after ``ttl_seconds`` and evict the least
+    recently used entries once they exceed their size limit.
+
+    Writes reach the memory tier at once and are written to SQLite in
+    batches by a background thread, so :meth:`set` never waits for the
+    disk. :meth:`get` reads the disk tier on a memory miss; async code
+    uses :meth:`lookup`, which does that read in a thread.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = RESPONSE_CACHE_MAX_DISK_ENTRIES
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Serialises use of the connection; taken before _lock when both are needed
+        self._db_lock = threading.Lock()
+        # Waiting for the writer thread: new entries, and disk hits' access times
+        self._pending: Dict[str, tuple[float, Any]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._dirty = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key``, or None on a miss."""
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def lookup(self, key: str) -> Optional[Any]:
+        """:meth:`get` for the event loop: the disk tier is read in a thread."""
+        value = self._get_memory(key)
+        if value is not None or self._db is None:
+            return value if value is not None else self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            for tier in (self._memory, self._pending):
+                entry = tier.get(key)
+                if entry is not None and now - entry[0] <= self.ttl_seconds:
+                    if key in self._memory:
+                        self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+            self._memory.pop(key, None)
+            return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        now = time.time()
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            # Expired rows are deleted by the writer's next batch
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self._accessed[key] = now
+                self._dirty.set()
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store ``value`` under ``key`` in every tier."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._pending[key] = (now, value)
+                self._start_writer()
+                self._dirty.set()
+
+    def flush(self):
+        """Write every pending entry to disk now."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                accessed, self._accessed = self._accessed, {}
+            if not pending and not accessed:
+                return
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), created_at, created_at) for key, (created_at, value) in pending.items()]
+            )
+            self._db.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in accessed.items()]
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+            self._writer.start()
+            # The writer is a daemon thread, so write what it has not yet written at exit
+            atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            self._dirty.wait()
+            self._dirty.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Entries stay cached in memory; keep writing later batches
+                print(f"Response cache write failed: {e}")
+
+    def _remember(self, key: str, created_at: float, value: Any):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self, now: float):
+        self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            with self._lock:
+                self.evictions += overflow
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes."""
+        disk_entries = None
+        if self._db is not None:
+            with self._db_lock:
+                (disk_entries,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "pending_writes": len(self._pending),
+            }
+
+
+# Shared cache for summaries, flashcards and MCQs
+response_cache = ResponseCache(db_path=RESPONSE_CACHE_DB or None)
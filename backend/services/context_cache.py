@@ -0,0 +1,249 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import datetime
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Provider-side cached contexts let a study session send its document once
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "1") == "1"
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "1800"))
+# Providers refuse to cache prompts shorter than this
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+# After a failed create, send the document inline for this long before trying again
+CONTEXT_CACHE_RETRY_SECONDS = 300
+
+
+class GeminiContextBackend:
+    """Creates and manages Gemini cached contents with ``google.generativeai``."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def supports(self, model: Any) -> bool:
+        # A model can only be a GenerativeModel once google.generativeai is loaded
+        genai = sys.modules.get("google.generativeai")
+        return genai is not None and isinstance(model, genai.GenerativeModel)
+
+    def create(self, parts: list, ttl: int, display_name: str) -> Any:
+        from google.generativeai import caching
+        return caching.CachedContent.create(
+            model=self.model_name,
+            display_name=display_name[:128],
+            contents=parts,
+            ttl=datetime.timedelta(seconds=ttl)
+        )
+
+    def model_for(self, handle: Any) -> Any:
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+    def token_count(self, handle: Any) -> Optional[int]:
+        usage = getattr(handle, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None)
+
+    def refresh(self, handle: Any, ttl: int):
+        handle.update(ttl=datetime.timedelta(seconds=ttl))
+
+    def delete(self, handle: Any):
+        handle.delete()
+
+
+def prefix_fingerprint(parts: list) -> str:
+    """Hash of the prompt prefix parts (text and inline image bytes)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, dict):
+            digest.update(part["mime_type"].encode("utf-8"))
+            digest.update(part["data"])
+        else:
+            digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedContext:
+    """One document's cached prefix and the usage of the session built on it."""
+    fingerprint: str
+    handle: Any
+    model: Any
+    tokens: int
+    created_at: float
+    expires_at: float
+    questions: int = 0
+    tokens_saved: int = 0
+
+
+class ContextCache:
+    """
+    Provider-side cached contexts, one per session key. Callers key
+    sessions by the document's content, so everyone asking about the
+    same document shares its context and different documents never
+    replace each other's.
+
+    The first question about a document uploads its prompt prefix as a
+    cached context; later questions send only the task and reference the
+    cache. Each use pushes the expiry back to ``ttl`` seconds once less
+    than half of it is left, and a context whose document changed or that
+    expired is replaced. Whenever a context is unavailable (no backend,
+    the model in use is not the backend's, the prefix is too small, or
+    the provider refuses) callers get None and send the prompt inline.
+    """
+
+    COUNTERS = ("created", "refreshed", "expired", "replaced", "failures", "cached_questions", "tokens_saved")
+
+    def __init__(
+        self,
+        backend: Any = None,
+        ttl: int = CONTEXT_CACHE_TTL_SECONDS,
+        min_tokens: int = CONTEXT_CACHE_MIN_TOKENS
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._contexts: Dict[str, CachedContext] = {}
+        self._creating: Dict[str, asyncio.Lock] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def configure(self, backend: Any):
+        """Swap the backend (e.g. a fake in benchmarks), dropping every known context."""
+        with self._lock:
+            self.backend = backend
+            self._contexts.clear()
+            self._failed_at.clear()
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _expire(self, now: float):
+        """
+        Forget contexts past their TTL (the provider deletes them on its
+        own), failures old enough to retry, and the creation locks of
+        sessions that have no context and are not creating one.
+        """
+        with self._lock:
+            expired = [key for key, context in self._contexts.items() if context.expires_at <= now]
+            for key in expired:
+                del self._contexts[key]
+            self._counters["expired"] += len(expired)
+            for key in [key for key, failed_at in self._failed_at.items() if now - failed_at >= CONTEXT_CACHE_RETRY_SECONDS]:
+                del self._failed_at[key]
+            for key in [key for key, lock in self._creating.items() if key not in self._contexts and not lock.locked()]:
+                del self._creating[key]
+
+    async def acquire(self, session_id: str, prefix: list, tokens: int, model: Any) -> Optional[CachedContext]:
+        """
+        Cached context holding ``prefix`` for ``session_id``, creating or
+        refreshing it as needed, or None to send the prefix inline.
+        ``model`` is the model the caller would otherwise use.
+        """
+        backend = self.backend
+        if backend is None or tokens < self.min_tokens or not backend.supports(model):
+            return None
+        now = time.time()
+        self._expire(now)
+        if session_id in self._failed_at:
+            return None
+
+        fingerprint = prefix_fingerprint(prefix)
+        async with self._creating.setdefault(session_id, asyncio.Lock()):
+            context = self._contexts.get(session_id)
+            if context is not None and context.fingerprint != fingerprint:
+                # The document changed; its old context would answer from stale content
+                self.invalidate(session_id)
+                self._count("replaced")
+                context = None
+
+            if context is None:
+                try:
+                    handle = await asyncio.to_thread(backend.create, prefix, self.ttl, session_id)
+                except Exception:
+                    self._record_failure(session_id)
+                    return None
+                now = time.time()
+                context = CachedContext(
+                    fingerprint=fingerprint,
+                    handle=handle,
+                    model=backend.model_for(handle),
+                    tokens=backend.token_count(handle) or tokens,
+                    created_at=now,
+                    expires_at=now + self.ttl
+                )
+                with self._lock:
+                    self._contexts[session_id] = context
+                self._count("created")
+                return context
+
+            if context.expires_at - now < self.ttl / 2:
+                try:
+                    await asyncio.to_thread(backend.refresh, context.handle, self.ttl)
+                    context.expires_at = time.time() + self.ttl
+                    self._count("refreshed")
+                except Exception:
+                    pass
+            return context
+
+    def record_use(self, context: CachedContext):
+        """
+        Count a question answered from ``context``. Every question after
+        the one that created it saves sending the cached prefix again.
+        """
+        with self._lock:
+            if context.questions:
+                context.tokens_saved += context.tokens
+                self._counters["tokens_saved"] += context.tokens
+            context.questions += 1
+            self._counters["cached_questions"] += 1
+
+    def _record_failure(self, session_id: str):
+        """Send ``session_id``'s prefix inline for CONTEXT_CACHE_RETRY_SECONDS before trying again."""
+        with self._lock:
+            self._failed_at[session_id] = time.time()
+            self._counters["failures"] += 1
+
+    def invalidate(self, session_id: str, failed: bool = False):
+        """
+        Drop the context for ``session_id`` and delete it at the provider in
+        the background. Pass ``failed`` when a call using it failed, so the
+        session does not create a new context again right away.
+        """
+        if failed:
+            self._record_failure(session_id)
+        with self._lock:
+            context = self._contexts.pop(session_id, None)
+        if context is not None and self.backend is not None:
+            threading.Thread(target=self._delete, args=(context.handle,), daemon=True).start()
+
+    def _delete(self, handle: Any):
+        try:
+            self.backend.delete(handle)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Counters plus input tokens saved per live session."""
+        now = time.time()
+        self._expire(now)
+        with self._lock:
+            return {
+                "enabled": self.backend is not None,
+                "ttl_seconds": self.ttl,
+                "active_contexts": len(self._contexts),
+                **self._counters,
+                "sessions": {
+                    session_id: {
+                        "questions": context.questions,
+                        "cached_tokens": context.tokens,
+                        "tokens_saved": context.tokens_saved,
+                        "expires_in_s": round(context.expires_at - now),
+                    }
+                    for session_id, context in self._contexts.items()
+                },
+            }
@@ -0,0 +1,93 @@
+import os
+import zlib
+from typing import List, Set
+
+import numpy as np
+
+from services.retrieval import tokenize
+
+# Estimated Jaccard similarity above which two items count as duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+MINHASH_PERMUTATIONS = 64
+# 32 bands of 2 rows: pairs near the threshold almost always share a bucket
+MINHASH_BANDS = 32
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingles(text: str, k: int = 1) -> Set[int]:
+    """
+    Hashed word ``k``-grams of the normalized text (lowercase, no
+    punctuation or stopwords). Single words work best for short
+    question/answer pairs, where paraphrases rarely share longer runs.
+    """
+    words = tokenize(text)
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + k]).encode("utf-8"))
+        for i in range(len(words) - k + 1)
+    }
+
+
+class MinHasher:
+    """MinHash signatures for estimating Jaccard similarity between shingle sets."""
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE_PRIME, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, permutations, dtype=np.uint64)
+
+    def signature(self, shingle_set: Set[int]) -> np.ndarray:
+        if not shingle_set:
+            return np.full(len(self.a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        # Overflow wraps modulo 2**64 before the reduction; fine for hashing
+        hashed = (values[:, None] * self.a + self.b) % _MERSENNE_PRIME
+        return hashed.min(axis=0)
+
+
+class NearDuplicateFilter:
+    """
+    Remembers texts and flags new ones that nearly repeat an earlier one.
+
+    Signatures are bucketed with LSH banding, so each check only compares
+    against texts that share a band instead of every text seen so far.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        permutations: int = MINHASH_PERMUTATIONS,
+        bands: int = MINHASH_BANDS
+    ):
+        self.threshold = threshold
+        self.hasher = MinHasher(permutations)
+        self.rows = permutations // bands
+        self.bands = bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, text: str) -> bool:
+        """Remember ``text`` unless it is a near-duplicate. Returns True if it was added."""
+        signature = self.hasher.signature(shingles(text))
+        if self._match(signature):
+            return False
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(index)
+        return True
+
+    def _match(self, signature: np.ndarray) -> bool:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        return any(
+            np.mean(self._signatures[i] == signature) >= self.threshold
+            for i in candidates
+        )
@@ -1,93 +1,340 @@
 import io
-import fitz  # PyMuPDF
-from docx import Document as DocxDocument
-from pptx import Presentation
+import os
+import zlib
+import hashlib
+import tempfile
+import threading
 import base64
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, AbstractSet, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-def extract_text_from_pdf(file_bytes: bytes, max_pages: int = 20) -> tuple[str, int]:
-    """Extract text from PDF bytes."""
+from services.metrics import trace
+
+# The extractors for each file type (PyMuPDF, python-docx, python-pptx,
+# Pillow) are imported on first use, so the API starts without them
+if TYPE_CHECKING:
+    import fitz
+
+
+# DOCX has no real pages, so paragraphs are grouped into estimated pages of this size
+DOCX_CHARS_PER_PAGE = 3000
+# About one paragraph in this many can end a page (see iter_docx_pages)
+DOCX_PAGE_BOUNDARY_MODULUS = 8
+
+# PDFs with at least this many pages are extracted in a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+
+# Images are downscaled at upload to what the vision model actually uses
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1536"))
+IMAGE_JPEG_QUALITY = 85
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp']
+
+# File types extracted as page records (see extract_pages_from_file)
+PAGED_EXTENSIONS = ['pdf', 'docx', 'pptx']
+
+
+# An uploaded file: its bytes, or the path of the file it was spooled to
+FileSource = Union[bytes, Path]
+
+
+def open_source(source: FileSource) -> BinaryIO:
+    """Open an uploaded file for reading without loading a spooled file into memory."""
+    if isinstance(source, Path):
+        return open(source, "rb")
+    return io.BytesIO(source)
+
+
+def read_source(source: FileSource) -> bytes:
+    """The whole content of an uploaded file."""
+    if isinstance(source, Path):
+        return source.read_bytes()
+    return source
+
+
+def open_pdf(source: FileSource) -> "fitz.Document":
+    """Open a PDF; spooled files are read from disk on demand."""
+    import fitz  # PyMuPDF
+    if isinstance(source, Path):
+        return fitz.open(str(source), filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+@dataclass
+class DocumentPage:
+    """Extracted text of one page, slide or paragraph."""
+    kind: str  # 'Page', 'Slide' or 'Paragraph'
+    number: int
+    text: str
+    fingerprint: str = ""  # hash of the page's source content; see fingerprint()
+
+
+def fingerprint(data: bytes) -> str:
+    """Content hash identifying a page's source, so unchanged pages can be reused across uploads."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def reuse_map(previous: Optional[Iterable[DocumentPage]]) -> Dict[str, str]:
+    """Map each previously extracted page's fingerprint to its text."""
+    return {page.fingerprint: page.text for page in previous or () if page.fingerprint}
+
+
+@dataclass
+class ImageData:
+    """Raw bytes of an image document, ready to send to the vision model."""
+    mime_type: str
+    data: bytes
+
+
+# What the AI services receive: extracted text, or an image for the vision model
+DocumentContent = Union[str, ImageData]
+
+
+@dataclass
+class ExtractedDocument:
+    """Result of extracting an uploaded file."""
+    text: str
+    pages: int
+    chunks: List[DocumentPage]
+    image: Optional[ImageData] = None
+    pages_reused: int = 0  # pages copied from a previous version instead of re-extracted
+
+    @property
+    def content(self) -> DocumentContent:
+        return self.image if self.image is not None else self.text
+
+
+def pdf_page_fingerprint(page, digests: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    Fingerprint a PDF page from everything its text depends on, which is
+    much cheaper than extracting the text: its content stream, the form
+    XObjects it draws (merge and imposition tools put each page's content
+    in one, behind an identical ``/fzFrm0 Do``), its images, and its fonts
+    with their ToUnicode maps. Referenced objects are hashed by content,
+    not object number; ``digests`` memoises them across a document's pages.
+    """
+    doc = page.parent
+    digests = {} if digests is None else digests
+
+    def stream_digest(xref: int) -> bytes:
+        if xref not in digests:
+            digests[xref] = hashlib.sha256(doc.xref_stream_raw(xref) or b"").digest()
+        return digests[xref]
+
+    def font_digest(xref: int) -> bytes:
+        if xref <= 0:
+            return b""
+        kind, value = doc.xref_get_key(xref, "ToUnicode")
+        return stream_digest(int(value.split()[0])) if kind == "xref" else b""
+
+    # Resource names are what the content streams refer to, so they are hashed too
+    parts = sorted(
+        # Form XObjects, including those nested in other forms
+        [b"X" + name.encode("utf-8") + stream_digest(xref) for xref, name, *_ in page.get_xobjects()]
+        + [b"I" + image[7].encode("utf-8") + stream_digest(image[0]) for image in page.get_images(full=True)]
+        + [
+            b"F" + f"{font[4]}/{font[3]}/{font[5]}".encode("utf-8") + font_digest(font[0])
+            for font in page.get_fonts(full=True)
+        ]
+    )
+    return fingerprint(page.read_contents() + b"\0" + b"\0".join(parts))
+
+
+def fingerprint_pdf_pages(
+    doc: "fitz.Document",
+    page_indexes: Iterable[int],
+    known: AbstractSet[str] = frozenset()
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Fingerprint the given 0-based pages and extract the text of those
+    whose fingerprint is not in ``known`` (``None`` for the rest).
+    """
+    digests = {}
+    results = []
+    for page_num in page_indexes:
+        page = doc[page_num]
+        page_fingerprint = pdf_page_fingerprint(page, digests)
+        results.append((page_fingerprint, None if page_fingerprint in known else page.get_text()))
+    return results
+
+
+def _extract_pdf_pages(
+    path: str,
+    page_indexes: List[int],
+    known: AbstractSet[str]
+) -> List[Tuple[str, Optional[str]]]:
+    """fingerprint_pdf_pages() on the PDF at ``path`` (runs in a worker process)."""
+    doc = open_pdf(Path(path))
     try:
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        num_pages = len(doc)
-        pages_to_read = min(num_pages, max_pages)
-        
-        full_text = ""
-        for page_num in range(pages_to_read):
-            page = doc[page_num]
-            text = page.get_text()
-            full_text += f"\n--- Page {page_num + 1} ---\n{text}"
-        
+        return fingerprint_pdf_pages(doc, page_indexes, known)
+    finally:
         doc.close()
-        
-        # Limit text length to avoid token limits
-        if len(full_text) > 50000:
-            full_text = full_text[:50000] + "\n\n[Content truncated...]"
-        
-        return full_text, num_pages
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
+
+def pdf_pool_context():
+    """Start workers from a clean server process (forkserver), or spawn them where that is unavailable."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared PDF extraction pool, resizing it if needed."""
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)
+            # Forking the multi-threaded server process can deadlock the children
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=pdf_pool_context())
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+
+def extract_pdf_pages_parallel(
+    source: FileSource,
+    workers: Optional[int] = None,
+    reuse: Optional[Dict[str, str]] = None
+) -> List[DocumentPage]:
+    """
+    Extract PDF pages across a process pool and return them in page order.
+
+    Workers fingerprint their pages as they go; pages found in ``reuse``
+    keep their previous text and only the rest are extracted. Each worker
+    opens the file with its own fitz document, so the PDF is not pickled
+    per task; bytes are first written once to a temporary file. PDFs with
+    fewer than PDF_PARALLEL_MIN_PAGES pages, or ``workers <= 1``, are
+    handled inline.
+    """
+    workers = workers or PDF_EXTRACT_WORKERS
+    reuse = reuse or {}
+    known = frozenset(reuse)
+    try:
+        with open_pdf(source) as doc:
+            page_count = doc.page_count
+            inline = workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES
+            if inline:
+                results = fingerprint_pdf_pages(doc, range(page_count), known)
     except Exception as e:
         raise Exception(f"Failed to extract PDF text: {str(e)}")
+    
+    if not inline:
+        # A few batches per worker keeps cores busy when some pages are slower
+        num_batches = min(page_count, workers * 4)
+        bounds = [page_count * i // num_batches for i in range(num_batches + 1)]
+        batches = [list(range(bounds[i], bounds[i + 1])) for i in range(num_batches)]
+        
+        if isinstance(source, Path):
+            path, temporary = str(source), False
+        else:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(source)
+            path, temporary = tmp.name, True
+        try:
+            pool = get_pdf_pool(workers)
+            futures = [pool.submit(_extract_pdf_pages, path, batch, known) for batch in batches]
+            results = [result for future in futures for result in future.result()]
+        except Exception as e:
+            raise Exception(f"Failed to extract PDF text: {str(e)}")
+        finally:
+            if temporary:
+                os.unlink(path)
+    
+    return [
+        DocumentPage("Page", i + 1, reuse[page_fingerprint] if text is None else text, page_fingerprint)
+        for i, (page_fingerprint, text) in enumerate(results)
+    ]
 
 
-def extract_text_from_docx(file_bytes: bytes) -> tuple[str, int]:
-    """Extract text from DOCX bytes."""
+def iter_docx_paragraphs(source: FileSource) -> Iterator[DocumentPage]:
+    """Yield DOCX paragraphs, followed by one record per table row."""
     try:
-        doc = DocxDocument(io.BytesIO(file_bytes))
-        
-        full_text = ""
-        page_count = 1
-        
+        from docx import Document as DocxDocument
+        with open_source(source) as file:
+            doc = DocxDocument(file)
+        number = 0
         for para in doc.paragraphs:
-            full_text += para.text + "\n"
+            number += 1
+            yield DocumentPage("Paragraph", number, para.text)
         
         # Also extract text from tables
         for table in doc.tables:
             for row in table.rows:
-                for cell in row.cells:
-                    full_text += cell.text + " "
-                full_text += "\n"
-        
-        # Estimate page count (roughly 3000 chars per page)
-        page_count = max(1, len(full_text) // 3000)
-        
-        # Limit text length
-        if len(full_text) > 50000:
-            full_text = full_text[:50000] + "\n\n[Content truncated...]"
-        
-        return full_text, page_count
+                number += 1
+                yield DocumentPage("Paragraph", number, " ".join(cell.text for cell in row.cells))
     except Exception as e:
         raise Exception(f"Failed to extract DOCX text: {str(e)}")
 
 
-def extract_text_from_pptx(file_bytes: bytes) -> tuple[str, int]:
-    """Extract text from PPTX bytes."""
+def iter_docx_pages(source: FileSource) -> Iterator[DocumentPage]:
+    """
+    Group DOCX paragraphs into estimated pages of about DOCX_CHARS_PER_PAGE
+    characters.
+
+    Once a page is half full it ends after a paragraph chosen by that
+    paragraph's content hash (or at twice the target size), so inserting
+    or editing a paragraph only moves the page boundaries around it and
+    the pages elsewhere keep their text and fingerprint.
+    """
+    lines = []
+    size = 0
+    number = 0
+    for para in iter_docx_paragraphs(source):
+        lines.append(para.text)
+        size += len(para.text) + 1
+        boundary = zlib.crc32(para.text.encode("utf-8")) % DOCX_PAGE_BOUNDARY_MODULUS == 0
+        if size >= 2 * DOCX_CHARS_PER_PAGE or (size >= DOCX_CHARS_PER_PAGE // 2 and boundary):
+            number += 1
+            text = "\n".join(lines) + "\n"
+            yield DocumentPage("Page", number, text, fingerprint(text.encode("utf-8")))
+            lines, size = [], 0
+    if lines or number == 0:
+        text = "\n".join(lines) + "\n"
+        yield DocumentPage("Page", number + 1, text, fingerprint(text.encode("utf-8")))
+
+
+def iter_pptx_slides(source: FileSource, reuse: Optional[Dict[str, str]] = None) -> Iterator[DocumentPage]:
+    """
+    Yield the text of every PPTX slide, one slide at a time. Slides whose
+    XML fingerprint is in ``reuse`` take their text from it.
+    """
+    reuse = reuse or {}
     try:
-        prs = Presentation(io.BytesIO(file_bytes))
-        
-        full_text = ""
-        slide_count = len(prs.slides)
-        
+        from pptx import Presentation
+        with open_source(source) as file:
+            prs = Presentation(file)
         for i, slide in enumerate(prs.slides):
-            full_text += f"\n--- Slide {i + 1} ---\n"
-            
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    full_text += shape.text + "\n"
-        
-        # Limit text length
-        if len(full_text) > 50000:
-            full_text = full_text[:50000] + "\n\n[Content truncated...]"
-        
-        return full_text, slide_count
+            slide_fingerprint = fingerprint(slide.part.blob)
+            text = reuse.get(slide_fingerprint)
+            if text is None:
+                text = "".join(shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text"))
+            yield DocumentPage("Slide", i + 1, text, slide_fingerprint)
     except Exception as e:
         raise Exception(f"Failed to extract PPTX text: {str(e)}")
 
 
-def extract_text_from_image(file_bytes: bytes, filename: str) -> tuple[str, int]:
+def pages_to_text(pages: Iterable[DocumentPage]) -> str:
+    """Join page records into a single string with ``--- Page N ---`` markers."""
+    return "".join(f"\n--- {page.kind} {page.number} ---\n{page.text}" for page in pages)
+
+
+def extract_image(source: FileSource, filename: str) -> ImageData:
     """
-    For images, we return a placeholder indicating it's an image.
-    The actual image processing will be done by Gemini's vision capability.
+    Prepare an image for Gemini's vision capability.
+
+    Large images are downscaled to IMAGE_MAX_DIMENSION and recompressed
+    once here, so every later request sends the smaller bytes as-is.
+    Animated or unreadable images are kept as uploaded.
     """
-    # Return the image as base64 for Gemini to process
     ext = filename.lower().split('.')[-1]
     mime_types = {
         'jpg': 'image/jpeg',
@@ -99,29 +346,99 @@ def extract_text_from_image(file_bytes: bytes, filename: str) -> tuple[str, int]
     }
     mime_type = mime_types.get(ext, 'image/jpeg')
     
-    # Return a marker that this is an image and include the base64 data
-    base64_data = base64.b64encode(file_bytes).decode('utf-8')
-    return f"[IMAGE_DATA:{mime_type}:{base64_data}]", 1
+    try:
+        from PIL import Image
+        with open_source(source) as file, Image.open(file) as img:
+            if getattr(img, "is_animated", False):
+                return ImageData(mime_type, read_source(source))
+            resized = max(img.size) > IMAGE_MAX_DIMENSION
+            if resized:
+                img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+            
+            out = io.BytesIO()
+            if img.mode in ("RGBA", "LA", "P"):
+                # Keep transparency
+                img.save(out, format="PNG", optimize=True)
+                prepared = ImageData("image/png", out.getvalue())
+            else:
+                img.convert("RGB").save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+                prepared = ImageData("image/jpeg", out.getvalue())
+    except Exception:
+        return ImageData(mime_type, read_source(source))
+    
+    size = source.stat().st_size if isinstance(source, Path) else len(source)
+    if resized or len(prepared.data) < size:
+        return prepared
+    return ImageData(mime_type, read_source(source))
+
+
+def image_placeholder(filename: str) -> str:
+    """Text shown in place of an image document's content."""
+    return f"[Image: {filename}]"
 
 
-def extract_text_from_file(file_bytes: bytes, filename: str) -> tuple[str, int]:
-    """Extract text from a file based on its extension."""
+def extract_pages_from_file(
+    source: FileSource,
+    filename: str,
+    reuse: Optional[Dict[str, str]] = None
+) -> List[DocumentPage]:
+    """
+    Extract a document as page-addressable records, reusing the text of
+    pages whose fingerprint is in ``reuse``.
+
+    Returns an empty list for file types that have no text pages
+    (images and the legacy .doc/.ppt formats).
+    """
     ext = filename.lower().split('.')[-1]
     
     if ext == 'pdf':
-        return extract_text_from_pdf(file_bytes)
+        return extract_pdf_pages_parallel(source, reuse=reuse)
     elif ext == 'docx':
-        return extract_text_from_docx(file_bytes)
-    elif ext in ['doc']:
+        # Paragraph text is needed to fingerprint a DOCX page, so there is nothing to skip
+        return list(iter_docx_pages(source))
+    elif ext == 'pptx':
+        return list(iter_pptx_slides(source, reuse))
+    return []
+
+
+def extract_document(
+    source: FileSource,
+    filename: str,
+    previous: Optional[List[DocumentPage]] = None
+) -> ExtractedDocument:
+    """
+    Extract a document's text, page count and page records (or image) in
+    a single pass. ``source`` is the file's bytes or the path it was
+    spooled to. Pass the pages of an earlier version as ``previous`` to
+    reuse every page that has not changed.
+    """
+    ext = filename.lower().split('.')[-1]
+    with trace("extract", file_type=ext):
+        if ext in IMAGE_EXTENSIONS:
+            return ExtractedDocument(image_placeholder(filename), 1, [], extract_image(source, filename))
+        
+        if ext in PAGED_EXTENSIONS:
+            reuse = reuse_map(previous)
+            pages = extract_pages_from_file(source, filename, reuse)
+            pages_reused = sum(1 for page in pages if page.fingerprint in reuse)
+            return ExtractedDocument(pages_to_text(pages), len(pages), pages, pages_reused=pages_reused)
+        text, page_count = extract_text_from_file(source, filename)
+        return ExtractedDocument(text, page_count, [])
+
+
+def extract_text_from_file(source: FileSource, filename: str) -> tuple[str, int]:
+    """Text for file types without page records (see extract_pages_from_file for the rest)."""
+    ext = filename.lower().split('.')[-1]
+    
+    if ext in ['doc']:
         # Old .doc format - not directly supported, return error message
         return "[This is an older .doc format. Please convert to .docx for better support.]", 1
-    elif ext == 'pptx':
-        return extract_text_from_pptx(file_bytes)
     elif ext in ['ppt']:
         # Old .ppt format - not directly supported
         return "[This is an older .ppt format. Please convert to .pptx for better support.]", 1
-    elif ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp']:
-        return extract_text_from_image(file_bytes, filename)
+    elif ext in IMAGE_EXTENSIONS:
+        # The image itself is sent to the vision model; see extract_image()
+        return image_placeholder(filename), 1
     else:
         raise Exception(f"Unsupported file type: {ext}")
 
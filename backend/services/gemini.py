@@ -1,256 +1,525 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-import json
-import re
-import base64
-from typing import List, Dict
-
-# Load environment variables from .env
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
-
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+import asyncio
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
+
+from services.llm import get_client, set_default_model, LLMTimeoutError
+from services.document import DocumentContent, ImageData
+from services.retrieval import BM25Index, Chunk, RETRIEVAL_TOP_K, format_passages, group_sections
+from services.structured import (
+    generate_items, generate_items_by_section, parse_object, validate_items, distinct_items,
+    record_parse, array_schema, json_mode, structured_metrics, MAP_REDUCE_CONCURRENCY
+)
+from services.cache import response_cache, make_cache_key
+from services.context_cache import ContextCache, CachedContext, GeminiContextBackend, CONTEXT_CACHE_ENABLED
+from services.metrics import trace
+from services.prompts import (
+    MAX_CONTEXT_CHARS, SUMMARY_INSTRUCTIONS, fit_to_context, render, render_task, document_prefix,
+    format_avoid, prompt_version,
+    QUESTION, QUESTION_PASSAGES, SUMMARY, SUMMARY_FROM_SECTIONS, SECTION_SUMMARY,
+    FLASHCARDS, MCQS, STUDY_PACK, STUDY_PACK_FIELDS
+)
+from models.schemas import Flashcard, MCQ
 
 # Use Gemini 2.0 Flash (supports vision)
-model = genai.GenerativeModel('gemini-2.5-flash-preview-09-2025')
-
-
-def parse_image_data(document_text: str) -> tuple[bool, str, bytes]:
-    """Check if the document text is actually image data and parse it."""
-    if document_text.startswith("[IMAGE_DATA:"):
-        # Extract image data: [IMAGE_DATA:mime_type:base64_data]
-        match = re.match(r'\[IMAGE_DATA:([^:]+):(.+)\]', document_text)
-        if match:
-            mime_type = match.group(1)
-            base64_data = match.group(2)
-            image_bytes = base64.b64decode(base64_data)
-            return True, mime_type, image_bytes
-    return False, "", b""
-
-
-async def ask_question(question: str, document_text: str, document_name: str) -> str:
-    """Ask a question about the document content."""
+MODEL_NAME = 'gemini-2.5-flash-preview-09-2025'
+
+
+def create_gemini_model() -> Any:
+    """
+    Configure the Gemini API with GEMINI_API_KEY and create the model.
+    google.generativeai is only imported here, on the first model call.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+# Prompt versions per cached operation, from every template that can
+# produce its result (study packs fill the same cache entries)
+PROMPT_VERSIONS = {
+    "question": prompt_version("question", "question_passages"),
+    "summary": prompt_version(
+        "summary", "summary_from_sections", "section_summary", "study_pack", "study_pack_summary"
+    ),
+    "section_summary": prompt_version("section_summary"),
+    "flashcards": prompt_version("flashcards", "avoid", "study_pack", "study_pack_flashcards"),
+    "mcqs": prompt_version("mcqs", "avoid", "study_pack", "study_pack_mcqs"),
+}
+
+# Model calls run on a bounded executor. The Gemini model is only created on
+# the first call; install another model (e.g. a fake) with configure_client()
+set_default_model(create_gemini_model)
+
+# Question sessions keep their document in a provider-side cached context
+context_cache = ContextCache(GeminiContextBackend(MODEL_NAME) if CONTEXT_CACHE_ENABLED else None)
+
+
+def build_question_contents(
+    question: str,
+    document: DocumentContent,
+    document_name: str,
+    index: Optional[BM25Index] = None
+) -> list:
+    """
+    Build the model input for a question about the document.
+
+    When a retrieval index is given, only the top-ranked passages are sent
+    to the model instead of the whole document.
+    """
+    if index is not None and not isinstance(document, ImageData):
+        # Retrieval-based question: send only the most relevant passages
+        results = index.search(question, RETRIEVAL_TOP_K)
+        if not results:
+            results = [(chunk, 0.0) for chunk in index.chunks[:RETRIEVAL_TOP_K]]
+        return render(QUESTION_PASSAGES, format_passages(results), document_name, question=question)
+    return render(QUESTION, document, document_name, question=question)
+
+
+async def question_contents(
+    question: str,
+    document: DocumentContent,
+    document_name: str,
+    index: Optional[BM25Index],
+    session_id: Optional[str]
+) -> Tuple[Optional[CachedContext], list]:
+    """
+    The model input for a question, plus the cached context to send it
+    against. Documents that fit in one prompt are cached whole for the
+    session, so only the question is sent; without a context (or for
+    longer documents, which use retrieval) the full prompt is sent.
+    """
+    if session_id and (isinstance(document, ImageData) or len(document) <= MAX_CONTEXT_CHARS):
+        with trace("context_cache"):
+            context = await context_cache.acquire(
+                session_id,
+                document_prefix(document),
+                estimate_document_tokens(document),
+                get_client().model
+            )
+        if context is not None:
+            return context, render_task(QUESTION, document_name, question=question)
+    with trace("prompt"):
+        return None, build_question_contents(question, document, document_name, index)
+
+
+async def ask_question(
+    question: str,
+    document: DocumentContent,
+    document_name: str,
+    index: Optional[BM25Index] = None,
+    session_id: Optional[str] = None
+) -> str:
+    """
+    Ask a question about the document content. Questions with the same
+    ``session_id`` (a content ID of the document) share a cached copy of
+    the document where possible.
+    """
+    try:
+        context, contents = await question_contents(question, document, document_name, index, session_id)
+        if context is not None:
+            try:
+                answer = await get_client().generate_text(contents, model=context.model)
+                context_cache.record_use(context)
+                return answer
+            except LLMTimeoutError:
+                raise
+            except Exception:
+                # e.g. the provider dropped the context early; ask without it
+                context_cache.invalidate(session_id, failed=True)
+                contents = build_question_contents(question, document, document_name, index)
+        return await get_client().generate_text(contents)
+    except Exception as e:
+        raise Exception(f"Gemini API error: {str(e)}")
+
+
+async def ask_question_stream(
+    question: str,
+    document: DocumentContent,
+    document_name: str,
+    index: Optional[BM25Index] = None,
+    session_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Ask a question about the document content, yielding the answer as it is generated."""
+    try:
+        context, contents = await question_contents(question, document, document_name, index, session_id)
+        if context is not None:
+            started = False
+            try:
+                async for chunk in get_client().stream_text(contents, model=context.model):
+                    started = True
+                    yield chunk
+                context_cache.record_use(context)
+                return
+            except LLMTimeoutError:
+                raise
+            except Exception:
+                if started:
+                    raise
+                context_cache.invalidate(session_id, failed=True)
+                contents = build_question_contents(question, document, document_name, index)
+        async for chunk in get_client().stream_text(contents):
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Gemini API error: {str(e)}")
+
+
+def build_summary_contents(
+    document: DocumentContent,
+    document_name: str,
+    summary_type: str,
+    from_sections: bool = False
+) -> list:
+    """
+    Build the model input for a document summary. With ``from_sections``
+    the text is the section summaries produced by :func:`condense_document`.
+    """
+    instruction = SUMMARY_INSTRUCTIONS.get(summary_type, SUMMARY_INSTRUCTIONS['short'])
+    template = SUMMARY_FROM_SECTIONS if from_sections else SUMMARY
+    return render(template, document, document_name, instruction=instruction)
+
+
+# Long documents are summarized section by section before the final summary
+SUMMARY_SECTION_CHARS = int(os.getenv("SUMMARY_SECTION_CHARS", "30000"))
+SECTION_SUMMARY_WORDS = 250
+SUMMARY_MAX_LEVELS = 3
+
+
+def build_section_summary_contents(section: Chunk, document_name: str) -> list:
+    """Build the model input for summarizing one section of a long document."""
+    return render(
+        SECTION_SUMMARY, section.text, f"{document_name} ({section.label})", words=SECTION_SUMMARY_WORDS
+    )
+
+
+async def summarize_sections(sections: List[Chunk], document_name: str) -> List[str]:
+    """
+    Summarize sections concurrently. Each section summary is cached by
+    its text, independent of the summary type, so later summaries of the
+    same document only redo the final step.
+    """
+    semaphore = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
     
-    # Check if this is image data
-    is_image, mime_type, image_bytes = parse_image_data(document_text)
+    async def summarize(section: Chunk) -> str:
+        cache_key = make_cache_key(
+            "section_summary", section.text, MODEL_NAME, PROMPT_VERSIONS["section_summary"]
+        )
+        cached = await response_cache.lookup(cache_key)
+        if cached is not None:
+            return cached
+        async with semaphore:
+            summary = await get_client().generate_text(
+                build_section_summary_contents(section, document_name)
+            )
+        response_cache.set(cache_key, summary)
+        return summary
     
-    if is_image:
-        # Use vision capability for images
-        prompt = f"""You are a helpful AI study assistant. You are analyzing an image from a document called "{document_name}".
-Look at this image carefully and answer the following question about it.
-Be concise, accurate, and helpful.
-
-Question: {question}
-
-Please provide a helpful answer based on what you see in the image:"""
-        
-        try:
-            response = model.generate_content([
-                prompt,
-                {"mime_type": mime_type, "data": image_bytes}
-            ])
-            return response.text
-        except Exception as e:
-            raise Exception(f"Gemini Vision API error: {str(e)}")
-    else:
-        # Text-based question
-        prompt = f"""You are a helpful AI study assistant. You are helping the user study a document called "{document_name}".
-Answer questions based on the document content provided below. Be concise, accurate, and helpful.
-If the answer is not in the document, say so politely.
-
-Document Content:
-{document_text}
-
----
-User Question: {question}
-
-Please provide a helpful answer:"""
-
-        try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
-
-
-async def generate_summary(document_text: str, document_name: str, summary_type: str) -> str:
+    return await asyncio.gather(*(summarize(section) for section in sections))
+
+
+async def condense_document(document_text: str, document_name: str) -> str:
+    """
+    Reduce a document that exceeds the prompt budget to labelled section
+    summaries that fit in one prompt, summarizing the summaries again if
+    a single pass is not enough.
+    """
+    text = document_text
+    for _ in range(SUMMARY_MAX_LEVELS):
+        if len(text) <= MAX_CONTEXT_CHARS:
+            break
+        sections = group_sections(text, SUMMARY_SECTION_CHARS)
+        summaries = await summarize_sections(sections, document_name)
+        text = "\n\n".join(
+            f"[{section.label}]\n{summary.strip()}" for section, summary in zip(sections, summaries)
+        )
+    return text
+
+
+async def prepare_summary_contents(document: DocumentContent, document_name: str, summary_type: str) -> list:
+    """Summary model input, condensing documents beyond MAX_CONTEXT_CHARS section by section first."""
+    if isinstance(document, str) and len(document) > MAX_CONTEXT_CHARS:
+        with trace("condense"):
+            condensed = await condense_document(document, document_name)
+        return build_summary_contents(condensed, document_name, summary_type, from_sections=True)
+    with trace("prompt"):
+        return build_summary_contents(document, document_name, summary_type)
+
+
+async def generate_summary(document: DocumentContent, document_name: str, summary_type: str) -> str:
     """Generate a summary of the document."""
-    
-    # Check if this is image data
-    is_image, mime_type, image_bytes = parse_image_data(document_text)
-    
-    type_instructions = {
-        'short': 'Provide a brief 2-3 sentence summary.',
-        'detailed': 'Provide a comprehensive detailed summary with key themes, main points, and conclusions.',
-        'bullet': 'Provide the summary as concise bullet points covering all key takeaways.',
+    try:
+        contents = await prepare_summary_contents(document, document_name, summary_type)
+        return await get_client().generate_text(contents)
+    except Exception as e:
+        raise Exception(f"Summary generation error: {str(e)}")
+
+
+async def generate_summary_stream(document: DocumentContent, document_name: str, summary_type: str) -> AsyncIterator[str]:
+    """Generate a summary of the document, yielding it as it is generated."""
+    try:
+        contents = await prepare_summary_contents(document, document_name, summary_type)
+        async for chunk in get_client().stream_text(contents):
+            yield chunk
+    except Exception as e:
+        raise Exception(f"Summary generation error: {str(e)}")
+
+
+# Flashcard/MCQ requests of at least this many items fan out across document sections
+MAP_REDUCE_MIN_COUNT = int(os.getenv("MAP_REDUCE_MIN_COUNT", "15"))
+# Roughly how many items one section prompt is asked for, and section size bounds
+MAP_ITEMS_PER_SECTION = 10
+MAP_MIN_SECTION_CHARS = 2000
+MAP_MAX_SECTION_CHARS = 12000
+
+
+def plan_sections(document: DocumentContent, count: int) -> List[Chunk]:
+    """
+    Split a text document into sections for map-reduce generation of
+    ``count`` items, sized so each section is asked for about
+    MAP_ITEMS_PER_SECTION items. Returns [] when one prompt should do:
+    for small counts, unless the document is beyond MAX_CONTEXT_CHARS
+    and one prompt would only see its beginning.
+    """
+    if isinstance(document, ImageData):
+        return []
+    if count < MAP_REDUCE_MIN_COUNT and len(document) <= MAX_CONTEXT_CHARS:
+        return []
+    wanted = -(-count // MAP_ITEMS_PER_SECTION)
+    # Rounded so small edits to the document do not move every section boundary
+    section_chars = min(MAP_MAX_SECTION_CHARS, max(MAP_MIN_SECTION_CHARS, len(document) // wanted // 1000 * 1000))
+    sections = group_sections(document, section_chars)
+    return sections if len(sections) > 1 else []
+
+
+def build_flashcard_contents(
+    document: DocumentContent,
+    document_name: str,
+    count: int,
+    avoid: List[str] = ()
+) -> list:
+    """Build the model input asking for ``count`` flashcards."""
+    return render(FLASHCARDS, document, document_name, count=count, avoid=format_avoid(avoid))
+
+
+async def generate_flashcards(
+    document: DocumentContent,
+    document_name: str,
+    count: int = 8,
+    existing: Optional[List[Dict]] = None,
+    on_request: Optional[Callable[[], None]] = None
+) -> List[Dict]:
+    """
+    Generate flashcards from document content, topping up ``existing`` ones
+    if given. Large counts over long documents are generated section by
+    section in parallel and merged without near-duplicates.
+    """
+    try:
+        sections = [] if existing else plan_sections(document, count)
+        if sections:
+            return await generate_items_by_section(
+                "flashcards",
+                sections,
+                lambda section, missing, avoid: build_flashcard_contents(
+                    section.text, f"{document_name} ({section.label})", missing, avoid
+                ),
+                Flashcard,
+                count,
+                lambda card: f"{card['question']} {card['answer']}",
+                on_request=on_request,
+                cache_key=lambda section: make_cache_key(
+                    "flashcards_section", section.text, MODEL_NAME, PROMPT_VERSIONS["flashcards"]
+                )
+            )
+        return await generate_items(
+            "flashcards",
+            lambda missing, avoid: build_flashcard_contents(document, document_name, missing, avoid),
+            Flashcard,
+            count,
+            existing,
+            on_request=on_request
+        )
+    except Exception as e:
+        raise Exception(f"Flashcard generation error: {str(e)}")
+
+
+def build_mcq_contents(
+    document: DocumentContent,
+    document_name: str,
+    count: int,
+    avoid: List[str] = ()
+) -> list:
+    """Build the model input asking for ``count`` multiple choice questions."""
+    return render(MCQS, document, document_name, count=count, avoid=format_avoid(avoid))
+
+
+async def generate_mcqs(
+    document: DocumentContent,
+    document_name: str,
+    count: int = 5,
+    existing: Optional[List[Dict]] = None,
+    on_request: Optional[Callable[[], None]] = None
+) -> List[Dict]:
+    """
+    Generate MCQ questions from document content, topping up ``existing``
+    ones if given. Large counts over long documents are generated section
+    by section in parallel and merged without near-duplicates.
+    """
+    try:
+        sections = [] if existing else plan_sections(document, count)
+        if sections:
+            return await generate_items_by_section(
+                "mcqs",
+                sections,
+                lambda section, missing, avoid: build_mcq_contents(
+                    section.text, f"{document_name} ({section.label})", missing, avoid
+                ),
+                MCQ,
+                count,
+                lambda mcq: f"{mcq['question']} {mcq['options'][mcq['correctIndex']]}",
+                on_request=on_request,
+                cache_key=lambda section: make_cache_key(
+                    "mcqs_section", section.text, MODEL_NAME, PROMPT_VERSIONS["mcqs"]
+                )
+            )
+        return await generate_items(
+            "mcqs",
+            lambda missing, avoid: build_mcq_contents(document, document_name, missing, avoid),
+            MCQ,
+            count,
+            existing,
+            on_request=on_request
+        )
+    except Exception as e:
+        raise Exception(f"MCQ generation error: {str(e)}")
+
+
+# Artifacts a study pack can contain, in response order
+STUDY_PACK_PARTS = ("summary", "flashcards", "mcqs")
+
+# Rough prompt size of an inline image, used when estimating tokens saved
+IMAGE_TOKEN_ESTIMATE = 258
+
+
+def estimate_document_tokens(document: DocumentContent) -> int:
+    """Approximate input tokens spent sending the document in one prompt (~4 chars per token)."""
+    if isinstance(document, ImageData):
+        return IMAGE_TOKEN_ESTIMATE
+    return len(fit_to_context(document)) // 4
+
+
+def study_pack_schema(parts: List[str]) -> dict:
+    """Response schema for a study pack object holding ``parts``."""
+    properties = {
+        "summary": {"type": "string"},
+        "flashcards": array_schema(Flashcard),
+        "mcqs": array_schema(MCQ),
+    }
+    return {
+        "type": "object",
+        "properties": {part: properties[part] for part in parts},
+        "required": list(parts),
     }
-    instruction = type_instructions.get(summary_type, type_instructions['short'])
-    
-    if is_image:
-        prompt = f"""You are a study assistant. Analyze this image from "{document_name}" and summarize what you see.
-{instruction}
-
-Provide your summary:"""
-        
-        try:
-            response = model.generate_content([
-                prompt,
-                {"mime_type": mime_type, "data": image_bytes}
-            ])
-            return response.text
-        except Exception as e:
-            raise Exception(f"Summary generation error: {str(e)}")
-    else:
-        prompt = f"""You are a study assistant. Summarize the following document.
-{instruction}
-
-Document: "{document_name}"
-
-Content:
-{document_text}
-
-Provide your summary:"""
-
-        try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            raise Exception(f"Summary generation error: {str(e)}")
 
 
-async def generate_flashcards(document_text: str, document_name: str, count: int = 8) -> List[Dict]:
-    """Generate flashcards from document content."""
+def build_study_pack_contents(
+    document: DocumentContent,
+    document_name: str,
+    parts: List[str],
+    summary_type: str,
+    flashcard_count: int,
+    mcq_count: int
+) -> list:
+    """Build one model input that asks for every requested study artifact as a JSON object."""
+    params = {
+        "summary": {"instruction": SUMMARY_INSTRUCTIONS.get(summary_type, SUMMARY_INSTRUCTIONS['short'])},
+        "flashcards": {"count": flashcard_count},
+        "mcqs": {"count": mcq_count},
+    }
+    fields = "\n".join(
+        STUDY_PACK_FIELDS[part].format(**params[part]) for part in STUDY_PACK_PARTS if part in parts
+    )
+    return render(STUDY_PACK, document, document_name, fields=fields)
+
+
+def parse_study_pack(text: str) -> Dict:
+    """Pull the validated artifacts out of a study pack response, salvaging partial output."""
+    with trace("parse"):
+        data, clean = parse_object(text, ["flashcards", "mcqs"])
+    found = sum(1 for part in STUDY_PACK_PARTS if part in data)
+    record_parse("study_pack", found, clean)
     
-    # Check if this is image data  
-    is_image, mime_type, image_bytes = parse_image_data(document_text)
+    pack = {}
+    if isinstance(data.get("summary"), str) and data["summary"].strip():
+        pack["summary"] = data["summary"].strip()
+    for part, item_model in (("flashcards", Flashcard), ("mcqs", MCQ)):
+        items = data.get(part)
+        if isinstance(items, list):
+            valid, rejected = validate_items(items, item_model)
+            structured_metrics.record("study_pack", rejected_items=rejected)
+            if valid:
+                pack[part] = valid
+    return pack
+
+
+async def generate_study_pack(
+    document: DocumentContent,
+    document_name: str,
+    parts: List[str],
+    summary_type: str = 'short',
+    flashcard_count: int = 8,
+    mcq_count: int = 5
+) -> Dict:
+    """
+    Generate several study artifacts from a single model call.
+
+    The document is sent once for every requested part. Parts the combined
+    response is missing are regenerated with their own prompts; flashcard
+    and MCQ lists are de-duplicated and trimmed to their counts, and short
+    ones are topped up with requests for just the missing items,
+    concurrently. Documents beyond MAX_CONTEXT_CHARS skip the truncated
+    combined prompt: every part is generated as its own endpoint would,
+    section by section. Returns the artifacts plus ``model_calls``.
+    """
+    combined = [] if isinstance(document, str) and len(document) > MAX_CONTEXT_CHARS else list(parts)
     
-    if is_image:
-        prompt = f"""You are a study assistant. Look at this image from "{document_name}" and create {count} flashcards to help with studying.
-
-Each flashcard should have:
-- A clear question that tests understanding of what's in the image
-- A concise but complete answer
-
-Return the flashcards in this exact JSON format (no markdown, just raw JSON):
-[
-  {{"question": "Question 1?", "answer": "Answer 1"}},
-  {{"question": "Question 2?", "answer": "Answer 2"}}
-]
-
-Generate {count} flashcards:"""
-
-        try:
-            response = model.generate_content([
-                prompt,
-                {"mime_type": mime_type, "data": image_bytes}
-            ])
-            text = response.text
-            json_match = re.search(r'\[[\s\S]*\]', text)
-            if json_match:
-                return json.loads(json_match.group())
-            return []
-        except Exception as e:
-            raise Exception(f"Flashcard generation error: {str(e)}")
-    else:
-        prompt = f"""You are a study assistant. Create {count} flashcards from the following document to help with studying.
-
-Each flashcard should have:
-- A clear question that tests understanding
-- A concise but complete answer
-
-Document: "{document_name}"
-
-Content:
-{document_text}
-
-Return the flashcards in this exact JSON format (no markdown, just raw JSON):
-[
-  {{"question": "Question 1?", "answer": "Answer 1"}},
-  {{"question": "Question 2?", "answer": "Answer 2"}}
-]
-
-Generate {count} flashcards:"""
-
+    pack = {}
+    model_calls = 0
+    if combined:
+        contents = build_study_pack_contents(
+            document, document_name, combined, summary_type, flashcard_count, mcq_count
+        )
+        structured_metrics.record("study_pack", requests=1)
         try:
-            response = model.generate_content(prompt)
-            text = response.text
-            
-            # Parse JSON from the response
-            json_match = re.search(r'\[[\s\S]*\]', text)
-            if json_match:
-                return json.loads(json_match.group())
-            return []
+            text = await get_client().generate_text(
+                contents, generation_config=json_mode(study_pack_schema(combined))
+            )
         except Exception as e:
-            raise Exception(f"Flashcard generation error: {str(e)}")
-
-
-async def generate_mcqs(document_text: str, document_name: str, count: int = 5) -> List[Dict]:
-    """Generate MCQ questions from document content."""
+            raise Exception(f"Study pack generation error: {str(e)}")
+        pack = parse_study_pack(text)
+        model_calls = 1
+        for part, count in (("flashcards", flashcard_count), ("mcqs", mcq_count)):
+            if part in pack:
+                pack[part] = distinct_items(pack[part])[:count]
     
-    # Check if this is image data
-    is_image, mime_type, image_bytes = parse_image_data(document_text)
+    def count_request():
+        nonlocal model_calls
+        model_calls += 1
     
-    if is_image:
-        prompt = f"""You are a study assistant. Look at this image from "{document_name}" and create {count} multiple choice questions to test understanding.
-
-Each question should have:
-- A clear question about the image content
-- 4 options (A, B, C, D)
-- The correct answer marked
-
-Return the questions in this exact JSON format (no markdown, just raw JSON):
-[
-  {{"question": "Question text?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}
-]
-
-Note: correctIndex is 0-based (0 for A, 1 for B, 2 for C, 3 for D)
-
-Generate {count} MCQ questions:"""
-
-        try:
-            response = model.generate_content([
-                prompt,
-                {"mime_type": mime_type, "data": image_bytes}
-            ])
-            text = response.text
-            json_match = re.search(r'\[[\s\S]*\]', text)
-            if json_match:
-                return json.loads(json_match.group())
-            return []
-        except Exception as e:
-            raise Exception(f"MCQ generation error: {str(e)}")
-    else:
-        prompt = f"""You are a study assistant. Create {count} multiple choice questions from the following document to test understanding.
-
-Each question should have:
-- A clear question
-- 4 options (A, B, C, D)
-- The correct answer marked
-
-Document: "{document_name}"
-
-Content:
-{document_text}
-
-Return the questions in this exact JSON format (no markdown, just raw JSON):
-[
-  {{"question": "Question text?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}
-]
-
-Note: correctIndex is 0-based (0 for A, 1 for B, 2 for C, 3 for D)
-
-Generate {count} MCQ questions:"""
-
-        try:
-            response = model.generate_content(prompt)
-            text = response.text
-            
-            # Parse JSON from the response
-            json_match = re.search(r'\[[\s\S]*\]', text)
-            if json_match:
-                return json.loads(json_match.group())
-            return []
-        except Exception as e:
-            raise Exception(f"MCQ generation error: {str(e)}")
+    follow_ups = {}
+    if "summary" in parts and "summary" not in pack:
+        count_request()
+        follow_ups["summary"] = generate_summary(document, document_name, summary_type)
+    if "flashcards" in parts and len(pack.get("flashcards", [])) < flashcard_count:
+        follow_ups["flashcards"] = generate_flashcards(
+            document, document_name, flashcard_count, pack.get("flashcards"), count_request
+        )
+    if "mcqs" in parts and len(pack.get("mcqs", [])) < mcq_count:
+        follow_ups["mcqs"] = generate_mcqs(
+            document, document_name, mcq_count, pack.get("mcqs"), count_request
+        )
+    
+    if follow_ups:
+        results = await asyncio.gather(*follow_ups.values())
+        pack.update(zip(follow_ups, results))
+    
+    pack["model_calls"] = model_calls
+    return pack
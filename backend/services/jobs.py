@@ -0,0 +1,123 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+@dataclass
+class Job:
+    """A unit of background work and its progress."""
+    job_id: str
+    key: str
+    status: str = QUEUED
+    progress: str = "Waiting for a free worker"
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+
+class JobManager:
+    """
+    Runs blocking jobs on a bounded thread pool and tracks their status.
+
+    Jobs are identified by a caller-supplied ``key``; submitting a key that
+    is already queued or running returns the existing job instead of
+    starting another one. At most ``max_workers`` jobs run at once and at
+    most ``max_queued`` may wait, so bursts cannot exhaust upstream quotas.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 20, max_finished: int = 200):
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, func: Callable[[Callable[[str], None]], dict]) -> tuple[Job, bool]:
+        """
+        Queue ``func(report_progress)`` unless a job with ``key`` is already active.
+
+        Returns the job and whether it was an existing in-flight job.
+        """
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                return self._jobs[active_id], True
+
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFullError("Too many jobs are waiting; please try again shortly")
+
+            job = Job(job_id=uuid.uuid4().hex, key=key)
+            self._jobs[job.job_id] = job
+            self._active[key] = job.job_id
+            self._prune()
+
+        # Run in the submitter's context so the job is traced under its request
+        self._executor.submit(contextvars.copy_context().run, self._run, job, func)
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, func: Callable[[Callable[[str], None]], dict]):
+        def report_progress(message: str):
+            job.progress = message
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        report_progress("Started")
+        try:
+            result = func(report_progress)
+            if result.get("success"):
+                job.result = result
+                job.status = COMPLETED
+                report_progress("Completed")
+            else:
+                job.error = result.get("error") or "Job failed"
+                job.status = FAILED
+                report_progress("Failed")
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            report_progress("Failed")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``max_finished``."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        """Number of jobs held in each status (finished jobs until they are pruned)."""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
@@ -0,0 +1,154 @@
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Optional
+
+from services.metrics import record_usage, trace
+
+# Per-process limits for outgoing model calls
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call does not finish within the configured timeout."""
+
+
+class LLMClient:
+    """
+    Runs blocking model calls on a dedicated, bounded thread pool so they
+    never stall the event loop.
+
+    Any object with a ``generate_content(contents, **kwargs)`` method can be
+    used as the model, which lets tests and benchmarks plug in a local fake.
+    Cancelling the awaiting task (e.g. when the HTTP client disconnects)
+    releases the concurrency slot immediately; the worker thread finishes
+    the in-flight call in the background and its result is discarded.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="llm"
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, contents: Any, model: Any = None, **kwargs) -> Any:
+        """
+        Call ``model.generate_content`` off the event loop and return the raw
+        response. ``model`` overrides the client's model for this call, e.g.
+        with one bound to a cached context.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            future = loop.run_in_executor(
+                self._executor,
+                partial((model or self.model).generate_content, contents, **kwargs)
+            )
+            try:
+                with trace("llm"):
+                    response = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(f"Model call timed out after {self.timeout:.0f}s")
+        record_usage(response)
+        return response
+
+    async def generate_text(self, contents: Any, model: Any = None, **kwargs) -> str:
+        """Call the model and return the response text."""
+        response = await self.generate(contents, model, **kwargs)
+        return response.text
+
+    async def stream_text(self, contents: Any, model: Any = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Call the model with ``stream=True`` and yield text chunks as they arrive.
+
+        The timeout applies to the gap between chunks. Closing the iterator
+        early stops the worker thread after its current chunk.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        def produce():
+            try:
+                chunk = None
+                for chunk in (model or self.model).generate_content(contents, stream=True, **kwargs):
+                    if stop.is_set():
+                        return
+                    if chunk.text:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                # The last chunk carries the usage for the whole response
+                record_usage(chunk)
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        async with self._semaphore:
+            loop.run_in_executor(self._executor, contextvars.copy_context().run, produce)
+            try:
+                with trace("llm_stream"):
+                    while True:
+                        try:
+                            item = await asyncio.wait_for(queue.get(), self.timeout)
+                        except asyncio.TimeoutError:
+                            raise LLMTimeoutError(f"Model stream stalled for {self.timeout:.0f}s")
+                        if item is finished:
+                            return
+                        if isinstance(item, Exception):
+                            raise item
+                        yield item
+            finally:
+                stop.set()
+
+    def shutdown(self):
+        """Stop accepting work and release the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_client: Optional[LLMClient] = None
+_default_model: Optional[Callable[[], Any]] = None
+_client_lock = threading.Lock()
+
+
+def configure_client(model: Any, **kwargs) -> LLMClient:
+    """Install the process-wide LLM client, replacing any previous one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.shutdown()
+        _client = LLMClient(model, **kwargs)
+        return _client
+
+
+def set_default_model(create_model: Callable[[], Any]):
+    """
+    Register how to build the model when no client has been configured.
+    It is only called on first use, so importing the services needs no
+    API key and benchmarks can install a fake model first.
+    """
+    global _default_model
+    _default_model = create_model
+
+
+def get_client() -> LLMClient:
+    """Return the process-wide LLM client, creating the default one on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and _default_model is not None:
+                _client = LLMClient(_default_model())
+    if _client is None:
+        raise Exception("LLM client is not configured")
+    return _client
@@ -0,0 +1,185 @@
+import os
+import re
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Media files are content-addressed, so browsers may keep them for a year
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+# A single byte range: "first-last", "first-" or "-suffix length"
+BYTE_RANGE = re.compile(r"([0-9]*)-([0-9]*)")
+
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+
+def file_etag(path: Path, stat_result: os.stat_result) -> str:
+    """Strong ETag from the SHA-256 of the file, memoised per (size, mtime)."""
+    cache_key = (str(path), stat_result.st_size, stat_result.st_mtime_ns)
+    with _etag_lock:
+        etag = _etag_cache.get(cache_key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with _etag_lock:
+            _etag_cache[cache_key] = etag
+    return etag
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into inclusive ``(start, end)`` offsets.
+
+    Returns None for headers we do not handle (e.g. multiple ranges) or
+    that are invalid, in which case the whole file is sent. Raises
+    ValueError if the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    match = BYTE_RANGE.fullmatch(spec.strip())
+    # Invalid syntax, including a last byte before the first, is ignored (RFC 7233, 3.1)
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the file's validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _read_at(f, offset: int, size: int) -> bytes:
+    # os.pread is not available on Windows
+    f.seek(offset)
+    return f.read(size)
+
+
+class FileRangeResponse(Response):
+    """
+    Sends ``length`` bytes of a file starting at ``offset``.
+
+    Uses the ASGI ``http.response.zerocopysend`` extension (sendfile) when
+    the server offers it, and falls back to reading the file in chunks on
+    a worker thread otherwise.
+    """
+
+    def __init__(self, path: Path, offset: int, length: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+
+            position = self.offset
+            remaining = self.length
+            while remaining > 0:
+                size = min(MEDIA_CHUNK_SIZE, remaining)
+                chunk = await anyio.to_thread.run_sync(_read_at, f, position, size)
+                if not chunk:
+                    break
+                position += len(chunk)
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                # File shrank underneath us; close the body cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def media_response(path: Path, request: Request, media_type: str, filename: Optional[str] = None) -> Response:
+    """
+    Serve a media file with Range (206) support, strong ETags,
+    If-None-Match / If-Modified-Since revalidation (304) and long-lived
+    cache headers.
+    """
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    size = stat_result.st_size
+    etag = await anyio.to_thread.run_sync(file_etag, path, stat_result)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+        "cache-control": MEDIA_CACHE_CONTROL,
+    }
+    if filename:
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size, 200, headers, media_type)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end - start + 1, 206, headers, media_type)
@@ -0,0 +1,321 @@
+import os
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Set METRICS_ENABLED=0 to turn every trace() into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Latency buckets in seconds; the long tail covers podcast generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+# Labels of the request being handled (e.g. its endpoint), added to every trace
+_request_labels: ContextVar[Dict[str, str]] = ContextVar("request_labels", default={})
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value != ""]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed set of label names."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: count per bucket (the last is +Inf), then the sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """A metric read at scrape time from counters kept elsewhere (e.g. a cache's ``stats()``)."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Tuple[str, ...],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]]
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self.collect()]
+
+
+class MetricsRegistry:
+    """Metrics exposed at /metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.render()
+            except Exception:
+                # A failing collector must not break the scrape
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "study_stage_duration_seconds", "Time spent in each processing stage.",
+    ("stage", "endpoint", "file_type")
+))
+STAGES_IN_FLIGHT = registry.register(Gauge(
+    "study_stage_in_flight", "Stages currently running.", ("stage",)
+))
+STAGE_ERRORS = registry.register(Counter(
+    "study_stage_errors_total", "Stages that raised, by exception type.", ("stage", "endpoint", "error")
+))
+HTTP_SECONDS = registry.register(Histogram(
+    "study_http_request_duration_seconds", "Time from request to the end of the response body.",
+    ("endpoint", "method", "status")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "study_http_requests_in_flight", "Requests currently being handled.", ("endpoint",)
+))
+LLM_TOKENS = registry.register(Counter(
+    "study_llm_tokens_total", "Model tokens by direction (input, output, cached input).",
+    ("direction", "endpoint")
+))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage: str, labels: Dict[str, str]):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        STAGES_IN_FLIGHT.inc(stage=self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        STAGES_IN_FLIGHT.dec(stage=self.stage)
+        STAGE_SECONDS.observe(elapsed, stage=self.stage, **self.labels)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(stage=self.stage, endpoint=self.labels.get("endpoint", ""), error=exc_type.__name__)
+        return False
+
+
+def trace(stage: str, **labels: str):
+    """
+    Time a block as ``stage``, e.g. ``with trace("extract", file_type="pdf"):``.
+
+    Records its duration, in-flight count and any exception, labelled
+    with the current request's endpoint. A shared no-op when metrics
+    are disabled.
+    """
+    if not METRICS_ENABLED:
+        return _NOOP
+    request_labels = _request_labels.get()
+    return _Span(stage, {**request_labels, **labels} if labels else request_labels)
+
+
+def set_request_labels(**labels: str):
+    """Label every trace in the current request (and the tasks and threads it starts)."""
+    return _request_labels.set(labels)
+
+
+def record_usage(response) -> None:
+    """Count the tokens reported in a Gemini response's usage metadata."""
+    if not METRICS_ENABLED:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    endpoint = _request_labels.get().get("endpoint", "")
+    for direction, field in (
+        ("input", "prompt_token_count"),
+        ("output", "candidates_token_count"),
+        ("cached_input", "cached_content_token_count"),
+    ):
+        tokens = getattr(usage, field, 0) or 0
+        if tokens:
+            LLM_TOKENS.inc(tokens, direction=direction, endpoint=endpoint)
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    HTTP_SECONDS.observe(seconds, endpoint=endpoint, method=method, status=str(status))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its last body chunk is sent.
+
+    ``endpoint_of`` maps the request scope to the endpoint label. Only
+    ``send`` is wrapped: bodies, including Server-Sent Events, go out as
+    the endpoint writes them and ``http.disconnect`` reaches the endpoint.
+    """
+
+    def __init__(self, app, endpoint_of: Callable[[dict], str]):
+        self.app = app
+        self.endpoint_of = endpoint_of
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        endpoint = self.endpoint_of(scope)
+        set_request_labels(endpoint=endpoint)
+        HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        status = 500
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+                observe_request(endpoint, scope["method"], status, time.perf_counter() - start)
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            finish()
+
+
+def collector(
+    name: str,
+    documentation: str,
+    kind: str,
+    labelnames: Tuple[str, ...],
+    collect: Callable[[], Iterable[Tuple[LabelValues, float]]]
+):
+    """Expose counters that another component already keeps, read when /metrics is scraped."""
+    registry.register(CallbackMetric(name, documentation, kind, labelnames, collect))
+
+
+def render_metrics() -> str:
+    return registry.render()
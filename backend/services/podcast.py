@@ -1,28 +1,19 @@
 import os
 import sys
+import json
+import atexit
+import time
 import shutil
+import hashlib
 import builtins
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Callable, Iterator, Optional
 
-# Load environment variables from .env
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
-
-# Monkey-patch open() to force UTF-8 encoding on Windows for non-binary files
-_original_open = builtins.open
-def _utf8_open(*args, **kwargs):
-    if len(args) >= 2:
-        mode = args[1]
-    else:
-        mode = kwargs.get('mode', 'r')
-    # Only add encoding for text mode (not binary)
-    if 'b' not in mode and 'encoding' not in kwargs:
-        kwargs['encoding'] = 'utf-8'
-        kwargs['errors'] = 'replace'
-    return _original_open(*args, **kwargs)
-builtins.open = _utf8_open
-
-from podcastfy.client import generate_podcast
+from services.jobs import JobManager, Job
+from services.metrics import trace
 
 # Fix for Windows Unicode encoding issues
 if sys.platform == 'win32':
@@ -39,64 +30,317 @@ os.environ["ELEVENLABS_API_KEY"] = os.getenv("ELEVENLABS_API_KEY", "")
 os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY", "")
 
 # Directory to store generated podcasts
-PODCAST_OUTPUT_DIR = Path(__file__).parent.parent / "podcasts"
+PODCAST_OUTPUT_DIR = Path(os.getenv("PODCAST_OUTPUT_DIR") or Path(__file__).parent.parent / "podcasts")
 PODCAST_OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Podcast generation is slow and uses TTS quota, so only a few run at once
+PODCAST_MAX_CONCURRENT_JOBS = int(os.getenv("PODCAST_MAX_CONCURRENT_JOBS", "2"))
+PODCAST_MAX_QUEUED_JOBS = int(os.getenv("PODCAST_MAX_QUEUED_JOBS", "20"))
+
+# Generated audio is cached by content; least recently used files go first
+PODCAST_CACHE_MAX_BYTES = int(os.getenv("PODCAST_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# The manifest lists every document name and cache key, so it is kept
+# outside PODCAST_OUTPUT_DIR, whose files are served at /podcasts/
+PODCAST_MANIFEST_PATH = Path(
+    os.getenv("PODCAST_MANIFEST_PATH") or Path(__file__).parent.parent / "data" / "podcast_manifest.json"
+)
+# Cache hits only update last-used times, which are written at most this often
+PODCAST_MANIFEST_SAVE_SECONDS = float(os.getenv("PODCAST_MANIFEST_SAVE_SECONDS", "60"))
+
+PODCAST_LLM_MODEL = "gemini-2.5-flash-preview-09-2025"
+PODCAST_TTS_MODEL = "elevenlabs"
+PODCAST_MAX_SOURCE_CHARS = 15000
+
+# podcastfy opens its text files without an encoding, which fails on Windows
+# for non-ASCII scripts. While podcastfy runs, open() is patched to default
+# text files to UTF-8, for the threads running it only.
+_original_open = builtins.open
+_utf8_scope: ContextVar[bool] = ContextVar("podcast_utf8_open", default=False)
+_utf8_patch_users = 0
+_utf8_patch_lock = threading.Lock()
+
+
+def _utf8_open(*args, **kwargs):
+    if _utf8_scope.get():
+        if len(args) >= 2:
+            mode = args[1]
+        else:
+            mode = kwargs.get('mode', 'r')
+        # Only add encoding for text mode (not binary)
+        if 'b' not in mode and 'encoding' not in kwargs and len(args) < 4:
+            kwargs['encoding'] = 'utf-8'
+            kwargs['errors'] = 'replace'
+    return _original_open(*args, **kwargs)
+
+
+@contextmanager
+def utf8_text_files() -> Iterator[None]:
+    """
+    Open text files as UTF-8 inside this block. The patch is installed
+    only while a podcast is being generated, and other threads' open()
+    calls pass through unchanged.
+    """
+    global _utf8_patch_users
+    token = _utf8_scope.set(True)
+    with _utf8_patch_lock:
+        if _utf8_patch_users == 0:
+            builtins.open = _utf8_open
+        _utf8_patch_users += 1
+    try:
+        yield
+    finally:
+        with _utf8_patch_lock:
+            _utf8_patch_users -= 1
+            if _utf8_patch_users == 0:
+                builtins.open = _original_open
+        _utf8_scope.reset(token)
+
+
+# podcastfy's generate_podcast, imported on first use so the API starts
+# (and workers that never make podcasts run) without the TTS stack
+_podcast_generator: Optional[Callable[..., Optional[str]]] = None
+
+
+def configure_podcast_generator(generate: Callable[..., Optional[str]]):
+    """
+    Replace podcastfy's ``generate_podcast`` (e.g. with a local fake TTS).
+    It is called with podcastfy's keyword arguments and returns the path
+    of the audio file it wrote.
+    """
+    global _podcast_generator
+    _podcast_generator = generate
+
+
+def get_podcast_generator() -> Callable[..., Optional[str]]:
+    global _podcast_generator
+    if _podcast_generator is None:
+        with utf8_text_files():
+            from podcastfy.client import generate_podcast
+        _podcast_generator = generate_podcast
+    return _podcast_generator
+
+
+podcast_jobs = JobManager(
+    max_workers=PODCAST_MAX_CONCURRENT_JOBS,
+    max_queued=PODCAST_MAX_QUEUED_JOBS
+)
+
+
+class PodcastCache:
+    """
+    Content-addressed index of generated podcast files.
+
+    The manifest maps each cache key to its MP3 in ``audio_dir`` and is
+    rewritten atomically when files are added or removed. Hits only
+    update last-used times in memory; those are written with the next
+    change, at most every ``save_seconds`` otherwise, and at exit. Once
+    the cached files exceed ``max_bytes`` the least recently used ones are
+    deleted. Files not listed in the manifest are never touched.
+    """
 
-async def generate_podcast_from_text(
+    def __init__(
+        self,
+        manifest_path: Path,
+        audio_dir: Path,
+        max_bytes: int = PODCAST_CACHE_MAX_BYTES,
+        save_seconds: float = PODCAST_MANIFEST_SAVE_SECONDS
+    ):
+        self.manifest_path = manifest_path
+        self.audio_dir = audio_dir
+        self.max_bytes = max_bytes
+        self.save_seconds = save_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Whether last-used times changed since the manifest was written
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        # Move a manifest written by older versions out of the served directory
+        legacy_path = audio_dir / "manifest.json"
+        if legacy_path.exists() and not manifest_path.exists():
+            shutil.move(str(legacy_path), manifest_path)
+        if manifest_path.exists():
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        atexit.register(self.flush)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the manifest entry for ``key`` if its audio file still exists."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not (self.audio_dir / entry["filename"]).exists():
+                if entry is not None:
+                    del self._entries[key]
+                    self._save()
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_seconds:
+                self._save()
+            self.hits += 1
+            return dict(entry)
+
+    def add(self, key: str, filename: str, **metadata):
+        """Record a newly generated file and evict old ones if over budget."""
+        path = self.audio_dir / filename
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                "filename": filename,
+                "size_bytes": path.stat().st_size,
+                "created_at": now,
+                "last_used": now,
+                **metadata
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def _evict(self, keep: str):
+        total = sum(entry["size_bytes"] for entry in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1]["last_used"])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            (self.audio_dir / entry["filename"]).unlink(missing_ok=True)
+            total -= entry["size_bytes"]
+            del self._entries[key]
+
+    def flush(self):
+        """Write last-used times that changed since the manifest was last saved."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": sum(entry["size_bytes"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+podcast_cache = PodcastCache(PODCAST_MANIFEST_PATH, PODCAST_OUTPUT_DIR)
+
+
+def build_conversation_config(language: str) -> dict:
+    """Custom podcastfy conversation config for a language."""
+    return {
+        "output_language": language,
+        "word_count": 1500,
+        "conversation_style": ["educational", "engaging"],
+        "roles_person1": "Host",
+        "roles_person2": "Expert",
+        "dialogue_structure": [
+            "Introduction",
+            "Main Content Discussion",
+            "Key Takeaways",
+            "Conclusion"
+        ],
+        "podcast_name": "Study Companion Pro",
+        "podcast_tagline": "Learning made easy through conversation",
+        "creativity": 0.7
+    }
+
+
+def build_podcast_source(document_text: str, document_name: str) -> str:
+    """The text podcastfy turns into a conversation."""
+    return f"Document: {document_name}\n\n{document_text[:PODCAST_MAX_SOURCE_CHARS]}"
+
+
+def podcast_cache_key(document_text: str, document_name: str, language: str) -> str:
+    """Hash of everything that determines the generated audio."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "language": language,
+        "conversation_config": build_conversation_config(language),
+        "llm_model": PODCAST_LLM_MODEL,
+        "tts_model": PODCAST_TTS_MODEL,
+    }, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(build_podcast_source(document_text, document_name).encode("utf-8", errors="surrogatepass"))
+    return digest.hexdigest()
+
+
+def cached_podcast_result(key: str) -> Optional[dict]:
+    """Build a generation result from the cache, or None on a miss."""
+    entry = podcast_cache.get(key)
+    if entry is None:
+        return None
+    return {
+        "success": True,
+        "audio_file": entry["filename"],
+        "audio_path": str(PODCAST_OUTPUT_DIR / entry["filename"]),
+        "message": f"Podcast loaded from cache in {entry.get('language', 'the requested language')}"
+    }
+
+
+def generate_podcast_from_text(
     document_text: str,
     document_name: str,
-    language: str = "Tamil"
+    language: str = "Tamil",
+    report_progress: Optional[Callable[[str], None]] = None
 ) -> dict:
     """
     Generate a podcast from document text using podcastfy with ElevenLabs TTS.
     
+    This blocks for the whole LLM + TTS run; use submit_podcast_job() from
+    request handlers. Previously generated audio for the same content is
+    returned from the podcast cache without calling podcastfy.
+    
     Args:
         document_text: The text content to convert into a podcast
         document_name: Name of the source document
         language: Language for the podcast (default: Tamil)
+        report_progress: Optional callback receiving progress messages
     
     Returns:
         dict with success status and audio file path
     """
+    report_progress = report_progress or (lambda message: None)
     try:
-        # Prepare the text content
-        text_content = f"Document: {document_name}\n\n{document_text[:15000]}"
-        
-        # Custom conversation config
-        conversation_config = {
-            "output_language": language,
-            "word_count": 1500,
-            "conversation_style": ["educational", "engaging"],
-            "roles_person1": "Host",
-            "roles_person2": "Expert",
-            "dialogue_structure": [
-                "Introduction",
-                "Main Content Discussion",
-                "Key Takeaways",
-                "Conclusion"
-            ],
-            "podcast_name": "Study Companion Pro",
-            "podcast_tagline": "Learning made easy through conversation",
-            "creativity": 0.7
-        }
+        key = podcast_cache_key(document_text, document_name, language)
+        cached = cached_podcast_result(key)
+        if cached is not None:
+            return cached
         
-        # Generate output filename
-        safe_name = "".join(c for c in document_name if c.isalnum() or c in "._- ")[:50]
-        output_filename = f"podcast_{safe_name}_{language}.mp3"
+        # Content-addressed filename, so different documents never overwrite each other
+        output_filename = f"podcast_{key[:16]}_{language}.mp3"
         output_path = PODCAST_OUTPUT_DIR / output_filename
         
         # Generate the podcast using podcastfy with raw_text
-        audio_file = generate_podcast(
-            text=text_content,
-            tts_model="elevenlabs",
-            llm_model_name="gemini-2.5-flash-preview-09-2025",
-            conversation_config=conversation_config
-        )
+        report_progress("Writing script and synthesizing audio")
+        with trace("podcast_generate"), utf8_text_files():
+            audio_file = get_podcast_generator()(
+                text=build_podcast_source(document_text, document_name),
+                tts_model=PODCAST_TTS_MODEL,
+                llm_model_name=PODCAST_LLM_MODEL,
+                conversation_config=build_conversation_config(language)
+            )
         
         # Move the generated file to our podcasts directory
         if audio_file and Path(audio_file).exists():
+            report_progress("Saving audio")
             shutil.move(audio_file, output_path)
+            podcast_cache.add(key, output_filename, language=language, document_name=document_name)
             return {
                 "success": True,
                 "audio_file": output_filename,
@@ -116,6 +360,26 @@ async def generate_podcast_from_text(
         }
 
 
+def find_cached_podcast(document_text: str, document_name: str, language: str = "Tamil") -> Optional[dict]:
+    """Return a finished generation result if this podcast was made before."""
+    return cached_podcast_result(podcast_cache_key(document_text, document_name, language))
+
+
+def submit_podcast_job(document_text: str, document_name: str, language: str = "Tamil") -> tuple[Job, bool]:
+    """
+    Queue podcast generation in the background.
+
+    Identical requests that are already queued or running share one job.
+    Returns the job and whether it was deduplicated.
+    """
+    return podcast_jobs.submit(
+        podcast_cache_key(document_text, document_name, language),
+        lambda report_progress: generate_podcast_from_text(
+            document_text, document_name, language, report_progress
+        )
+    )
+
+
 def get_podcast_path(filename: str) -> Path:
     """Get the full path for a podcast file."""
     return PODCAST_OUTPUT_DIR / filename
@@ -0,0 +1,207 @@
+import os
+import string
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, List
+
+from services.document import DocumentContent, ImageData
+
+# Maximum document characters placed in a single prompt
+MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "50000"))
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A named prompt with a version. Bump ``version`` whenever ``text``
+    changes so cached responses built from the old text are not reused.
+    The placeholders are parsed once, when the template is defined.
+    """
+    name: str
+    version: int
+    text: str
+    fields: FrozenSet[str] = field(init=False)
+
+    def __post_init__(self):
+        names = {name for _, name, _, _ in string.Formatter().parse(self.text) if name}
+        object.__setattr__(self, "fields", frozenset(names))
+        TEMPLATES[self.name] = self
+
+    def format(self, **params) -> str:
+        missing = self.fields - params.keys()
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' is missing {', '.join(sorted(missing))}")
+        return self.text.format(**params)
+
+
+# Every template defined below, by name
+TEMPLATES: Dict[str, PromptTemplate] = {}
+
+
+# Prompts start with the same instructions and document for every task, so
+# providers can cache that prefix; the task-specific text always comes last.
+# The prefix depends only on the document content: the name a client gave
+# the document goes in the task part, so every client shares one prefix.
+TEXT_PREFIX = PromptTemplate("text_prefix", 2, """You are a helpful AI study assistant helping a student study a document.
+The document content comes first and the task follows it.
+
+Document content:
+""")
+
+IMAGE_PREFIX = PromptTemplate("image_prefix", 2, """You are a helpful AI study assistant helping a student study a document.
+The document is the image that follows; look at it carefully. The task follows it.""")
+
+TASK_SEPARATOR = "\n\n---\n"
+
+DOCUMENT_NAME = PromptTemplate("document_name", 1, """The document is called "{document_name}".
+
+""")
+
+
+QUESTION = PromptTemplate("question", 1, """Answer the question below based on the document. Be concise, accurate, and helpful.
+If the answer is not in the document, say so politely.
+
+User Question: {question}
+
+Please provide a helpful answer:""")
+
+QUESTION_PASSAGES = PromptTemplate("question_passages", 1, """The content above is the passages of the document most relevant to the question below. Each passage starts with the page or slide it came from.
+Answer the question based on these passages. Be concise, accurate, and helpful, and cite the pages you used, e.g. (Page 3).
+If the answer is not in the passages, say so politely.
+
+User Question: {question}
+
+Please provide a helpful answer:""")
+
+
+SUMMARY_INSTRUCTIONS = {
+    'short': 'Provide a brief 2-3 sentence summary.',
+    'detailed': 'Provide a comprehensive detailed summary with key themes, main points, and conclusions.',
+    'bullet': 'Provide the summary as concise bullet points covering all key takeaways.',
+}
+
+SUMMARY = PromptTemplate("summary", 1, """Summarize the document.
+{instruction}
+
+Provide your summary:""")
+
+SUMMARY_FROM_SECTIONS = PromptTemplate("summary_from_sections", 1, """The content above is a series of summaries of consecutive sections of the document, each headed by the pages it covers. Combine them into one summary of the whole document.
+{instruction}
+
+Provide your summary:""")
+
+SECTION_SUMMARY = PromptTemplate("section_summary", 1, """The content above is one part of a longer document. Summarize it for a student.
+Keep every key concept, definition, figure and conclusion; this summary will be combined with summaries of the other parts.
+Use at most {words} words.
+
+Section summary:""")
+
+
+FLASHCARDS = PromptTemplate("flashcards", 1, """Create {count} flashcards from the document to help with studying.
+
+Each flashcard should have:
+- A clear question that tests understanding
+- A concise but complete answer
+{avoid}
+Return the flashcards in this exact JSON format (no markdown, just raw JSON):
+[
+  {{"question": "Question 1?", "answer": "Answer 1"}},
+  {{"question": "Question 2?", "answer": "Answer 2"}}
+]
+
+Generate {count} flashcards:""")
+
+MCQS = PromptTemplate("mcqs", 1, """Create {count} multiple choice questions from the document to test understanding.
+
+Each question should have:
+- A clear question
+- 4 options (A, B, C, D)
+- The correct answer marked
+{avoid}
+Return the questions in this exact JSON format (no markdown, just raw JSON):
+[
+  {{"question": "Question text?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}
+]
+
+Note: correctIndex is 0-based (0 for A, 1 for B, 2 for C, 3 for D)
+
+Generate {count} MCQ questions:""")
+
+AVOID = PromptTemplate("avoid", 1, """
+Do not repeat any of these existing questions:
+{questions}
+""")
+
+
+STUDY_PACK = PromptTemplate("study_pack", 1, """Create study material from the document.
+
+Return a single JSON object (no markdown, just raw JSON) with these keys:
+{fields}
+
+Study material JSON:""")
+
+STUDY_PACK_FIELDS = {
+    "summary": PromptTemplate("study_pack_summary", 1, """- "summary": a string. {instruction}"""),
+    "flashcards": PromptTemplate("study_pack_flashcards", 1, """- "flashcards": {count} flashcards, each with a clear question that tests understanding and a concise but complete answer:
+  {{"question": "Question 1?", "answer": "Answer 1"}}"""),
+    "mcqs": PromptTemplate("study_pack_mcqs", 1, """- "mcqs": {count} multiple choice questions, each with 4 options and a 0-based correctIndex (0 for A, 1 for B, 2 for C, 3 for D):
+  {{"question": "Question text?", "options": ["Option A", "Option B", "Option C", "Option D"], "correctIndex": 0}}"""),
+}
+
+
+def prompt_version(*names: str) -> str:
+    """
+    Version string for cache keys of responses built from the named
+    templates (plus the document prefixes), e.g. ``text_prefix1.summary1``.
+    """
+    used = [TEXT_PREFIX, IMAGE_PREFIX, DOCUMENT_NAME] + [TEMPLATES[name] for name in names]
+    return ".".join(f"{template.name}{template.version}" for template in used)
+
+
+def fit_to_context(document_text: str, max_chars: int = MAX_CONTEXT_CHARS) -> str:
+    """Trim document text to the prompt budget; the stored document keeps every page."""
+    if len(document_text) > max_chars:
+        return document_text[:max_chars] + "\n\n[Content truncated...]"
+    return document_text
+
+
+def image_part(image: ImageData) -> dict:
+    """Inline image part for a multimodal Gemini request."""
+    return {"mime_type": image.mime_type, "data": image.data}
+
+
+@lru_cache(maxsize=2)
+def _prefix_text(is_image: bool) -> str:
+    return (IMAGE_PREFIX if is_image else TEXT_PREFIX).format()
+
+
+def document_prefix(document: DocumentContent) -> list:
+    """
+    The leading parts of every prompt about a document: the shared
+    instructions, then the document itself as its own part (the text is
+    never copied into a larger prompt string). The same content always
+    gives the same prefix.
+    """
+    if isinstance(document, ImageData):
+        return [_prefix_text(True), image_part(document)]
+    return [_prefix_text(False), fit_to_context(document)]
+
+
+def render_task(template: PromptTemplate, document_name: str, **params) -> List:
+    """
+    The task part of a prompt, for sending after a document prefix that is
+    already cached. It starts with the name the student knows the document by.
+    """
+    return [TASK_SEPARATOR + DOCUMENT_NAME.format(document_name=document_name) + template.format(**params)]
+
+
+def render(template: PromptTemplate, document: DocumentContent, document_name: str, **params) -> List:
+    """Model input for ``template``: the document prefix followed by the task."""
+    return document_prefix(document) + render_task(template, document_name, **params)
+
+
+def format_avoid(questions: List[str]) -> str:
+    """Prompt note listing questions that were already generated."""
+    if not questions:
+        return ""
+    return AVOID.format(questions="\n".join(f"- {question}" for question in questions))
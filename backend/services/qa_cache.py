@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from services.retrieval import TOKEN_PATTERN, tokenize
+
+# Cosine similarity above which a new question reuses a cached answer
+QA_CACHE_SIMILARITY = float(os.getenv("QA_CACHE_SIMILARITY", "0.85"))
+QA_CACHE_TTL_SECONDS = float(os.getenv("QA_CACHE_TTL_SECONDS", str(24 * 3600)))
+QA_CACHE_MAX_DOCUMENTS = int(os.getenv("QA_CACHE_MAX_DOCUMENTS", "128"))
+QA_CACHE_MAX_QUESTIONS = int(os.getenv("QA_CACHE_MAX_QUESTIONS", "128"))
+# Hashed feature space for question vectors
+QA_VECTOR_DIMENSIONS = 1024
+# Share of content words two similar questions must have in common, which
+# rules out matches that only come from hash collisions
+QA_MIN_WORD_OVERLAP = 0.5
+
+# Phrasing that does not change what a question asks for
+QUESTION_FILLER = frozenset("explain describe tell me please can could you would give s".split())
+# Words that flip a question's meaning without changing much of its text
+NEGATIONS = frozenset("not no never without except".split())
+# Question words are retrieval stopwords, but "when" and "where" ask different things
+INTERROGATIVES = frozenset("what when where which who whom whose why how".split())
+NUMBER = re.compile(r'^\d+$')
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, for exact matching."""
+    return " ".join(TOKEN_PATTERN.findall(question.lower()))
+
+
+def question_words(question: str) -> List[str]:
+    """Content words of a question, crudely singularized."""
+    return [
+        w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+        for w in tokenize(question) if w not in QUESTION_FILLER
+    ]
+
+
+def question_terms(words: List[str]) -> List[str]:
+    """Words plus adjacent word pairs."""
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def question_guard(question: str) -> FrozenSet[str]:
+    """
+    Numbers, negations and question words in a question. Two questions
+    can only share an answer if these match exactly ("chapter 2" is not
+    "chapter 3", and "when was he born" is not "where was he born").
+    """
+    return frozenset(
+        w for w in TOKEN_PATTERN.findall(question.lower())
+        if w in NEGATIONS or w in INTERROGATIVES or NUMBER.match(w)
+    )
+
+
+def term_vector(terms: List[str], dimensions: int = QA_VECTOR_DIMENSIONS) -> np.ndarray:
+    """Sublinear term frequencies of ``terms`` hashed into ``dimensions`` buckets."""
+    counts = np.zeros(dimensions, dtype=np.float32)
+    if terms:
+        buckets = np.fromiter((zlib.crc32(t.encode("utf-8")) % dimensions for t in terms), dtype=np.int64)
+        np.add.at(counts, buckets, 1.0)
+        nonzero = counts > 0
+        counts[nonzero] = 1.0 + np.log(counts[nonzero])
+    return counts
+
+
+@dataclass
+class CachedAnswer:
+    """An answer with where it came from and when it expires."""
+    question: str
+    answer: str
+    document_id: str
+    model: str
+    prompt_version: str
+    created_at: float
+    expires_at: float
+    hits: int = 0
+
+
+class DocumentAnswers:
+    """Cached answers for one document, with their question vectors."""
+
+    def __init__(self, dimensions: int):
+        self.entries: List[CachedAnswer] = []
+        self.exact: Dict[str, CachedAnswer] = {}
+        self.guards: List[FrozenSet[str]] = []
+        self.words: List[FrozenSet[str]] = []
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+
+    def add(self, entry: CachedAnswer, words: List[str], vector: np.ndarray, max_questions: int):
+        self.entries.append(entry)
+        self.exact[normalize_question(entry.question)] = entry
+        self.guards.append(question_guard(entry.question))
+        self.words.append(frozenset(words))
+        self.vectors = np.vstack([self.vectors, vector])
+        self.prune(time.time(), max_questions)
+
+    def prune(self, now: float, max_questions: int):
+        """Drop expired answers, then the oldest beyond ``max_questions``."""
+        keep = [i for i, entry in enumerate(self.entries) if entry.expires_at > now][-max_questions:]
+        if len(keep) == len(self.entries):
+            return
+        self.entries = [self.entries[i] for i in keep]
+        self.guards = [self.guards[i] for i in keep]
+        self.words = [self.words[i] for i in keep]
+        self.vectors = self.vectors[keep]
+        self.exact = {normalize_question(entry.question): entry for entry in self.entries}
+
+    def most_similar(
+        self,
+        words: List[str],
+        vector: np.ndarray,
+        guard: FrozenSet[str]
+    ) -> Tuple[Optional[CachedAnswer], float]:
+        """
+        The cached question closest to ``vector`` by TF-IDF cosine, with
+        IDF taken from this document's cached questions, among those with
+        the same ``guard`` and enough content words in common.
+        """
+        if not self.entries or not words:
+            return None, 0.0
+        df = np.count_nonzero(self.vectors, axis=0)
+        n = len(self.entries) + 1
+        idf = (np.log((1 + n) / (1 + df)) + 1.0).astype(np.float32)
+        matrix = self.vectors * idf
+        query = vector * idf
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = (matrix @ query) / np.where(norms > 0, norms, 1.0)
+        query_words = frozenset(words)
+        for i, (entry_guard, entry_words) in enumerate(zip(self.guards, self.words)):
+            overlap = len(query_words & entry_words) / len(query_words | entry_words)
+            if entry_guard != guard or overlap < QA_MIN_WORD_OVERLAP:
+                scores[i] = -1.0
+        best = int(np.argmax(scores))
+        return self.entries[best], float(scores[best])
+
+
+class QuestionAnswerCache:
+    """
+    Per-document cache of answers to student questions.
+
+    A question is answered from the cache when its normalized text was
+    asked before, or when it is close enough to an earlier question:
+    hashed word and word-pair TF-IDF vectors with cosine similarity of at
+    least ``threshold``, and the same numbers, negations and question
+    words. Documents are
+    keyed by content, so every upload of a shared PDF uses one cache.
+    Memory only; answers expire after ``ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = QA_CACHE_SIMILARITY,
+        ttl_seconds: float = QA_CACHE_TTL_SECONDS,
+        max_documents: int = QA_CACHE_MAX_DOCUMENTS,
+        max_questions: int = QA_CACHE_MAX_QUESTIONS,
+        dimensions: int = QA_VECTOR_DIMENSIONS
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self.max_questions = max_questions
+        self.dimensions = dimensions
+        self._documents: "OrderedDict[str, DocumentAnswers]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def lookup(self, document_key: str, question: str) -> Optional[Tuple[CachedAnswer, str]]:
+        """Return (cached answer, "exact" or "semantic") for ``question``, or None on a miss."""
+        with self._lock:
+            answers = self._documents.get(document_key)
+            if answers is not None:
+                self._documents.move_to_end(document_key)
+                answers.prune(time.time(), self.max_questions)
+                entry = answers.exact.get(normalize_question(question))
+                if entry is not None:
+                    entry.hits += 1
+                    self.exact_hits += 1
+                    return entry, "exact"
+                words = question_words(question)
+                vector = term_vector(question_terms(words), self.dimensions)
+                entry, score = answers.most_similar(words, vector, question_guard(question))
+                if entry is not None and score >= self.threshold:
+                    entry.hits += 1
+                    self.semantic_hits += 1
+                    return entry, "semantic"
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        document_key: str,
+        question: str,
+        answer: str,
+        document_id: str,
+        model: str,
+        prompt_version: str
+    ):
+        """Cache ``answer`` to ``question``, recording which document ID, model and prompt produced it."""
+        now = time.time()
+        entry = CachedAnswer(
+            question=question,
+            answer=answer,
+            document_id=document_id,
+            model=model,
+            prompt_version=prompt_version,
+            created_at=now,
+            expires_at=now + self.ttl_seconds
+        )
+        words = question_words(question)
+        vector = term_vector(question_terms(words), self.dimensions)
+        with self._lock:
+            answers = self._documents.get(document_key)
+            if answers is None:
+                answers = self._documents[document_key] = DocumentAnswers(self.dimensions)
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+            self._documents.move_to_end(document_key)
+            answers.add(entry, words, vector, self.max_questions)
+
+    def stats(self) -> dict:
+        """Return exact/semantic hit counters and cache size."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "documents": len(self._documents),
+                "answers": sum(len(answers.entries) for answers in self._documents.values()),
+                "threshold": self.threshold,
+            }
+
+
+# Shared answer cache for /ask and /ask/stream
+qa_cache = QuestionAnswerCache()
@@ -0,0 +1,240 @@
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Chunking and ranking parameters
+CHUNK_MAX_CHARS = 1500
+CHUNK_OVERLAP_CHARS = 200
+RETRIEVAL_TOP_K = 6
+# Documents shorter than this are sent to the model whole
+RETRIEVAL_MIN_CHARS = 8000
+BM25_K1 = 1.5
+BM25_B = 0.75
+# On average one page in this many may end a section once it is half full
+SECTION_BOUNDARY_MODULUS = 4
+
+PAGE_MARKER = re.compile(r'\n--- (Page|Slide) (\d+) ---\n')
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were what when where which who why with how does do".split()
+)
+
+
+@dataclass
+class Chunk:
+    """A passage of a document with the page or slide it came from."""
+    label: str
+    text: str
+    position: int = 0
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split text on the ``--- Page N ---`` / ``--- Slide N ---`` markers."""
+    parts = PAGE_MARKER.split(text)
+    sections = []
+    if parts[0].strip():
+        sections.append(("Document", parts[0]))
+    for i in range(1, len(parts) - 2, 3):
+        kind, number, body = parts[i], parts[i + 1], parts[i + 2]
+        if body.strip():
+            sections.append((f"{kind} {number}", body))
+    return sections
+
+
+def split_into_chunks(
+    text: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap: int = CHUNK_OVERLAP_CHARS
+) -> List[Chunk]:
+    """Split text into page-labelled chunks of at most ``max_chars`` characters."""
+    return chunk_sections(split_sections(text), max_chars, overlap)
+
+
+def chunk_sections(
+    sections: Iterable[Tuple[str, str]],
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap: int = CHUNK_OVERLAP_CHARS
+) -> List[Chunk]:
+    """Split ``(label, text)`` sections into overlapping sub-chunks."""
+    chunks = []
+    for label, body in sections:
+        body = body.strip()
+        start = 0
+        while start < len(body):
+            end = min(len(body), start + max_chars)
+            if end < len(body):
+                # Prefer to break on a paragraph or line boundary
+                cut = body.rfind("\n", start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut
+            chunks.append(Chunk(label, body[start:end].strip(), len(chunks)))
+            if end >= len(body):
+                break
+            start = max(end - overlap, start + 1)
+    return [c for c in chunks if c.text]
+
+
+def group_sections(text: str, max_chars: int) -> List[Chunk]:
+    """
+    Merge consecutive pages or slides into sections of at most about
+    ``max_chars`` characters, labelled with the range they cover. Pages
+    longer than ``max_chars`` are split on their own.
+
+    Once a section is half full it may also end after a page chosen by
+    that page's content hash, so editing one page of a re-uploaded
+    document only shifts the boundaries around it and sections elsewhere
+    keep the same text (and cached results).
+    """
+    groups = []
+    labels, bodies, size = [], [], 0
+
+    def flush():
+        label = labels[0] if labels[0] == labels[-1] else f"{labels[0]} - {labels[-1]}"
+        groups.append(Chunk(label, "\n\n".join(bodies), len(groups)))
+
+    for chunk in chunk_sections(split_sections(text), max_chars, overlap=0):
+        if bodies and size + len(chunk.text) > max_chars:
+            flush()
+            labels, bodies, size = [], [], 0
+        labels.append(chunk.label)
+        bodies.append(chunk.text)
+        size += len(chunk.text)
+        if size >= max_chars // 2 and zlib.crc32(chunk.text.encode("utf-8")) % SECTION_BOUNDARY_MODULUS == 0:
+            flush()
+            labels, bodies, size = [], [], 0
+    if bodies:
+        flush()
+    return groups
+
+
+class BM25Index:
+    """
+    Okapi BM25 ranker over a document's chunks.
+
+    Term frequencies are stored as an inverted index in CSC layout
+    (``postings_ptr`` / ``postings_doc`` / ``postings_tf`` NumPy arrays), so
+    scoring a query only touches the postings of the query terms.
+
+    Pass the index of an earlier version of the document as ``previous``
+    to take the term counts of unchanged chunks from it instead of
+    tokenizing them again.
+    """
+
+    def __init__(
+        self,
+        chunks: List[Chunk],
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        previous: Optional["BM25Index"] = None
+    ):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        reusable = previous.term_counts({chunk.text for chunk in chunks}) if previous else {}
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+        doc_lengths = np.zeros(len(chunks), dtype=np.float32)
+        for doc_id, chunk in enumerate(chunks):
+            term_counts = reusable.get(chunk.text)
+            if term_counts is None:
+                term_counts = {}
+                for token in tokenize(chunk.text):
+                    term_counts[token] = term_counts.get(token, 0) + 1
+            doc_lengths[doc_id] = sum(term_counts.values())
+            for token, count in term_counts.items():
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                rows.append(term_id)
+                cols.append(doc_id)
+                counts.append(count)
+
+        rows = np.asarray(rows, dtype=np.int32)
+        order = np.argsort(rows, kind="stable")
+        self.vocabulary = vocabulary
+        self.postings_doc = np.asarray(cols, dtype=np.int32)[order]
+        self.postings_tf = np.asarray(counts, dtype=np.float32)[order]
+        document_frequency = np.bincount(rows, minlength=len(vocabulary))
+        self.postings_ptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+
+        n_docs = max(1, len(chunks))
+        self.idf = np.log(1.0 + (n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        avg_length = doc_lengths.mean() if len(chunks) else 0.0
+        self.length_norm = k1 * (1.0 - b + b * doc_lengths / max(avg_length, 1.0))
+
+    def term_counts(self, texts: Set[str]) -> Dict[str, Dict[str, int]]:
+        """Term frequencies of the chunks whose text is in ``texts``, rebuilt from the postings."""
+        wanted = [doc_id for doc_id, chunk in enumerate(self.chunks) if chunk.text in texts]
+        if not wanted:
+            return {}
+        id_to_term = list(self.vocabulary)
+        terms = np.repeat(np.arange(len(id_to_term)), np.diff(self.postings_ptr))
+        order = np.argsort(self.postings_doc, kind="stable")
+        docs = self.postings_doc[order]
+        terms = terms[order]
+        tfs = self.postings_tf[order]
+        bounds = np.searchsorted(docs, np.arange(len(self.chunks) + 1))
+
+        result = {}
+        for doc_id in wanted:
+            start, end = bounds[doc_id], bounds[doc_id + 1]
+            result[self.chunks[doc_id].text] = {
+                id_to_term[term]: int(tf)
+                for term, tf in zip(terms[start:end].tolist(), tfs[start:end].tolist())
+            }
+        return result
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Tuple[Chunk, float]]:
+        """Return the ``k`` best-scoring chunks for ``query``."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.postings_ptr[term_id], self.postings_ptr[term_id + 1]
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        k = min(k, len(self.chunks))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.chunks[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def build_index(
+    document_text: str,
+    pages: Optional[Sequence] = None,
+    previous: Optional[BM25Index] = None
+) -> Optional[BM25Index]:
+    """
+    Build a retrieval index for a document, or None if it is small enough to send whole.
+
+    ``pages`` are the page records from extraction; when given they are
+    chunked directly instead of re-splitting the text on page markers.
+    ``previous`` is the index of an earlier version whose unchanged
+    chunks need not be tokenized again.
+    """
+    if len(document_text) < RETRIEVAL_MIN_CHARS:
+        return None
+    if pages:
+        chunks = chunk_sections((f"{p.kind} {p.number}", p.text) for p in pages)
+    else:
+        chunks = split_into_chunks(document_text)
+    return BM25Index(chunks, previous=previous)
+
+
+def format_passages(results: List[Tuple[Chunk, float]]) -> str:
+    """Render retrieved chunks in document order with page citations."""
+    ordered = sorted(results, key=lambda r: r[0].position)
+    return "\n\n".join(f"[{chunk.label}]\n{chunk.text}" for chunk, _ in ordered)
@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from services.document import DocumentContent, DocumentPage, ImageData, pages_to_text
+from services.retrieval import BM25Index, build_index
+
+# In-memory byte budget and on-disk spill location; set DOCUMENT_STORE_DB to an
+# empty string to keep documents in memory only
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+DOCUMENT_STORE_DB = os.getenv(
+    "DOCUMENT_STORE_DB",
+    str(Path(__file__).parent.parent / "data" / "documents.db")
+)
+DOCUMENT_STORE_MAX_DISK_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX_DISK_DOCUMENTS", "10000"))
+
+
+def make_document_id(file_bytes: bytes) -> str:
+    """Stable document ID derived from the uploaded file's content."""
+    return document_id_from_sha256(hashlib.sha256(file_bytes).hexdigest())
+
+
+def document_id_from_sha256(hexdigest: str) -> str:
+    """Document ID for a file whose SHA-256 was computed while it was streamed in."""
+    return hexdigest[:32]
+
+
+@dataclass
+class StoredDocument:
+    """An extracted document and its metadata."""
+    document_id: str
+    filename: str
+    text: str
+    pages: int
+    chunks: List[DocumentPage] = field(default_factory=list)
+    size_bytes: int = 0
+    created_at: float = field(default_factory=time.time)
+    index: Optional[BM25Index] = None
+    image: Optional[ImageData] = None
+
+    @property
+    def content(self) -> DocumentContent:
+        """What the AI services should receive for this document."""
+        return self.image if self.image is not None else self.text
+
+    @property
+    def resident_bytes(self) -> int:
+        """Approximate memory held by this document."""
+        total = sys.getsizeof(self.text) + sum(sys.getsizeof(c.text) for c in self.chunks)
+        if self.image is not None:
+            total += sys.getsizeof(self.image.data)
+        if self.index is not None:
+            total += sum(sys.getsizeof(c.text) for c in self.index.chunks)
+            total += (
+                self.index.postings_doc.nbytes + self.index.postings_tf.nbytes
+                + self.index.postings_ptr.nbytes + self.index.idf.nbytes
+            )
+        return total
+
+    def metadata(self) -> dict:
+        """Description of the document without its content, for GET /documents/{document_id}."""
+        return {
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "pages": self.pages,
+            "size_bytes": self.size_bytes,
+            "created_at": self.created_at,
+        }
+
+
+class DocumentStore:
+    """
+    Bounded store for extracted documents.
+
+    Documents are kept in an LRU whose total size is capped at ``max_bytes``;
+    when ``db_path`` is set every document is also written to SQLite, so
+    evicted documents are reloaded on demand and survive restarts. Client-side
+    IDs can be mapped onto content-hash IDs with :meth:`alias`.
+
+    Identical uploads share one document, which counts its references
+    (see :meth:`reference`). Unreferenced documents are evicted first, and
+    a document is deleted once its last reference is released.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DOCUMENT_STORE_MAX_BYTES,
+        db_path: Optional[str] = None,
+        max_disk_documents: int = DOCUMENT_STORE_MAX_DISK_DOCUMENTS
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_documents = max_disk_documents
+        self._memory: "OrderedDict[str, StoredDocument]" = OrderedDict()
+        self._sizes = {}
+        self._aliases = {}
+        self._refs = {}
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.disk_loads = 0
+
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document_id TEXT PRIMARY KEY, filename TEXT NOT NULL, text TEXT, "
+                "chunks TEXT NOT NULL, pages INTEGER NOT NULL, size_bytes INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "image_mime TEXT, image_data BLOB)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS aliases ("
+                "alias TEXT PRIMARY KEY, document_id TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS document_refs ("
+                "document_id TEXT PRIMARY KEY, refs INTEGER NOT NULL)"
+            )
+            self._db.commit()
+            self._refs = dict(self._db.execute("SELECT document_id, refs FROM document_refs"))
+
+    def put(self, document: StoredDocument) -> StoredDocument:
+        """Add or replace a document."""
+        with self._lock:
+            self._remember(document)
+            if self._db is not None:
+                self._persist(document)
+            return document
+
+    def get(self, document_id: str) -> Optional[StoredDocument]:
+        """
+        Look up a document by content-hash ID or alias, loading it from disk
+        if evicted. Async code should use :meth:`lookup`, as loading blocks.
+        """
+        with self._lock:
+            document_id = self.resolve(document_id)
+            document = self._memory.get(document_id)
+            if document is not None:
+                self._memory.move_to_end(document_id)
+                return document
+            row = self._read(document_id)
+        if row is None:
+            return None
+        # Rebuilding the index is slow, so other lookups are not held up meanwhile
+        document = self._from_row(document_id, row)
+        with self._lock:
+            if document_id in self._memory:
+                return self._memory[document_id]
+            self.disk_loads += 1
+            self._remember(document)
+            return document
+
+    async def lookup(self, document_id: str) -> Optional[StoredDocument]:
+        """:meth:`get` for the event loop: documents not in memory are looked up in a thread."""
+        with self._lock:
+            document = self._memory.get(self._aliases.get(document_id, document_id))
+            if document is not None:
+                self._memory.move_to_end(document.document_id)
+                return document
+        return await asyncio.to_thread(self.get, document_id)
+
+    def alias(self, alias: str, document_id: str):
+        """Make ``alias`` (e.g. a client-generated ID) resolve to ``document_id``."""
+        if alias == document_id:
+            return
+        with self._lock:
+            self._aliases[alias] = document_id
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO aliases (alias, document_id) VALUES (?, ?)",
+                    (alias, document_id)
+                )
+                self._db.commit()
+
+    def reference(self, document_id: str, holder: Optional[str] = None) -> int:
+        """
+        Record that an upload refers to ``document_id`` and return its reference count.
+
+        ``holder`` is the client's own ID for the document: each holder is
+        one reference, and a holder re-uploading a different file moves its
+        reference to the new document. Uploads without one add a reference each.
+        """
+        with self._lock:
+            if holder is None or holder == document_id:
+                return self._add_refs(document_id, 1)
+            previous = self.resolve(holder)
+            if previous == document_id:
+                return self._refs.get(document_id, 0)
+            self.alias(holder, document_id)
+            if previous != holder:
+                self._release(previous)
+            return self._add_refs(document_id, 1)
+
+    def release(self, holder: str) -> Optional[int]:
+        """
+        Drop the reference held by ``holder`` (a client's own ID for a
+        document) and return how many references remain; the document is
+        deleted when none remain. Returns None, changing nothing, if
+        ``holder`` is not an alias: content-hash IDs are shared by every
+        uploader and cannot release anyone's reference.
+        """
+        with self._lock:
+            target = self.resolve(holder)
+            if target == holder:
+                return None
+            self._aliases.pop(holder, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM aliases WHERE alias = ?", (holder,))
+                self._db.commit()
+            return self._release(target)
+
+    def _release(self, document_id: str) -> int:
+        remaining = self._add_refs(document_id, -1)
+        if remaining == 0:
+            self._delete(document_id)
+        return remaining
+
+    def _add_refs(self, document_id: str, delta: int) -> int:
+        refs = max(self._refs.get(document_id, 0) + delta, 0)
+        self._refs[document_id] = refs
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO document_refs (document_id, refs) VALUES (?, ?)",
+                (document_id, refs)
+            )
+            self._db.commit()
+        return refs
+
+    def _delete(self, document_id: str):
+        if document_id in self._memory:
+            del self._memory[document_id]
+            self.resident_bytes -= self._sizes.pop(document_id)
+        self._refs.pop(document_id, None)
+        self._aliases = {a: d for a, d in self._aliases.items() if d != document_id}
+        if self._db is not None:
+            for table in ("documents", "document_refs", "aliases"):
+                self._db.execute(f"DELETE FROM {table} WHERE document_id = ?", (document_id,))
+            self._db.commit()
+
+    def resolve(self, document_id: str) -> str:
+        """Map an alias to its content-hash ID; unknown IDs are returned unchanged."""
+        with self._lock:
+            if document_id in self._aliases:
+                return self._aliases[document_id]
+            if self._db is not None and document_id not in self._memory:
+                row = self._db.execute(
+                    "SELECT document_id FROM aliases WHERE alias = ?", (document_id,)
+                ).fetchone()
+                if row is not None:
+                    self._aliases[document_id] = row[0]
+                    return row[0]
+            return document_id
+
+    def _remember(self, document: StoredDocument):
+        if document.document_id in self._memory:
+            self.resident_bytes -= self._sizes.pop(document.document_id)
+        size = document.resident_bytes
+        self._memory[document.document_id] = document
+        self._sizes[document.document_id] = size
+        self.resident_bytes += size
+        # Always keep the newest document resident, even if it alone exceeds the budget;
+        # unreferenced documents go first, least recently used first
+        while self.resident_bytes > self.max_bytes and len(self._memory) > 1:
+            older = list(self._memory)[:-1]
+            evicted_id = next((d for d in older if not self._refs.get(d)), older[0])
+            del self._memory[evicted_id]
+            self.resident_bytes -= self._sizes.pop(evicted_id)
+            self.evictions += 1
+
+    def _persist(self, document: StoredDocument):
+        now = time.time()
+        chunks = json.dumps([[c.kind, c.number, c.text, c.fingerprint] for c in document.chunks])
+        # Text is rebuilt from the chunks when they exist
+        text = None if document.chunks else document.text
+        image = document.image
+        self._db.execute(
+            "INSERT OR REPLACE INTO documents "
+            "(document_id, filename, text, chunks, pages, size_bytes, created_at, accessed_at, "
+            "image_mime, image_data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (document.document_id, document.filename, text, chunks, document.pages,
+             document.size_bytes, document.created_at, now,
+             image.mime_type if image else None, image.data if image else None)
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+        overflow = count - self.max_disk_documents
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM documents WHERE document_id IN ("
+                "SELECT d.document_id FROM documents d LEFT JOIN document_refs r USING (document_id) "
+                "ORDER BY COALESCE(r.refs, 0) > 0, d.accessed_at LIMIT ?)",
+                (overflow,)
+            )
+        self._db.commit()
+
+    def _read(self, document_id: str) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT filename, text, chunks, pages, size_bytes, created_at, image_mime, image_data "
+            "FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE documents SET accessed_at = ? WHERE document_id = ?",
+            (time.time(), document_id)
+        )
+        self._db.commit()
+        return row
+
+    @staticmethod
+    def _from_row(document_id: str, row: tuple) -> StoredDocument:
+        filename, text, chunks_json, pages, size_bytes, created_at, image_mime, image_data = row
+        # Rows written before page fingerprints existed have three fields
+        chunks = [DocumentPage(*fields) for fields in json.loads(chunks_json)]
+        if text is None:
+            text = pages_to_text(chunks)
+        return StoredDocument(
+            document_id=document_id,
+            filename=filename,
+            text=text,
+            pages=pages,
+            chunks=chunks,
+            size_bytes=size_bytes,
+            created_at=created_at,
+            index=build_index(text, chunks),
+            image=ImageData(image_mime, bytes(image_data)) if image_data is not None else None
+        )
+
+    def stats(self) -> dict:
+        """Report resident bytes, document counts and eviction counters."""
+        with self._lock:
+            disk_documents = None
+            if self._db is not None:
+                (disk_documents,) = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+            return {
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "resident_documents": len(self._memory),
+                "disk_documents": disk_documents,
+                "evictions": self.evictions,
+                "disk_loads": self.disk_loads,
+                "shared_documents": sum(1 for refs in self._refs.values() if refs > 1),
+                "references": sum(self._refs.values()),
+            }
+
+
+# Shared store for uploaded documents
+document_store = DocumentStore(db_path=DOCUMENT_STORE_DB or None)
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import math
+import asyncio
+import threading
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from services.llm import get_client
+from services.dedup import NearDuplicateFilter
+from services.retrieval import Chunk
+from services.cache import response_cache
+from services.metrics import trace
+
+# Follow-up requests allowed for items the model left out or got wrong
+STRUCTURED_MAX_RETRIES = int(os.getenv("STRUCTURED_MAX_RETRIES", "2"))
+# Sections generated at once for one fanned-out request
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+# Extra items requested per section so deduplication still leaves enough
+MAP_OVERSAMPLE = 1.25
+
+_decoder = json.JSONDecoder()
+_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+
+def gemini_schema(schema: dict) -> dict:
+    """Convert a pydantic JSON schema into the subset Gemini's ``response_schema`` accepts."""
+    converted = {"type": schema["type"]}
+    if "items" in schema:
+        converted["items"] = gemini_schema(schema["items"])
+    if "minItems" in schema:
+        converted["min_items"] = schema["minItems"]
+    if "maxItems" in schema:
+        converted["max_items"] = schema["maxItems"]
+    if "properties" in schema:
+        converted["properties"] = {
+            name: gemini_schema(prop) for name, prop in schema["properties"].items()
+        }
+        converted["required"] = schema.get("required", [])
+    return converted
+
+
+def array_schema(item_model: Type[BaseModel]) -> dict:
+    """Response schema for a JSON array of ``item_model`` objects."""
+    return {"type": "array", "items": gemini_schema(item_model.model_json_schema())}
+
+
+def json_mode(schema: dict) -> dict:
+    """Generation config asking Gemini for JSON that matches ``schema``."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+def salvage_array(text: str, start: int = 0) -> Tuple[List[Any], bool]:
+    """
+    Incrementally parse the first JSON array at or after ``start``.
+
+    Every complete element is kept even when the array as a whole is
+    broken (truncated output, a malformed item, trailing prose). Returns
+    the elements and whether the array parsed cleanly.
+    """
+    pos = text.find("[", start)
+    if pos == -1:
+        return [], False
+    pos += 1
+    items = []
+    clean = True
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text):
+            # Output stopped before the closing bracket
+            return items, False
+        if text[pos] == "]":
+            return items, clean
+        try:
+            item, pos = _decoder.raw_decode(text, pos)
+            items.append(item)
+        except ValueError:
+            # Skip the broken element and resume at the next object
+            clean = False
+            pos = text.find("{", pos + 1)
+            if pos == -1:
+                return items, False
+
+
+def parse_items(text: str) -> Tuple[List[Any], bool]:
+    """Parse a JSON array from model output, salvaging what it can. Returns (items, clean)."""
+    body = _FENCE.sub("", text)
+    try:
+        data = json.loads(body)
+        if isinstance(data, list):
+            return data, True
+    except ValueError:
+        pass
+    return salvage_array(body)
+
+
+def parse_object(text: str, array_keys: List[str]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Parse a JSON object from model output. If the object is broken, each
+    key in ``array_keys`` is salvaged independently, along with any
+    string fields that are still intact. Returns (data, clean).
+    """
+    body = _FENCE.sub("", text)
+    try:
+        data = json.loads(body)
+        if isinstance(data, dict):
+            return data, True
+    except ValueError:
+        pass
+
+    data = {}
+    for key in array_keys:
+        match = re.search(rf'"{key}"\s*:\s*\[', body)
+        if match:
+            data[key], _ = salvage_array(body, match.end() - 1)
+    for match in re.finditer(r'"(\w+)"\s*:\s*("(?:[^"\\]|\\.)*")', body):
+        try:
+            data.setdefault(match.group(1), json.loads(match.group(2)))
+        except ValueError:
+            continue
+    return data, False
+
+
+def validate_items(items: List[Any], item_model: Type[BaseModel]) -> Tuple[List[Dict], int]:
+    """Validate items against ``item_model``. Returns (valid items as dicts, number rejected)."""
+    valid = []
+    rejected = 0
+    for item in items:
+        try:
+            valid.append(item_model.model_validate(item).model_dump())
+        except ValidationError:
+            rejected += 1
+    return valid, rejected
+
+
+def distinct_items(items: List[Dict]) -> List[Dict]:
+    """Drop items whose question repeats an earlier one, ignoring case and surrounding space."""
+    seen = set()
+    distinct = []
+    for item in items:
+        key = item["question"].strip().lower()
+        if key not in seen:
+            seen.add(key)
+            distinct.append(item)
+    return distinct
+
+
+class StructuredOutputMetrics:
+    """Per-kind counters for structured generation: parse failures, rejected items and retries."""
+
+    COUNTERS = (
+        "requests", "responses", "parse_failures", "partial_parses",
+        "rejected_items", "retries", "retried_requests", "short_results",
+        "near_duplicates",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, int]] = {}
+
+    def record(self, kind: str, **counts: int):
+        with self._lock:
+            counters = self._kinds.setdefault(kind, dict.fromkeys(self.COUNTERS, 0))
+            for name, value in counts.items():
+                counters[name] += value
+
+    def stats(self) -> dict:
+        """Counters per kind plus parse-failure and retry rates."""
+        with self._lock:
+            report = {}
+            for kind, counters in self._kinds.items():
+                responses = counters["responses"]
+                requests = counters["requests"]
+                report[kind] = {
+                    **counters,
+                    "parse_failure_rate": counters["parse_failures"] / responses if responses else 0.0,
+                    "retry_rate": counters["retried_requests"] / requests if requests else 0.0,
+                }
+            return report
+
+
+# Shared counters, reported at /generation/stats
+structured_metrics = StructuredOutputMetrics()
+
+
+def record_parse(kind: str, found: int, clean: bool):
+    """Count one model response as parsed cleanly, salvaged or unusable."""
+    structured_metrics.record(
+        kind,
+        responses=1,
+        parse_failures=int(found == 0 and not clean),
+        partial_parses=int(found > 0 and not clean)
+    )
+
+
+async def generate_items(
+    kind: str,
+    build_contents: Callable[[int, List[str]], Any],
+    item_model: Type[BaseModel],
+    count: int,
+    existing: Optional[List[Dict]] = None,
+    max_retries: int = STRUCTURED_MAX_RETRIES,
+    on_request: Optional[Callable[[], None]] = None
+) -> List[Dict]:
+    """
+    Generate ``count`` validated items with JSON-mode requests.
+
+    ``build_contents(missing, avoid)`` must return a model input asking
+    for ``missing`` items whose questions differ from ``avoid``. Items
+    that are malformed, invalid or duplicated are dropped, and follow-up
+    requests ask only for the shortfall. Items in ``existing`` count
+    towards ``count``. ``on_request`` is called before every model call.
+    """
+    config = json_mode(array_schema(item_model))
+    items = distinct_items(existing or [])
+    structured_metrics.record(kind, requests=1)
+
+    attempts = 0
+    while len(items) < count and attempts <= max_retries:
+        if attempts:
+            structured_metrics.record(kind, retries=1, retried_requests=int(attempts == 1))
+        attempts += 1
+
+        missing = count - len(items)
+        if on_request:
+            on_request()
+        text = await get_client().generate_text(
+            build_contents(missing, [item["question"] for item in items]),
+            generation_config=config
+        )
+        with trace("parse"):
+            parsed, clean = parse_items(text)
+            valid, rejected = validate_items(parsed, item_model)
+        record_parse(kind, len(parsed), clean)
+        structured_metrics.record(kind, rejected_items=rejected)
+        items = distinct_items(items + valid)
+
+    if len(items) < count:
+        structured_metrics.record(kind, short_results=1)
+    return items[:count]
+
+
+def section_quotas(sizes: List[int], count: int) -> List[int]:
+    """
+    Split ``count`` (plus oversampling) across sections in proportion to
+    their size. Every section gets at least one item when there are
+    enough to go round; otherwise evenly spaced sections get one each.
+    """
+    target = math.ceil(count * MAP_OVERSAMPLE)
+    n = len(sizes)
+    if target < n:
+        quotas = [0] * n
+        for i in range(target):
+            quotas[i * n // target] = 1
+        return quotas
+
+    total = sum(sizes) or 1
+    shares = [(target - n) * size / total for size in sizes]
+    quotas = [1 + int(share) for share in shares]
+    # Hand out what rounding left over to the largest remainders
+    by_remainder = sorted(range(n), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    for i in by_remainder[:target - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+def merge_balanced(
+    per_section: List[List[Dict]],
+    merged: List[Dict],
+    seen: NearDuplicateFilter,
+    count: int,
+    item_text: Callable[[Dict], str]
+) -> int:
+    """
+    Append per-section items to ``merged`` round-robin, so every section
+    is represented before any contributes a second item, skipping
+    near-duplicates of anything in ``seen``. Returns the number skipped.
+    """
+    duplicates = 0
+    for round_items in zip_longest(*per_section):
+        for item in round_items:
+            if item is None or len(merged) >= count:
+                continue
+            if seen.add(item_text(item)):
+                merged.append(item)
+            else:
+                duplicates += 1
+    return duplicates
+
+
+async def generate_items_by_section(
+    kind: str,
+    sections: List[Chunk],
+    build_contents: Callable[[Chunk, int, List[str]], Any],
+    item_model: Type[BaseModel],
+    count: int,
+    item_text: Callable[[Dict], str],
+    concurrency: int = MAP_REDUCE_CONCURRENCY,
+    on_request: Optional[Callable[[], None]] = None,
+    cache_key: Optional[Callable[[Chunk], str]] = None
+) -> List[Dict]:
+    """
+    Map-reduce generation: ask each section for its share of ``count``
+    items, at most ``concurrency`` sections at a time, then merge the
+    results with :func:`merge_balanced`. ``item_text`` gives the text
+    compared when looking for near-duplicates. If deduplication leaves
+    too few items, one more round asks the sections for the shortfall,
+    listing the questions already kept.
+
+    With ``cache_key``, each section's first-round items are cached under
+    its key, so sections that are unchanged since an earlier version of
+    the document only generate what the cache cannot cover.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    sizes = [len(section.text) for section in sections]
+    seen = NearDuplicateFilter()
+    merged = []
+
+    async def map_section(section: Chunk, quota: int, avoid: List[str], cached: bool) -> List[Dict]:
+        key = cache_key(section) if cached else None
+        existing = (await response_cache.lookup(key) or []) if key else []
+        if len(existing) >= quota:
+            return existing[:quota]
+        async with semaphore:
+            items = await generate_items(
+                kind,
+                lambda missing, own: build_contents(section, missing, avoid + own),
+                item_model,
+                quota,
+                existing,
+                max_retries=1,
+                on_request=on_request
+            )
+        if key and len(items) > len(existing):
+            response_cache.set(key, items)
+        return items
+
+    for round_number in range(2):
+        shortfall = count - len(merged)
+        if shortfall <= 0:
+            break
+        avoid = [item["question"] for item in merged]
+        quotas = section_quotas(sizes, shortfall)
+        per_section = await asyncio.gather(*(
+            map_section(section, quota, avoid, cache_key is not None and round_number == 0)
+            for section, quota in zip(sections, quotas) if quota
+        ))
+        duplicates = merge_balanced(list(per_section), merged, seen, count, item_text)
+        structured_metrics.record(kind, near_duplicates=duplicates)
+
+    if len(merged) < count:
+        structured_metrics.record(kind, short_results=1)
+    return merged
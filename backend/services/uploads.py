@@ -0,0 +1,319 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from services.document import DocumentPage, FileSource, extract_document
+from services.metrics import trace
+from services.retrieval import build_index
+from services.store import DocumentStore, StoredDocument, document_store
+
+# Largest accepted upload; bigger requests are refused before their body is read
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# Where uploads are spooled while they are extracted (default: the system temp dir)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload is bigger than UPLOAD_MAX_BYTES."""
+
+
+def check_declared_size(content_length: Optional[str], max_bytes: int = UPLOAD_MAX_BYTES):
+    """Refuse an upload up front when its Content-Length is already over the limit."""
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise UploadTooLargeError(too_large_message(max_bytes))
+
+
+def too_large_message(max_bytes: int) -> str:
+    return f"File is too large; the limit is {max_bytes / (1024 * 1024):.0f} MB."
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware refusing upload requests over ``max_bytes`` with 413.
+
+    A declared Content-Length over the limit is refused before the body
+    is read; chunked bodies are counted as they arrive and cut off once
+    they pass the limit, however the endpoint parses them (multipart,
+    JSON or raw). Other requests pass through untouched, so their
+    ``http.disconnect`` messages reach the endpoint.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        refusal = JSONResponse(status_code=413, content={"success": False, "error": too_large_message(self.max_bytes)})
+        try:
+            check_declared_size(Headers(scope=scope).get("content-length"), self.max_bytes)
+        except UploadTooLargeError:
+            await refusal(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise UploadTooLargeError(too_large_message(self.max_bytes))
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # Whatever the endpoint made of the cut-off body, the client gets a 413
+            if exceeded:
+                if message["type"] == "http.response.start" and not started:
+                    started = True
+                    await refusal(scope, receive, send)
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLargeError:
+            if started:
+                raise
+        if exceeded and not started:
+            await refusal(scope, receive, send)
+
+
+class SpooledUpload:
+    """
+    An upload being written to a temporary file in chunks.
+
+    The content is hashed as it is written and the size limit is checked
+    on every chunk, so memory use does not depend on the file size.
+    Extractors read the file from ``path``. Closing deletes the file.
+    """
+
+    def __init__(self, max_bytes: int = UPLOAD_MAX_BYTES):
+        fd, name = tempfile.mkstemp(prefix="upload-", dir=UPLOAD_SPOOL_DIR)
+        self._file = os.fdopen(fd, "wb")
+        self._digest = hashlib.sha256()
+        self.path = Path(name)
+        self.size = 0
+        self.max_bytes = max_bytes
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(too_large_message(self.max_bytes))
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> "SpooledUpload":
+        """Flush the file so it can be read; call once every chunk is written."""
+        self._file.close()
+        return self
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def close(self):
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Spool a streamed request body (e.g. ``Request.stream()``) to a temporary file."""
+    upload = SpooledUpload(max_bytes)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                upload.write(chunk)
+        return upload.finish()
+    except BaseException:
+        upload.close()
+        raise
+
+
+def spool_file(file: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Copy an already received file object (e.g. a multipart part) to a temporary file in chunks."""
+    upload = SpooledUpload(max_bytes)
+    try:
+        file.seek(0)
+        while True:
+            chunk = file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                return upload.finish()
+            upload.write(chunk)
+    except BaseException:
+        upload.close()
+        raise
+
+
+def previous_chunks(previous: Optional[StoredDocument]) -> Optional[List[DocumentPage]]:
+    """Page records of an earlier version of an upload, for incremental extraction."""
+    if previous is None or previous.image is not None:
+        return None
+    return previous.chunks
+
+
+def file_extension(filename: str) -> str:
+    return filename.lower().rsplit('.', 1)[-1]
+
+
+class UploadDeduplicator:
+    """
+    Stores uploads so that identical files share one extraction.
+
+    Uploads are keyed by content hash. An upload whose document is
+    already stored reuses it; the first upload of a file that is not
+    extracts it, and uploads of that file arriving meanwhile wait for its
+    result instead of extracting the file again; if the extracting upload
+    is cancelled, a waiting one extracts the file instead. Every upload
+    adds a reference to the shared document.
+    """
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+        self._running: Dict[str, asyncio.Future] = {}
+        self.extractions = 0
+        self.stored_hits = 0
+        self.shared_hits = 0
+
+    async def ingest(
+        self,
+        source: FileSource,
+        filename: str,
+        size_bytes: int,
+        document_id: str,
+        find_previous: Callable[[], Optional[StoredDocument]],
+        holder: Optional[str] = None
+    ) -> Tuple[StoredDocument, int, bool]:
+        """
+        Store an uploaded file under its content-hash ``document_id``,
+        extracting it only if needed (reusing the pages of
+        ``find_previous()``'s earlier version). ``holder`` is the client's
+        own ID for the document, which is made to resolve to it.
+
+        Returns the document, how many pages were reused, and whether the
+        upload was deduplicated.
+        """
+        ext = file_extension(filename)
+        key = f"{document_id}.{ext}"
+        running = self._running.get(key)
+        while running is not None:
+            try:
+                document = await asyncio.shield(running)
+            except asyncio.CancelledError:
+                # Only this upload's own cancellation propagates; if the
+                # upload extracting the file was cancelled, extract it here
+                if not running.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                running = self._running.get(key)
+                continue
+            self.shared_hits += 1
+            self.store.reference(document_id, holder)
+            return document, len(document.chunks), True
+
+        stored = await self.store.lookup(document_id)
+        # The same bytes under another extension would be extracted differently
+        if stored is not None and file_extension(stored.filename) != ext:
+            stored = None
+
+        if stored is not None:
+            self.stored_hits += 1
+            document = stored
+        else:
+            self.extractions += 1
+            document, pages_reused = await self._extract(key, source, filename, size_bytes, document_id, find_previous)
+            self.store.reference(document_id, holder)
+            return document, pages_reused, False
+
+        self.store.reference(document_id, holder)
+        return document, len(document.chunks), True
+
+    async def _extract(
+        self,
+        key: str,
+        source: FileSource,
+        filename: str,
+        size_bytes: int,
+        document_id: str,
+        find_previous: Callable[[], Optional[StoredDocument]]
+    ) -> Tuple[StoredDocument, int]:
+        future = asyncio.get_running_loop().create_future()
+        self._running[key] = future
+        try:
+            document, pages_reused = await asyncio.to_thread(
+                self._extract_and_store, source, filename, size_bytes, document_id, find_previous
+            )
+            future.set_result(document)
+            return document, pages_reused
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters receive the error too; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            del self._running[key]
+
+    def _extract_and_store(
+        self,
+        source: FileSource,
+        filename: str,
+        size_bytes: int,
+        document_id: str,
+        find_previous: Callable[[], Optional[StoredDocument]]
+    ) -> Tuple[StoredDocument, int]:
+        """Extract, index and store a file (runs in a thread: all of it blocks)."""
+        previous = find_previous()
+        extracted = extract_document(source, filename, previous_chunks(previous))
+        with trace("index", file_type=file_extension(filename)):
+            index = build_index(extracted.text, extracted.chunks, previous.index if previous else None)
+        document = self.store.put(StoredDocument(
+            document_id=document_id,
+            filename=filename,
+            text=extracted.text,
+            pages=extracted.pages,
+            chunks=extracted.chunks,
+            size_bytes=size_bytes,
+            index=index,
+            image=extracted.image
+        ))
+        return document, extracted.pages_reused
+
+    def stats(self) -> dict:
+        """Return extraction and deduplication counters."""
+        hits = self.stored_hits + self.shared_hits
+        uploads = hits + self.extractions
+        return {
+            "extractions": self.extractions,
+            "stored_hits": self.stored_hits,
+            "shared_hits": self.shared_hits,
+            "dedup_rate": hits / uploads if uploads else 0.0,
+            "in_progress": len(self._running),
+        }
+
+
+# Deduplication shared by every upload endpoint
+upload_deduplicator = UploadDeduplicator(document_store)
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Run against in-memory caches and keep test state out of backend/data
+os.environ.setdefault("RESPONSE_CACHE_DB", "")
+os.environ.setdefault("DOCUMENT_STORE_DB", "")
+# Small enough that the size limit can be tested without large bodies
+os.environ.setdefault("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024))
+os.environ.setdefault("PODCAST_MANIFEST_PATH", os.path.join(tempfile.mkdtemp(prefix="test-podcasts-"), "manifest.json"))
+
+# Tests import the backend the way main.py does (``from services.x import ...``)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
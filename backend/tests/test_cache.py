@@ -0,0 +1,60 @@
+"""The two-tier response cache: write-behind to SQLite and disk lookups off the event loop."""
+import asyncio
+import time
+
+from services.cache import ResponseCache
+
+
+def wait_for_writes(cache: ResponseCache, timeout: float = 5):
+    deadline = time.time() + timeout
+    while cache.stats()["pending_writes"] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_set_is_written_to_disk_in_the_background(tmp_path):
+    db_path = str(tmp_path / "responses.db")
+    cache = ResponseCache(db_path=db_path)
+    cache.set("summary", "Cells are the unit of life.")
+    assert cache.get("summary") == "Cells are the unit of life."
+
+    wait_for_writes(cache)
+    assert cache.stats()["disk_entries"] == 1
+    restarted = ResponseCache(db_path=db_path)
+    assert restarted.get("summary") == "Cells are the unit of life."
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_lookup_reads_evicted_entries_from_disk(tmp_path):
+    cache = ResponseCache(max_entries=1, db_path=str(tmp_path / "responses.db"))
+    cache.set("flashcards", [{"front": "ATP", "back": "Energy currency"}])
+    cache.set("mcqs", [])
+    cache.flush()
+
+    assert asyncio.run(cache.lookup("flashcards")) == [{"front": "ATP", "back": "Energy currency"}]
+    assert asyncio.run(cache.lookup("missing")) is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["misses"]) == (1, 1)
+
+
+def test_pending_entries_are_served_before_they_reach_disk(tmp_path):
+    cache = ResponseCache(max_entries=1, db_path=str(tmp_path / "responses.db"))
+    with cache._db_lock:
+        # The writer cannot write while the connection is held
+        cache.set("first", "one")
+        cache.set("second", "two")
+        assert cache.get("first") == "one"
+
+
+def test_disk_entries_are_capped(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "responses.db"), max_disk_entries=3)
+    for i in range(5):
+        cache.set(f"key{i}", i)
+    cache.flush()
+    assert cache.stats()["disk_entries"] == 3
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(ttl_seconds=0)
+    cache.set("summary", "stale")
+    time.sleep(0.01)
+    assert cache.get("summary") is None
@@ -0,0 +1,145 @@
+"""Provider-side cached contexts, against the fake backend used by the benchmarks."""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from benchmarks.fakes import FakeContextBackend, FakeModel
+from main import app
+from services.context_cache import ContextCache
+from services.gemini import context_cache
+from services.llm import configure_client
+
+PREFIX = ["Document: notes.pdf", "Cell biology. " * 400]
+
+
+class FailingBackend(FakeContextBackend):
+    def create(self, parts: list, ttl: int, display_name: str) -> dict:
+        self.created += 1
+        raise RuntimeError("Quota exceeded")
+
+
+def new_cache(backend_class=FakeContextBackend, ttl: int = 600):
+    model = FakeModel(latency=0)
+    backend = backend_class(model)
+    return ContextCache(backend, ttl=ttl, min_tokens=100), backend, model
+
+
+def acquire(cache: ContextCache, model, session_id: str = "doc", prefix: list = PREFIX):
+    return asyncio.run(cache.acquire(session_id, prefix, 2000, model))
+
+
+def wait_for_deletes(backend, expected: int, timeout: float = 5):
+    deadline = time.time() + timeout
+    while backend.deleted < expected and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_context_is_created_once_and_reused():
+    cache, backend, model = new_cache()
+    first = acquire(cache, model)
+    assert acquire(cache, model) is first
+    assert backend.created == 1
+    assert cache.stats()["active_contexts"] == 1
+
+
+def test_small_prefixes_and_other_models_are_sent_inline():
+    cache, backend, model = new_cache()
+    assert asyncio.run(cache.acquire("doc", PREFIX, 10, model)) is None
+    assert acquire(cache, FakeModel(latency=0)) is None
+    assert backend.created == 0
+
+
+def test_changed_prefix_replaces_the_context():
+    cache, backend, model = new_cache()
+    first = acquire(cache, model)
+    second = acquire(cache, model, prefix=["Document: notes.pdf", "Genetics. " * 400])
+    assert second is not first
+    assert backend.created == 2
+    assert cache.stats()["replaced"] == 1
+    wait_for_deletes(backend, 1)
+    assert backend.deleted == 1
+
+
+def test_context_is_refreshed_once_half_its_ttl_has_passed():
+    cache, backend, model = new_cache(ttl=600)
+    context = acquire(cache, model)
+    context.expires_at = time.time() + 200
+    assert acquire(cache, model) is context
+    assert context.expires_at > time.time() + 500
+    assert cache.stats()["refreshed"] == 1
+
+
+def test_expired_context_is_created_again():
+    cache, backend, model = new_cache()
+    context = acquire(cache, model)
+    context.expires_at = time.time() - 1
+    assert acquire(cache, model) is not context
+    assert cache.stats()["expired"] == 1
+    assert backend.created == 2
+
+
+def test_failed_create_backs_off():
+    cache, backend, model = new_cache(FailingBackend)
+    assert acquire(cache, model) is None
+    assert acquire(cache, model) is None
+    assert backend.created == 1
+    assert cache.stats()["failures"] == 1
+
+
+def test_failed_call_backs_off_and_deletes_the_context():
+    cache, backend, model = new_cache()
+    acquire(cache, model)
+    cache.invalidate("doc", failed=True)
+    assert acquire(cache, model) is None
+    assert backend.created == 1
+    wait_for_deletes(backend, 1)
+    assert backend.deleted == 1
+
+
+def test_unrelated_documents_under_one_client_id_get_their_own_contexts():
+    model = FakeModel(latency=0)
+    backend = FakeContextBackend(model)
+    configure_client(model)
+    context_cache.configure(backend)
+    try:
+        client = TestClient(app)
+        for topic in ("Photosynthesis", "Plate tectonics"):
+            response = client.post("/ask", json={
+                "document_id": "no-document",
+                "question": f"What is {topic.lower()}?",
+                "document_text": f"{topic} notes. " * 800,
+            }).json()
+            assert response["success"]
+        assert backend.created == 2
+        assert backend.deleted == 0
+        assert context_cache.stats()["active_contexts"] == 2
+    finally:
+        context_cache.configure(None)
+
+
+def test_clients_naming_the_same_document_differently_share_one_context():
+    class PromptRecorder(FakeModel):
+        def reply_to(self, prompt: str) -> str:
+            self.prompts.append(prompt)
+            return self.reply
+
+    model = PromptRecorder(latency=0)
+    model.prompts = []
+    backend = FakeContextBackend(model)
+    configure_client(model)
+    context_cache.configure(backend)
+    try:
+        client = TestClient(app)
+        for name in ("alice-notes.pdf", "bio-week-3.pdf"):
+            response = client.post("/ask", json={
+                "document_id": name,
+                "question": f"What does {name} say about mitochondria?",
+                "document_text": "Mitochondria make ATP. " * 800,
+            }).json()
+            assert response["success"]
+        assert backend.created == 1
+        assert ['"alice-notes.pdf"' in prompt for prompt in model.prompts] == [True, False]
+        assert ['"bio-week-3.pdf"' in prompt for prompt in model.prompts] == [False, True]
+    finally:
+        context_cache.configure(None)
@@ -0,0 +1,35 @@
+"""Near-duplicate detection with MinHash signatures."""
+from services.dedup import NearDuplicateFilter
+
+
+def test_reworded_question_is_a_near_duplicate():
+    seen = NearDuplicateFilter()
+    assert seen.add("What is the main function of the mitochondria in a cell? It produces ATP.")
+    assert not seen.add("What is the main function of mitochondria in the cell? They produce ATP.")
+
+
+def test_distinct_questions_are_all_kept():
+    seen = NearDuplicateFilter()
+    questions = [
+        "What is the main function of the mitochondria? It produces ATP.",
+        "Where does photosynthesis take place? In the chloroplasts.",
+        "What does the nucleus contain? The genetic material.",
+        "Which organelle assembles proteins? The ribosome.",
+    ]
+    assert [seen.add(question) for question in questions] == [True] * 4
+
+
+def test_questions_sharing_only_some_words_are_kept():
+    seen = NearDuplicateFilter()
+    assert seen.add("What is the function of the cell membrane? It controls what enters the cell.")
+    assert seen.add("What is the function of the cell wall? It gives plant cells their shape.")
+
+
+def test_threshold_controls_how_close_a_duplicate_must_be():
+    first = "What is the function of the cell membrane? It controls what enters the cell."
+    second = "What is the function of the cell wall? It controls what enters the plant cell."
+    strict, loose = NearDuplicateFilter(threshold=0.9), NearDuplicateFilter(threshold=0.3)
+    for seen in (strict, loose):
+        seen.add(first)
+    assert strict.add(second)
+    assert not loose.add(second)
@@ -0,0 +1,108 @@
+"""Reusing unchanged pages when a new version of a document is uploaded."""
+import io
+
+import fitz
+from docx import Document
+from fastapi.testclient import TestClient
+
+from main import app
+from services import document
+from services.document import extract_document, extract_pdf_pages_parallel
+
+
+def text_pdf(texts) -> fitz.Document:
+    doc = fitz.open()
+    for text in texts:
+        doc.new_page().insert_text((72, 72), text)
+    return doc
+
+
+def form_xobject_pdf(source: fitz.Document, order) -> bytes:
+    """Draw each page of ``source`` through a form XObject, as merge and imposition tools do."""
+    doc = fitz.open()
+    for page_num in order:
+        page = doc.new_page()
+        page.show_pdf_page(page.rect, source, page_num)
+    return doc.tobytes()
+
+
+def docx_bytes(paragraphs) -> bytes:
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def page_texts(extracted):
+    return [page.text.strip() for page in extracted.chunks]
+
+
+def test_form_xobject_pages_have_distinct_fingerprints():
+    source = text_pdf([f"Unique content of page {i}" for i in range(5)])
+    extracted = extract_document(form_xobject_pdf(source, range(5)), "merged.pdf")
+    assert len({page.fingerprint for page in extracted.chunks}) == 5
+
+
+def test_reordered_form_xobject_pages_keep_their_own_text():
+    source = text_pdf([f"Unique content of page {i}" for i in range(5)])
+    first = extract_document(form_xobject_pdf(source, range(5)), "merged.pdf")
+
+    order = [4, 2, 0, 3, 1]
+    second = extract_document(form_xobject_pdf(source, order), "merged.pdf", first.chunks)
+    assert page_texts(second) == [f"Unique content of page {i}" for i in order]
+    assert second.pages_reused == 5
+
+
+def test_edited_form_xobject_page_is_extracted_again():
+    texts = [f"Unique content of page {i}" for i in range(5)]
+    first = extract_document(form_xobject_pdf(text_pdf(texts), range(5)), "merged.pdf")
+
+    texts[2] = "Rewritten page 2"
+    second = extract_document(form_xobject_pdf(text_pdf(texts), range(5)), "merged.pdf", first.chunks)
+    assert page_texts(second) == texts
+    assert second.pages_reused == 4
+
+
+def test_worker_processes_fingerprint_pages_and_skip_known_ones(monkeypatch):
+    monkeypatch.setattr(document, "PDF_PARALLEL_MIN_PAGES", 1)
+    pdf = text_pdf([f"Unique content of page {i}" for i in range(6)]).tobytes()
+    inline = extract_pdf_pages_parallel(pdf, workers=1)
+
+    # Known pages take their text from the earlier version, so they are not extracted again
+    reuse = {page.fingerprint: f"earlier text {page.number}" for page in inline[:3]}
+    pooled = extract_pdf_pages_parallel(pdf, workers=2, reuse=reuse)
+    assert [page.fingerprint for page in pooled] == [page.fingerprint for page in inline]
+    assert [page.text.strip() for page in pooled] == (
+        ["earlier text 1", "earlier text 2", "earlier text 3"] + [page.text.strip() for page in inline[3:]]
+    )
+
+
+def test_uploads_with_the_same_filename_do_not_share_pages():
+    client = TestClient(app)
+    source = text_pdf([f"Shared page {i}" for i in range(4)] + ["Alice's notes"])
+    alice = client.post(
+        "/upload/raw?filename=notes.pdf&document_id=alice-notes", content=form_xobject_pdf(source, range(5))
+    ).json()
+    assert alice["success"]
+
+    # Bob's file has four of the same pages, but is not a version of Alice's
+    source = text_pdf([f"Shared page {i}" for i in range(4)] + ["Bob's notes"])
+    bob = client.post(
+        "/upload/raw?filename=notes.pdf&document_id=bob-notes", content=form_xobject_pdf(source, range(5))
+    ).json()
+    assert bob["success"]
+    assert bob["pages_reused"] == 0
+    assert "Bob's notes" in bob["text"] and "Alice's notes" not in bob["text"]
+
+
+def test_inserted_docx_paragraph_only_changes_the_pages_around_it():
+    # Paragraphs of equal length, so boundaries at a fixed size would all shift by one paragraph
+    paragraphs = [f"Paragraph {i:03d} of the lecture notes. ".ljust(300, "x") for i in range(200)]
+    first = extract_document(docx_bytes(paragraphs), "notes.docx")
+
+    opening = "A new opening paragraph. ".ljust(300, "y")
+    second = extract_document(docx_bytes([opening] + paragraphs), "notes.docx", first.chunks)
+    assert second.pages_reused >= second.pages - 2
+    assert opening in second.text
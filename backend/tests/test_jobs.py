@@ -0,0 +1,85 @@
+"""Background jobs: sharing in-flight work, bounding the queue and reporting status."""
+import threading
+import time
+
+import pytest
+
+from services.jobs import COMPLETED, FAILED, QUEUED, RUNNING, JobManager, JobQueueFullError
+
+
+def wait_until_done(manager: JobManager, job_id: str, timeout: float = 5):
+    deadline = time.time() + timeout
+    while not manager.get(job_id).done and time.time() < deadline:
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+def blocking(release: threading.Event, result: dict = None):
+    def run(report_progress):
+        report_progress("Working")
+        release.wait(5)
+        return result or {"success": True}
+    return run
+
+
+def test_submitting_an_active_key_returns_the_existing_job():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+    first, existing = manager.submit("podcast:doc", blocking(release))
+    second, shared = manager.submit("podcast:doc", blocking(release))
+    release.set()
+    assert not existing and shared
+    assert second is first
+    assert wait_until_done(manager, first.job_id).status == COMPLETED
+
+
+def test_finished_key_starts_a_new_job():
+    manager = JobManager(max_workers=1)
+    first, _ = manager.submit("podcast:doc", lambda report_progress: {"success": True})
+    wait_until_done(manager, first.job_id)
+    second, shared = manager.submit("podcast:doc", lambda report_progress: {"success": True})
+    assert not shared
+    assert second.job_id != first.job_id
+
+
+def test_full_queue_rejects_new_keys():
+    manager = JobManager(max_workers=1, max_queued=2)
+    release = threading.Event()
+    try:
+        running, _ = manager.submit("running", blocking(release))
+        deadline = time.time() + 5
+        while manager.get(running.job_id).status != RUNNING and time.time() < deadline:
+            time.sleep(0.01)
+        manager.submit("waiting-1", blocking(release))
+        manager.submit("waiting-2", blocking(release))
+        with pytest.raises(JobQueueFullError):
+            manager.submit("waiting-3", blocking(release))
+        # A key already queued is still shared rather than refused
+        assert manager.submit("waiting-1", blocking(release))[1]
+        assert manager.stats()[QUEUED] == 2
+    finally:
+        release.set()
+
+
+def test_failures_are_recorded_on_the_job():
+    manager = JobManager()
+
+    def explode(report_progress):
+        raise RuntimeError("TTS quota exceeded")
+
+    raised, _ = manager.submit("raised", explode)
+    refused, _ = manager.submit("refused", lambda report_progress: {"success": False, "error": "No document"})
+    assert (wait_until_done(manager, raised.job_id).error, raised.status) == ("TTS quota exceeded", FAILED)
+    assert (wait_until_done(manager, refused.job_id).error, refused.status) == ("No document", FAILED)
+    assert refused.progress == "Failed"
+
+
+def test_oldest_finished_jobs_are_pruned():
+    manager = JobManager(max_finished=2)
+    jobs = []
+    for i in range(4):
+        job, _ = manager.submit(f"job-{i}", lambda report_progress: {"success": True})
+        wait_until_done(manager, job.job_id)
+        jobs.append(job)
+    # Pruning happens on submit, so the newest finished job is not counted yet
+    assert [manager.get(job.job_id) is not None for job in jobs] == [False, True, True, True]
@@ -0,0 +1,162 @@
+"""Range and conditional requests for podcast audio served at /podcasts/{filename}."""
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.podcast import PODCAST_OUTPUT_DIR
+
+PODCAST = "podcast_17650113405400_English.mp3"
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def audio():
+    return (PODCAST_OUTPUT_DIR / PODCAST).read_bytes()
+
+
+@pytest.fixture(scope="module")
+def validators(client):
+    response = client.head(f"/podcasts/{PODCAST}")
+    return response.headers["etag"], response.headers["last-modified"]
+
+
+def get(client, **headers):
+    return client.get(f"/podcasts/{PODCAST}", headers=headers)
+
+
+def test_full_file(client, audio):
+    response = get(client)
+    assert response.status_code == 200
+    assert response.content == audio
+    assert response.headers["content-length"] == str(len(audio))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "audio/mpeg"
+
+
+def test_range(client, audio):
+    response = get(client, range="bytes=100-1099")
+    assert response.status_code == 206
+    assert response.content == audio[100:1100]
+    assert response.headers["content-range"] == f"bytes 100-1099/{len(audio)}"
+    assert response.headers["content-length"] == "1000"
+
+
+def test_open_ended_range(client, audio):
+    start = len(audio) - 4096
+    response = get(client, range=f"bytes={start}-")
+    assert response.status_code == 206
+    assert response.content == audio[start:]
+
+
+def test_suffix_range(client, audio):
+    response = get(client, range="bytes=-500")
+    assert response.status_code == 206
+    assert response.content == audio[-500:]
+    assert response.headers["content-range"] == f"bytes {len(audio) - 500}-{len(audio) - 1}/{len(audio)}"
+
+
+def test_range_past_end_is_clamped(client, audio):
+    response = get(client, range=f"bytes={len(audio) - 10}-{len(audio) + 1000}")
+    assert response.status_code == 206
+    assert response.content == audio[-10:]
+
+
+def test_unsatisfiable_range(client, audio):
+    response = get(client, range=f"bytes={len(audio)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(audio)}"
+
+
+def test_empty_suffix_range_is_unsatisfiable(client, audio):
+    response = get(client, range="bytes=-0")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(audio)}"
+
+
+def test_reversed_range_is_ignored(client, audio):
+    response = get(client, range="bytes=5-3")
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_malformed_range_is_ignored(client, audio):
+    response = get(client, range="bytes=--5")
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_multiple_ranges_send_whole_file(client, audio):
+    response = get(client, range="bytes=0-9,20-29")
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_if_range_current_etag(client, audio, validators):
+    etag, _ = validators
+    response = get(client, range="bytes=0-99", **{"if-range": etag})
+    assert response.status_code == 206
+    assert response.content == audio[:100]
+
+
+def test_if_range_stale_etag_sends_whole_file(client, audio):
+    response = get(client, range="bytes=0-99", **{"if-range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_if_none_match(client, validators):
+    etag, _ = validators
+    response = get(client, **{"if-none-match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_none_match_other_etag(client, audio):
+    response = get(client, **{"if-none-match": '"other"'})
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_if_none_match_takes_precedence(client, audio, validators):
+    _, last_modified = validators
+    response = get(client, **{"if-none-match": '"other"', "if-modified-since": last_modified})
+    assert response.status_code == 200
+
+
+def test_if_modified_since(client, validators):
+    _, last_modified = validators
+    response = get(client, **{"if-modified-since": last_modified})
+    assert response.status_code == 304
+
+
+def test_modified_since_older_date(client, audio):
+    response = get(client, **{"if-modified-since": formatdate(0, usegmt=True)})
+    assert response.status_code == 200
+    assert response.content == audio
+
+
+def test_head(client, audio, validators):
+    etag, _ = validators
+    response = client.head(f"/podcasts/{PODCAST}")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(audio))
+    assert response.headers["etag"] == etag
+
+
+def test_head_range(client):
+    response = client.head(f"/podcasts/{PODCAST}", headers={"range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.content == b""
+    assert response.headers["content-length"] == "100"
+
+
+def test_missing_podcast(client):
+    assert client.get("/podcasts/podcast_missing.mp3").status_code == 404
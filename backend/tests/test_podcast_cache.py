@@ -0,0 +1,68 @@
+"""The podcast file cache and how often it rewrites its manifest."""
+import json
+
+from services.podcast import PodcastCache
+
+
+def new_cache(tmp_path, **options) -> PodcastCache:
+    audio_dir = tmp_path / "audio"
+    audio_dir.mkdir()
+    return PodcastCache(tmp_path / "manifest.json", audio_dir, **options)
+
+
+def add_file(cache: PodcastCache, key: str, size: int = 100):
+    (cache.audio_dir / f"{key}.mp3").write_bytes(b"\0" * size)
+    cache.add(key, f"{key}.mp3", language="English")
+
+
+def saved(cache: PodcastCache) -> dict:
+    return json.loads(cache.manifest_path.read_text(encoding="utf-8"))
+
+
+def test_hits_do_not_rewrite_the_manifest(tmp_path):
+    cache = new_cache(tmp_path)
+    add_file(cache, "lecture")
+    before = cache.manifest_path.stat()
+    for _ in range(5):
+        assert cache.get("lecture")["filename"] == "lecture.mp3"
+    after = cache.manifest_path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert cache.stats()["hits"] == 5
+
+
+def test_last_used_times_are_written_with_the_next_change_or_on_flush(tmp_path):
+    cache = new_cache(tmp_path)
+    add_file(cache, "lecture")
+    last_used = cache.get("lecture")["last_used"]
+    assert saved(cache)["lecture"]["last_used"] < last_used
+    add_file(cache, "seminar")
+    assert saved(cache)["lecture"]["last_used"] == last_used
+
+    last_used = cache.get("seminar")["last_used"]
+    cache.flush()
+    assert saved(cache)["seminar"]["last_used"] == last_used
+
+
+def test_hits_are_saved_once_the_interval_has_passed(tmp_path):
+    cache = new_cache(tmp_path, save_seconds=0)
+    add_file(cache, "lecture")
+    last_used = cache.get("lecture")["last_used"]
+    assert saved(cache)["lecture"]["last_used"] == last_used
+
+
+def test_eviction_uses_unsaved_last_used_times(tmp_path):
+    cache = new_cache(tmp_path, max_bytes=250)
+    add_file(cache, "lecture")
+    add_file(cache, "seminar")
+    cache.get("lecture")
+    add_file(cache, "tutorial")
+    assert set(saved(cache)) == {"lecture", "tutorial"}
+    assert not (cache.audio_dir / "seminar.mp3").exists()
+
+
+def test_missing_audio_file_is_dropped_from_the_manifest(tmp_path):
+    cache = new_cache(tmp_path)
+    add_file(cache, "lecture")
+    (cache.audio_dir / "lecture.mp3").unlink()
+    assert cache.get("lecture") is None
+    assert saved(cache) == {}
@@ -0,0 +1,57 @@
+"""Reusing answers to repeated and rephrased questions, and the guards against wrong matches."""
+from services.qa_cache import QuestionAnswerCache
+
+DOCUMENT = "content-id"
+
+
+def cache_with(question: str, answer: str = "cached answer", threshold: float = 0.85) -> QuestionAnswerCache:
+    cache = QuestionAnswerCache(threshold=threshold)
+    cache.store(DOCUMENT, question, answer, "client-id", "test-model", "question1")
+    return cache
+
+
+def test_repeated_question_is_an_exact_hit():
+    cache = cache_with("What is photosynthesis?")
+    entry, kind = cache.lookup(DOCUMENT, "  what is PHOTOSYNTHESIS ")
+    assert kind == "exact"
+    assert entry.answer == "cached answer"
+
+
+def test_rephrased_question_is_a_semantic_hit():
+    cache = cache_with("What are the stages of cellular respiration?")
+    entry, kind = cache.lookup(DOCUMENT, "Please explain what the stages of cellular respiration are")
+    assert kind == "semantic"
+    assert entry.answer == "cached answer"
+
+
+def test_questions_about_other_documents_miss():
+    cache = cache_with("What is photosynthesis?")
+    assert cache.lookup("other-content-id", "What is photosynthesis?") is None
+
+
+# The guard tests use a loose threshold, so only the guard keeps these questions apart
+LOOSE = 0.5
+
+
+def test_different_numbers_do_not_share_an_answer():
+    cache = cache_with("What are the key points of chapter 2 in the textbook?", threshold=LOOSE)
+    assert cache.lookup(DOCUMENT, "What are the key points of chapter 3 in the textbook?") is None
+
+
+def test_negated_question_does_not_share_an_answer():
+    cache = cache_with("Which organelles are found in plant cells?", threshold=LOOSE)
+    assert cache.lookup(DOCUMENT, "Which organelles are not found in plant cells?") is None
+
+
+def test_different_question_word_does_not_share_an_answer():
+    cache = cache_with("When was the treaty of Versailles signed?", threshold=LOOSE)
+    assert cache.lookup(DOCUMENT, "Where was the treaty of Versailles signed?") is None
+
+
+def test_stats_count_each_kind_of_lookup():
+    cache = cache_with("What is photosynthesis?")
+    cache.lookup(DOCUMENT, "What is photosynthesis?")
+    cache.lookup(DOCUMENT, "Who wrote the textbook?")
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 0, 1)
+    assert stats["answers"] == 1
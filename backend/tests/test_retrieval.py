@@ -0,0 +1,67 @@
+"""BM25 passage ranking over a small corpus."""
+from services.retrieval import BM25Index, Chunk, build_index, format_passages, split_into_chunks
+
+PASSAGES = [
+    "Mitochondria produce ATP through cellular respiration.",
+    "Chloroplasts capture light energy during photosynthesis.",
+    "Photosynthesis turns carbon dioxide and water into glucose. Photosynthesis releases oxygen.",
+    "The nucleus stores the genetic material of the cell.",
+    "Ribosomes assemble proteins from amino acids.",
+    "Photosynthesis happens in the leaves of green plants and algae, which contain chlorophyll, "
+    "the pigment that absorbs red and blue light while reflecting green light back to the eye.",
+]
+
+
+def corpus() -> BM25Index:
+    return BM25Index([Chunk(f"Page {i + 1}", text, i) for i, text in enumerate(PASSAGES)])
+
+
+def labels(results) -> list:
+    return [chunk.label for chunk, _ in results]
+
+
+def test_passage_about_the_query_ranks_first():
+    assert labels(corpus().search("Where is the genetic material stored?"))[0] == "Page 4"
+    assert labels(corpus().search("How is ATP produced?"))[0] == "Page 1"
+
+
+def test_repeated_terms_in_a_short_passage_outrank_a_single_mention_in_a_long_one():
+    results = corpus().search("photosynthesis")
+    assert labels(results) == ["Page 3", "Page 2", "Page 6"]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_returns_at_most_k_passages_and_skips_unrelated_ones():
+    index = corpus()
+    assert len(index.search("photosynthesis light oxygen glucose", k=2)) == 2
+    assert index.search("quantum chromodynamics") == []
+    assert labels(index.search("ribosomes", k=10)) == ["Page 5"]
+
+
+def test_index_reusing_term_counts_ranks_like_a_fresh_one():
+    previous = corpus()
+    chunks = previous.chunks[:5] + [Chunk("Page 6", "Light reactions of photosynthesis split water.", 5)]
+    reused = BM25Index(chunks, previous=previous)
+    fresh = BM25Index(chunks)
+    for query in ("photosynthesis water", "genetic material", "light"):
+        assert [(c.label, round(s, 5)) for c, s in reused.search(query)] == \
+            [(c.label, round(s, 5)) for c, s in fresh.search(query)]
+
+
+def test_short_documents_are_not_indexed():
+    assert build_index("A one page handout.") is None
+    text = "".join(f"\n--- Page {n} ---\n" + f"Topic {n} notes. " * 100 for n in range(1, 9))
+    index = build_index(text)
+    assert {chunk.label for chunk in index.chunks} == {f"Page {n}" for n in range(1, 9)}
+
+
+def test_passages_are_formatted_in_document_order_with_their_pages():
+    results = corpus().search("photosynthesis", k=2)
+    assert format_passages(results) == f"[Page 2]\n{PASSAGES[1]}\n\n[Page 3]\n{PASSAGES[2]}"
+
+
+def test_long_pages_are_split_into_overlapping_chunks():
+    chunks = split_into_chunks("\n--- Page 1 ---\n" + "word " * 700, max_chars=1000, overlap=100)
+    assert len(chunks) == 4
+    assert all(chunk.label == "Page 1" and len(chunk.text) <= 1000 for chunk in chunks)
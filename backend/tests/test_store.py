@@ -0,0 +1,58 @@
+"""Shared documents: reference counting, releasing and loading evicted documents."""
+import asyncio
+
+import fitz
+from fastapi.testclient import TestClient
+
+from main import app
+from services.document import DocumentPage
+from services.store import DocumentStore, StoredDocument
+
+
+def stored(document_id: str, text: str = "Cell biology lecture notes") -> StoredDocument:
+    return StoredDocument(document_id, "notes.txt", text, 1, [DocumentPage("Page", 1, text, "fp")])
+
+
+def test_release_only_accepts_the_holders_own_id():
+    documents = DocumentStore()
+    documents.put(stored("content-id"))
+    documents.reference("content-id", "alice-notes")
+    documents.reference("content-id", "bob-notes")
+
+    # The content-hash ID is shared by both uploads, and unknown IDs hold nothing
+    assert documents.release("content-id") is None
+    assert documents.release("mallory-notes") is None
+    assert documents.stats()["references"] == 2
+
+    assert documents.release("alice-notes") == 1
+    assert documents.release("alice-notes") is None
+    assert documents.get("bob-notes") is not None
+    assert documents.release("bob-notes") == 0
+    assert documents.get("content-id") is None
+
+
+def test_release_endpoint_rejects_content_hash_ids():
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Carol's revision notes")
+    client = TestClient(app)
+    upload = client.post("/upload/raw?filename=notes.pdf&document_id=carol-notes", content=doc.tobytes()).json()
+    assert upload["success"]
+
+    assert client.delete(f"/documents/{upload['document_id']}").status_code == 404
+    assert client.delete("/documents/never-uploaded").status_code == 404
+    assert client.get("/documents/carol-notes").status_code == 200
+    assert client.delete("/documents/carol-notes").json() == {"success": True, "references": 0}
+    assert client.get("/documents/carol-notes").status_code == 404
+
+
+def test_evicted_document_is_reloaded_from_disk_in_a_thread(tmp_path):
+    documents = DocumentStore(max_bytes=1, db_path=str(tmp_path / "documents.db"))
+    documents.put(stored("first", "Photosynthesis"))
+    documents.reference("first", "alice-notes")
+    documents.put(stored("second", "Respiration"))
+    assert documents.stats()["resident_documents"] == 1
+
+    reloaded = asyncio.run(documents.lookup("alice-notes"))
+    assert "Photosynthesis" in reloaded.text
+    assert documents.disk_loads == 1
+    assert asyncio.run(documents.lookup("unknown")) is None
@@ -0,0 +1,121 @@
+"""Parsing, validating and retrying structured (JSON) model output."""
+import asyncio
+import json
+
+from benchmarks.fakes import FakeModel
+from models.schemas import MCQ, Flashcard
+from services.llm import configure_client
+from services.dedup import NearDuplicateFilter
+from services.structured import (
+    MAP_OVERSAMPLE, generate_items, merge_balanced, parse_items, parse_object, salvage_array, section_quotas,
+    validate_items,
+)
+
+
+def card(i: int) -> dict:
+    return {"question": f"Question {i}?", "answer": f"Answer {i}."}
+
+
+class ScriptedModel(FakeModel):
+    """Replies with ``replies`` in turn and records every prompt."""
+
+    def __init__(self, replies):
+        super().__init__(latency=0)
+        self.replies = list(replies)
+        self.prompts = []
+
+    def reply_to(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+def test_truncated_array_keeps_complete_items():
+    text = json.dumps([card(1), card(2), card(3)])[:-30]
+    items, clean = salvage_array(text)
+    assert items == [card(1), card(2)]
+    assert not clean
+
+
+def test_malformed_item_in_the_middle_is_skipped():
+    text = f'[{json.dumps(card(1))}, {{"question": "Broken?", "answer": }}, {json.dumps(card(3))}]'
+    items, clean = parse_items(text)
+    assert items == [card(1), card(3)]
+    assert not clean
+
+
+def test_fenced_json_parses_cleanly():
+    items, clean = parse_items("```json\n" + json.dumps([card(1)]) + "\n```")
+    assert (items, clean) == ([card(1)], True)
+
+    data, clean = parse_object("```json\n" + json.dumps({"summary": "Short.", "flashcards": [card(1)]}) + "\n```", ["flashcards"])
+    assert clean and data["flashcards"] == [card(1)]
+
+
+def test_broken_object_salvages_arrays_and_strings():
+    text = '{"summary": "Cells divide.", "flashcards": [' + json.dumps(card(1)) + ', {"question": "Cut'
+    data, clean = parse_object(text, ["flashcards", "mcqs"])
+    assert not clean
+    assert data["summary"] == "Cells divide."
+    assert data["flashcards"] == [card(1)]
+    assert "mcqs" not in data
+
+
+def test_mcq_validation():
+    good = {"question": "Which?", "options": ["A", "B", "C", "D"], "correctIndex": 3}
+    three_options = {**good, "options": ["A", "B", "C"]}
+    index_out_of_range = {**good, "correctIndex": 4}
+    negative_index = {**good, "correctIndex": -1}
+    valid, rejected = validate_items([good, three_options, index_out_of_range, negative_index, "not an item"], MCQ)
+    assert valid == [good]
+    assert rejected == 4
+
+
+def test_retry_asks_only_for_the_missing_items():
+    # Two good cards, one invalid and one repeating a good one
+    first = json.dumps([card(1), {"question": "", "answer": "Empty question"}, card(2), card(1)])
+    model = ScriptedModel([first, json.dumps([card(3), card(4)])])
+    configure_client(model)
+
+    items = asyncio.run(generate_items(
+        "flashcards",
+        lambda missing, avoid: f"Create {missing} flashcards. Avoid: {'|'.join(avoid)}",
+        Flashcard,
+        4
+    ))
+    assert items == [card(1), card(2), card(3), card(4)]
+    assert model.prompts == [
+        "Create 4 flashcards. Avoid: ",
+        "Create 2 flashcards. Avoid: Question 1?|Question 2?",
+    ]
+
+
+def test_retries_stop_at_the_limit():
+    model = ScriptedModel(["not json", "[]"])
+    configure_client(model)
+    items = asyncio.run(generate_items("flashcards", lambda missing, avoid: "Create", Flashcard, 3, max_retries=1))
+    assert items == []
+    assert len(model.prompts) == 2
+
+
+def test_section_quotas_follow_section_size_and_cover_every_section():
+    quotas = section_quotas([1000, 1000, 2000, 200], 12)
+    assert sum(quotas) == round(12 * MAP_OVERSAMPLE)
+    assert quotas == [4, 4, 6, 1]
+
+
+def test_section_quotas_spread_a_small_count_over_evenly_spaced_sections():
+    assert section_quotas([500] * 6, 2) == [1, 0, 1, 0, 1, 0]
+
+
+def test_merge_takes_one_item_per_section_per_round_and_skips_near_duplicates():
+    per_section = [
+        [card(1), card(2), card(3)],
+        [{"question": "Question 1?", "answer": "Answer 1."}, card(4)],
+        [card(5)],
+    ]
+    merged = []
+    duplicates = merge_balanced(
+        per_section, merged, NearDuplicateFilter(), 4, lambda item: f"{item['question']} {item['answer']}"
+    )
+    assert [item["question"] for item in merged] == ["Question 1?", "Question 5?", "Question 2?", "Question 4?"]
+    assert duplicates == 1
@@ -0,0 +1,57 @@
+"""Study packs: one combined model call, trimmed and de-duplicated, with section-wise long documents."""
+import asyncio
+import json
+
+from benchmarks.corpus import DISTINCT_TOPICS
+from benchmarks.fakes import FakeModel, FakeStudyModel
+from services.gemini import generate_study_pack
+from services.llm import configure_client
+from services.prompts import MAX_CONTEXT_CHARS
+
+
+class OvershootingModel(FakeModel):
+    """Answers the study pack prompt with too many items, some of them repeated."""
+
+    def reply_to(self, prompt: str) -> str:
+        flashcards = [{"question": f"What is topic {i % 6}?", "answer": f"Topic {i % 6}."} for i in range(12)]
+        mcqs = [
+            {"question": f"Which is topic {i}?", "options": ["A", "B", "C", "D"], "correctIndex": i % 4}
+            for i in range(8)
+        ]
+        return json.dumps({"summary": "A short summary.", "flashcards": flashcards, "mcqs": mcqs})
+
+
+def test_combined_lists_are_deduplicated_and_trimmed():
+    model = OvershootingModel(latency=0)
+    configure_client(model)
+    pack = asyncio.run(generate_study_pack(
+        "Notes on six topics.", "notes.pdf", ["summary", "flashcards", "mcqs"], flashcard_count=5, mcq_count=3
+    ))
+    questions = [card["question"] for card in pack["flashcards"]]
+    assert len(questions) == 5 and len(set(questions)) == 5
+    assert len(pack["mcqs"]) == 3
+    assert pack["model_calls"] == model.calls == 1
+
+
+def test_long_documents_generate_every_part_section_by_section():
+    model = FakeStudyModel(DISTINCT_TOPICS, latency=0, seconds_per_item=0)
+    configure_client(model)
+    pages = [f"\n--- Page {i + 1} ---\n" + f"{DISTINCT_TOPICS[i]} notes. " * 300 for i in range(40)]
+    document = "".join(pages)
+    assert len(document) > MAX_CONTEXT_CHARS
+
+    prompts = []
+    generate_content = model.generate_content
+
+    def record(contents, stream=False, **kwargs):
+        prompts.append("".join(part for part in contents if isinstance(part, str)))
+        return generate_content(contents, stream, **kwargs)
+
+    model.generate_content = record
+    pack = asyncio.run(generate_study_pack(document, "notes.pdf", ["summary", "flashcards", "mcqs"]))
+    assert not any(FakeStudyModel.STUDY_PACK_MARKER in prompt for prompt in prompts)
+    assert len(pack["flashcards"]) == 8 and len(pack["mcqs"]) == 5
+    # Items come from sections across the whole document, not just its first MAX_CONTEXT_CHARS
+    beyond_context = [topic for page, topic in zip(pages, DISTINCT_TOPICS) if document.index(page) > MAX_CONTEXT_CHARS]
+    assert any(topic in card["question"] for card in pack["flashcards"] for topic in beyond_context)
+    assert pack["summary"]
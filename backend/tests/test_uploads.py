@@ -0,0 +1,91 @@
+"""Concurrent uploads of the same file sharing one extraction, and the upload size limit."""
+import asyncio
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.store import DocumentStore, make_document_id
+from services.uploads import UPLOAD_MAX_BYTES, UploadDeduplicator
+
+FRONTEND_ORIGIN = "http://localhost:8080"
+
+
+def pdf_bytes() -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Syllabus for the autumn term")
+    return doc.tobytes()
+
+
+async def start_upload(deduplicator: UploadDeduplicator, pdf: bytes, holder: str) -> asyncio.Task:
+    task = asyncio.create_task(deduplicator.ingest(
+        pdf, "syllabus.pdf", len(pdf), make_document_id(pdf), lambda: None, holder=holder
+    ))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_waiting_upload_gets_the_document_when_the_leading_upload_is_cancelled():
+    async def scenario():
+        documents = DocumentStore()
+        deduplicator = UploadDeduplicator(documents)
+        pdf = pdf_bytes()
+        leader = await start_upload(deduplicator, pdf, "first")
+        waiter = await start_upload(deduplicator, pdf, "second")
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        document, _, _ = await waiter
+        return documents, deduplicator, document
+
+    # The waiter extracts the file itself, or reuses it if the cancelled extraction stored it first
+    documents, deduplicator, document = asyncio.run(scenario())
+    assert "autumn term" in document.text
+    assert documents.get("second") is document
+    assert deduplicator.stats()["in_progress"] == 0
+
+
+def test_cancelling_a_waiting_upload_leaves_the_extraction_running():
+    async def scenario():
+        deduplicator = UploadDeduplicator(DocumentStore())
+        pdf = pdf_bytes()
+        leader = await start_upload(deduplicator, pdf, "first")
+        waiter = await start_upload(deduplicator, pdf, "second")
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        document, _, deduplicated = await leader
+        return deduplicator, document, deduplicated
+
+    deduplicator, document, deduplicated = asyncio.run(scenario())
+    assert "autumn term" in document.text
+    assert not deduplicated
+    assert deduplicator.extractions == 1
+
+
+def test_declared_oversized_upload_is_refused_with_cors_headers():
+    response = TestClient(app).post(
+        "/upload/raw", params={"filename": "big.pdf"},
+        content=b"x" * (UPLOAD_MAX_BYTES + 1), headers={"Origin": FRONTEND_ORIGIN}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == FRONTEND_ORIGIN
+    assert not response.json()["success"]
+
+
+def test_chunked_oversized_multipart_upload_is_refused_with_cors_headers():
+    boundary = "upload-boundary"
+
+    def body():
+        yield f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n\r\n".encode()
+        for _ in range(3):
+            yield b"x" * (UPLOAD_MAX_BYTES // 2)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = TestClient(app).post(
+        "/upload", content=body(),
+        headers={"Origin": FRONTEND_ORIGIN, "Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == FRONTEND_ORIGIN
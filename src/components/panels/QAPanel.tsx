@@ -4,12 +4,14 @@ import { Send, Sparkles, BookOpen, AlertCircle, Loader2 } from 'lucide-react';
 import { useStore, Message } from '@/store/useStore';
 import { Button } from '@/components/ui/button';
 import { cn } from '@/lib/utils';
-import { askQuestion, extractDocumentText } from '@/lib/api';
+import { askQuestionStream, extractDocumentText } from '@/lib/api';
 
 const QAPanel = () => {
-  const { messages, addMessage, selectedDocument } = useStore();
+  const { messages, addMessage, updateMessage, selectedDocument } = useStore();
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // Set once the first words of the answer arrive, which replace the loading indicator
+  const [isStreaming, setIsStreaming] = useState(false);
   const [isExtractingText, setIsExtractingText] = useState(false);
   const [extractedText, setExtractedText] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
@@ -68,21 +70,34 @@ const QAPanel = () => {
     setIsLoading(true);
     setError(null);
 
+    const answerId = (Date.now() + 1).toString();
+    let answerStarted = false;
+    const showAnswer = (content: string) => {
+      if (answerStarted) {
+        updateMessage(answerId, content);
+        return;
+      }
+      answerStarted = true;
+      setIsStreaming(true);
+      const aiMessage: Message = {
+        id: answerId,
+        type: 'assistant',
+        content: content,
+        timestamp: new Date(),
+      };
+      addMessage(aiMessage);
+    };
+
     try {
-      const result = await askQuestion(
+      const result = await askQuestionStream(
         selectedDocument?.id || 'no-document',
         question,
-        extractedText || ''
+        extractedText || '',
+        showAnswer
       );
 
       if (result.success && result.data) {
-        const aiMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          type: 'assistant',
-          content: result.data,
-          timestamp: new Date(),
-        };
-        addMessage(aiMessage);
+        showAnswer(result.data);
       } else {
         setError(result.error || 'Failed to get AI response');
       }
@@ -91,6 +106,7 @@ const QAPanel = () => {
       console.error('AI Error:', err);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   };
 
@@ -203,7 +219,7 @@ const QAPanel = () => {
         )}
 
         {/* Loading indicator */}
-        {isLoading && (
+        {isLoading && !isStreaming && (
           <motion.div
             initial={{ opacity: 0 }}
             animate={{ opacity: 1 }}
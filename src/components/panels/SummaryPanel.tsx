@@ -4,7 +4,7 @@ import { FileText, Loader2, Sparkles, AlertCircle, BookOpen } from 'lucide-react
 import { useStore } from '@/store/useStore';
 import { Button } from '@/components/ui/button';
 import { cn } from '@/lib/utils';
-import { generateSummary, extractDocumentText } from '@/lib/api';
+import { generateSummaryStream, extractDocumentText } from '@/lib/api';
 
 type SummaryType = 'short' | 'detailed' | 'bullet';
 
@@ -59,14 +59,17 @@ const SummaryPanel = () => {
     }
 
     setSummaryType(type);
+    setSummary(null);
     setIsLoading(true);
     setError(null);
 
     try {
-      const result = await generateSummary(
+      // Show the summary as it is written instead of waiting for all of it
+      const result = await generateSummaryStream(
         selectedDocument.id,
         type,
-        extractedText
+        extractedText,
+        setSummary
       );
 
       if (result.success && result.data) {
@@ -160,7 +163,7 @@ const SummaryPanel = () => {
 
       {/* Summary Content */}
       <div className="flex-1 overflow-y-auto">
-        {isLoading ? (
+        {isLoading && !summary ? (
           <motion.div
             initial={{ opacity: 0 }}
             animate={{ opacity: 1 }}
@@ -4,6 +4,7 @@ const API_BASE_URL = 'http://localhost:8000';
 export interface AIResponse {
     success: boolean;
     data?: string;
+    cached?: boolean;
     error?: string;
 }
 
@@ -22,24 +23,110 @@ export interface ExtractedTextResponse {
     success: boolean;
     text?: string;
     pages?: number;
+    document_id?: string;
+    pages_reused?: number;
+    deduplicated?: boolean;
     error?: string;
 }
 
-// Extract text from a base64-encoded document
+// Error prefix the backend uses when it no longer holds a document
+const UNKNOWN_DOCUMENT_ERROR = 'Unknown document_id';
+
+// POST an AI request that references the document by id only; the text is
+// resent just once if the backend reports that it does not know the document
+async function postWithDocumentFallback<T extends { success: boolean; error?: string }>(
+    path: string,
+    body: Record<string, unknown>,
+    documentText?: string
+): Promise<T> {
+    const post = async (payload: Record<string, unknown>): Promise<T> => {
+        const response = await fetch(`${API_BASE_URL}${path}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+        return await response.json();
+    };
+
+    const result = await post(body);
+    if (!result.success && documentText && result.error?.startsWith(UNKNOWN_DOCUMENT_ERROR)) {
+        return await post({ ...body, document_text: documentText });
+    }
+    return result;
+}
+
+// POST an AI request to a streaming endpoint and call onText with the text
+// received so far as each Server-Sent Event token arrives. Resolves with the
+// full text, and retries once with the document text like
+// postWithDocumentFallback if the backend does not know the document.
+async function streamWithDocumentFallback(
+    path: string,
+    body: Record<string, unknown>,
+    onText: (text: string) => void,
+    documentText?: string
+): Promise<AIResponse> {
+    const stream = async (payload: Record<string, unknown>): Promise<AIResponse> => {
+        const response = await fetch(`${API_BASE_URL}${path}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+        if (!response.ok || !response.body) {
+            return { success: false, error: `Request failed with status ${response.status}` };
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            // Events are separated by a blank line: "event: <name>\ndata: <json>\n\n"
+            let end: number;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const lines = buffer.slice(0, end).split('\n');
+                buffer = buffer.slice(end + 2);
+                const event = lines.find(line => line.startsWith('event: '))?.slice(7);
+                const data = JSON.parse(lines.find(line => line.startsWith('data: '))?.slice(6) || '{}');
+                if (event === 'token') {
+                    text += data.text;
+                    onText(text);
+                } else if (event === 'error') {
+                    return { success: false, error: data.error };
+                } else if (event === 'done') {
+                    return { success: true, data: text, cached: data.cached };
+                }
+            }
+        }
+        return { success: false, error: 'The response ended unexpectedly' };
+    };
+
+    const result = await stream(body);
+    if (!result.success && documentText && result.error?.startsWith(UNKNOWN_DOCUMENT_ERROR)) {
+        return await stream({ ...body, document_text: documentText });
+    }
+    return result;
+}
+
+// Extract text from a document stored as a base64 data URL.
+// The file is sent as the raw request body so the backend can stream it to disk.
 export async function extractDocumentText(
     documentId: string,
     filename: string,
     base64Data: string
 ): Promise<ExtractedTextResponse> {
     try {
-        const response = await fetch(`${API_BASE_URL}/extract-base64`, {
+        const dataUrl = base64Data.startsWith('data:')
+            ? base64Data
+            : `data:application/octet-stream;base64,${base64Data}`;
+        const file = await (await fetch(dataUrl)).blob();
+        const params = new URLSearchParams({ filename, document_id: documentId });
+        const response = await fetch(`${API_BASE_URL}/upload/raw?${params}`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                document_id: documentId,
-                filename: filename,
-                base64_data: base64Data
-            })
+            headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            body: file
         });
         return await response.json();
     } catch (error) {
@@ -54,16 +141,36 @@ export async function askQuestion(
     documentText: string
 ): Promise<AIResponse> {
     try {
-        const response = await fetch(`${API_BASE_URL}/ask`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
+        return await postWithDocumentFallback(
+            '/ask',
+            {
                 document_id: documentId,
-                question: question,
-                document_text: documentText
-            })
-        });
-        return await response.json();
+                question: question
+            },
+            documentText
+        );
+    } catch (error) {
+        return { success: false, error: 'Failed to connect to backend' };
+    }
+}
+
+// Ask a question, receiving the answer as it is generated
+export async function askQuestionStream(
+    documentId: string,
+    question: string,
+    documentText: string,
+    onText: (text: string) => void
+): Promise<AIResponse> {
+    try {
+        return await streamWithDocumentFallback(
+            '/ask/stream',
+            {
+                document_id: documentId,
+                question: question
+            },
+            onText,
+            documentText
+        );
     } catch (error) {
         return { success: false, error: 'Failed to connect to backend' };
     }
@@ -76,16 +183,36 @@ export async function generateSummary(
     documentText: string
 ): Promise<AIResponse> {
     try {
-        const response = await fetch(`${API_BASE_URL}/summary`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
+        return await postWithDocumentFallback(
+            '/summary',
+            {
                 document_id: documentId,
-                summary_type: summaryType,
-                document_text: documentText
-            })
-        });
-        return await response.json();
+                summary_type: summaryType
+            },
+            documentText
+        );
+    } catch (error) {
+        return { success: false, error: 'Failed to connect to backend' };
+    }
+}
+
+// Generate a summary, receiving it as it is generated
+export async function generateSummaryStream(
+    documentId: string,
+    summaryType: string,
+    documentText: string,
+    onText: (text: string) => void
+): Promise<AIResponse> {
+    try {
+        return await streamWithDocumentFallback(
+            '/summary/stream',
+            {
+                document_id: documentId,
+                summary_type: summaryType
+            },
+            onText,
+            documentText
+        );
     } catch (error) {
         return { success: false, error: 'Failed to connect to backend' };
     }
@@ -98,16 +225,14 @@ export async function generateFlashcards(
     count: number = 8
 ): Promise<{ success: boolean; flashcards?: FlashcardData[]; error?: string }> {
     try {
-        const response = await fetch(`${API_BASE_URL}/flashcards`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
+        return await postWithDocumentFallback(
+            '/flashcards',
+            {
                 document_id: documentId,
-                document_text: documentText,
                 count: count
-            })
-        });
-        return await response.json();
+            },
+            documentText
+        );
     } catch (error) {
         return { success: false, error: 'Failed to connect to backend' };
     }
@@ -120,16 +245,49 @@ export async function generateMCQs(
     count: number = 5
 ): Promise<{ success: boolean; mcqs?: MCQData[]; error?: string }> {
     try {
-        const response = await fetch(`${API_BASE_URL}/mcqs`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
+        return await postWithDocumentFallback(
+            '/mcqs',
+            {
                 document_id: documentId,
-                document_text: documentText,
                 count: count
-            })
-        });
-        return await response.json();
+            },
+            documentText
+        );
+    } catch (error) {
+        return { success: false, error: 'Failed to connect to backend' };
+    }
+}
+
+export interface StudyPackResponse {
+    success: boolean;
+    summary?: string;
+    flashcards?: FlashcardData[];
+    mcqs?: MCQData[];
+    cached?: string[];
+    llm_calls?: number;
+    tokens_saved?: number;
+    error?: string;
+}
+
+// Generate a summary, flashcards and MCQs together in one backend call
+export async function generateStudyPack(
+    documentId: string,
+    documentText: string,
+    summaryType: string = 'short',
+    flashcardCount: number = 8,
+    mcqCount: number = 5
+): Promise<StudyPackResponse> {
+    try {
+        return await postWithDocumentFallback(
+            '/study-pack',
+            {
+                document_id: documentId,
+                summary_type: summaryType,
+                flashcard_count: flashcardCount,
+                mcq_count: mcqCount
+            },
+            documentText
+        );
     } catch (error) {
         return { success: false, error: 'Failed to connect to backend' };
     }
@@ -137,29 +295,45 @@ export async function generateMCQs(
 
 export interface PodcastResponse {
     success: boolean;
+    job_id?: string;
+    status?: 'queued' | 'running' | 'completed' | 'failed';
+    progress?: string;
+    deduplicated?: boolean;
     audio_url?: string;
     filename?: string;
     message?: string;
     error?: string;
 }
 
-// Generate Podcast from document using podcastfy + ElevenLabs
+const PODCAST_POLL_INTERVAL_MS = 2000;
+
+// Generate Podcast from document using podcastfy + ElevenLabs.
+// The backend runs this as a background job, so poll until it finishes.
 export async function generatePodcast(
     documentId: string,
     documentText: string,
-    language: string = 'Tamil'
+    language: string = 'Tamil',
+    onProgress?: (progress: string) => void
 ): Promise<PodcastResponse> {
     try {
-        const response = await fetch(`${API_BASE_URL}/podcast`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
+        let job = await postWithDocumentFallback<PodcastResponse>(
+            '/podcast',
+            {
                 document_id: documentId,
-                document_text: documentText,
                 language: language
-            })
-        });
-        return await response.json();
+            },
+            documentText
+        );
+        while (job.success && job.job_id && job.status !== 'completed') {
+            if (job.progress) onProgress?.(job.progress);
+            await new Promise(resolve => setTimeout(resolve, PODCAST_POLL_INTERVAL_MS));
+            const response = await fetch(`${API_BASE_URL}/podcast/jobs/${job.job_id}`);
+            if (!response.ok) {
+                return { success: false, error: 'Podcast job was lost, please try again' };
+            }
+            job = await response.json();
+        }
+        return job;
     } catch (error) {
         return { success: false, error: 'Failed to connect to backend' };
     }
@@ -49,6 +49,7 @@ interface StudyStore {
   // Q&A
   messages: Message[];
   addMessage: (msg: Message) => void;
+  updateMessage: (id: string, content: string) => void;
   clearMessages: () => void;
 
   // Flashcards
@@ -84,6 +85,9 @@ export const useStore = create<StudyStore>((set) => ({
   // Q&A
   messages: [],
   addMessage: (msg) => set((state) => ({ messages: [...state.messages, msg] })),
+  updateMessage: (id, content) => set((state) => ({
+    messages: state.messages.map((msg) => msg.id === id ? { ...msg, content } : msg),
+  })),
   clearMessages: () => set({ messages: [] }),
 
   // Flashcards